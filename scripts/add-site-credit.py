@@ -51,32 +51,46 @@ PAGES = [
 
 MARKER = "site-credit"
 
-ok, skip, missing, no_body = [], [], [], []
 
-for rel in PAGES:
-    fp = BASE / rel
-    if not fp.exists():
-        missing.append(rel)
-        continue
-    txt = fp.read_text(encoding="utf-8")
+def add_credit(txt):
+    """(new text, None) or (None, "already" | "no </body>")."""
     if MARKER in txt:
-        skip.append(rel)
-        continue
+        return None, "already"
     if "</body>" not in txt:
-        no_body.append(rel)
-        continue
-    new = txt.replace("</body>", FOOTER + "  </body>", 1)
-    fp.write_text(new, encoding="utf-8")
-    ok.append(rel)
+        return None, "no </body>"
+    return txt.replace("</body>", FOOTER + "  </body>", 1), None
 
-print(f"\n=== Added: {len(ok)} ===")
-for p in ok: print(f"  + {p}")
-if skip:
-    print(f"\n=== Skipped (already has footer): {len(skip)} ===")
-    for p in skip: print(f"  = {p}")
-if missing:
-    print(f"\n=== MISSING: {len(missing)} ===")
-    for p in missing: print(f"  ! {p}")
-if no_body:
-    print(f"\n=== NO </body> tag: {len(no_body)} ===")
-    for p in no_body: print(f"  ? {p}")
+
+def main():
+    ok, skip, missing, no_body = [], [], [], []
+
+    for rel in PAGES:
+        fp = BASE / rel
+        if not fp.exists():
+            missing.append(rel)
+            continue
+        new, reason = add_credit(fp.read_text(encoding="utf-8"))
+        if reason == "already":
+            skip.append(rel)
+            continue
+        if reason:
+            no_body.append(rel)
+            continue
+        fp.write_text(new, encoding="utf-8")
+        ok.append(rel)
+
+    print(f"\n=== Added: {len(ok)} ===")
+    for p in ok: print(f"  + {p}")
+    if skip:
+        print(f"\n=== Skipped (already has footer): {len(skip)} ===")
+        for p in skip: print(f"  = {p}")
+    if missing:
+        print(f"\n=== MISSING: {len(missing)} ===")
+        for p in missing: print(f"  ! {p}")
+    if no_body:
+        print(f"\n=== NO </body> tag: {len(no_body)} ===")
+        for p in no_body: print(f"  ? {p}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,8 @@ import urllib.parse
 from datetime import datetime
 from pathlib import Path
 
+import send_scheduler
+
 
 def _load_env_local():
     env_file = Path(__file__).resolve().parent.parent / ".env.local"
@@ -388,6 +390,11 @@ def send_email_report(timestamp, total_rows, total_files, table_details, drive_o
     url = f"{GMAIL_API_URL}?{params}"
     req = urllib.request.Request(url)
 
+    # shares the ~100/day Gmail quota with the learner campaigns — report class
+    sched = send_scheduler.Scheduler("backup_report", send_scheduler.REPORT)
+    if not sched.acquire(timeout=300):
+        print("SKIPPED (no Gmail send slot left today)")
+        return False
     try:
         resp = urllib.request.urlopen(req)
         result = resp.read().decode("utf-8")
@@ -395,6 +402,7 @@ def send_email_report(timestamp, total_rows, total_files, table_details, drive_o
             ok = json.loads(result).get("success") is True
         except ValueError:
             ok = False
+        sched.release(ok, result)
         if ok:
             print("OK")
             return True
@@ -402,6 +410,7 @@ def send_email_report(timestamp, total_rows, total_files, table_details, drive_o
             print(f"FAILED ({result[:100]})")
             return False
     except Exception as e:
+        sched.release(False, e)
         print(f"FAILED ({e})")
         return False
 
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Which Whisper setup should transcribe the master-course backlog? Measure it.
+
+Runs a fixed sample of practitioner lessons through every backend / model /
+quantization combination and compares each result against the reviewed
+transcript already in the store (docs/transcripts/per-lesson):
+
+  RTF        wall-clock transcription time / audio length (lower is faster;
+             model load is reported separately, it is paid once per run)
+  peak RSS   peak resident memory of the process that ran the combination
+  WER        word error rate vs. the reviewed transcript, after normalizing
+             niqqud, punctuation and final letters (so spelling noise is not
+             counted as a recognition error)
+
+Every combination runs in its own child process, so one model's memory never
+shows up in the next one's peak and a crash (OOM on `medium`) costs one row,
+not the whole run.
+
+Audio is taken from temp_audio/<video_id>.mp3 and downloaded there once if it
+is missing. --seconds transcribes only the opening of each lesson; the reference
+is cut at the same second using the stored segment timing when the lesson has it
+(proportionally by length when it does not — marked "≈" in the table).
+
+  py scripts/bench_transcription.py
+  py scripts/bench_transcription.py --models tiny,base --backends faster-whisper --quant int8
+  py scripts/bench_transcription.py --lessons 1.1,4.3 --seconds 300
+Writes: docs/transcription-benchmark-<date>.md
+"""
+import argparse
+import datetime
+import json
+import re
+import subprocess
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+import transcript_store as store
+
+ROOT = Path(__file__).resolve().parent.parent
+AUDIO_DIR = ROOT / "temp_audio"
+SAMPLE_RATE = 16000
+
+# One lesson per module, mixing short/long and lecture/practice, so the sample
+# covers the acoustic range of the course without transcribing all 51.
+SAMPLE = ["1.1", "2.4", "3.2", "4.3", "5.6", "6.5", "7.7"]
+MODELS = ["tiny", "base", "small", "medium"]
+BACKENDS = ["whisper", "faster-whisper"]
+# openai-whisper has no quantized CPU path; it always runs float32.
+QUANT = {"whisper": ["float32"], "faster-whisper": ["int8", "float32"]}
+
+FINALS = str.maketrans("ךםןףץ", "כמנפצ")
+
+
+# ── Scoring ──────────────────────────────────────────────────────────────────
+
+def normalize_words(text):
+    """Hebrew-aware word list: no niqqud/cantillation, no punctuation, no final
+    letters, lowercase Latin."""
+    text = unicodedata.normalize("NFD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.translate(FINALS).lower()
+    return re.findall(r"[\w]+", text)
+
+
+def wer(reference, hypothesis):
+    """Word error rate = word-level edit distance / reference length."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def reference_text(module_id, lesson_num, seconds, audio_seconds):
+    """(reference, exact) — the stored transcript, cut at `seconds` if clipping."""
+    text = store.read_lesson(module_id, lesson_num)["transcript"] or ""
+    if not seconds or seconds >= audio_seconds:
+        return text, True
+    segments = store.load_segments(module_id, lesson_num)
+    if segments is not None and len(segments):
+        i = segments.segment_at(seconds)
+        return text[:segments.offsets[i + 1] if i is not None else 0], True
+    return text[:int(len(text) * seconds / audio_seconds)], False
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:  # Windows
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+# ── Audio ────────────────────────────────────────────────────────────────────
+
+def ensure_audio(video_id):
+    path = AUDIO_DIR / f"{video_id}.mp3"
+    if path.exists():
+        return path
+    import yt_dlp
+    AUDIO_DIR.mkdir(exist_ok=True)
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': '128',
+        }],
+        'outtmpl': str(path.with_suffix('')),
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        ydl.download([f"https://www.youtube.com/watch?v={video_id}"])
+    return path
+
+
+# ── Worker (runs in a child process, one combination) ────────────────────────
+
+def run_worker(spec):
+    backend, model_name, quant = spec["backend"], spec["model"], spec["quant"]
+    t0 = time.perf_counter()
+    if backend == "whisper":
+        import whisper
+        model = whisper.load_model(model_name, device="cpu")
+        load_audio = whisper.load_audio
+
+        def transcribe(audio):
+            return model.transcribe(audio, language="he", fp16=False)["text"]
+    else:
+        from faster_whisper import WhisperModel, decode_audio
+        model = WhisperModel(model_name, device="cpu", compute_type=quant)
+
+        def load_audio(path):
+            return decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+        def transcribe(audio):
+            segments, _ = model.transcribe(audio, language="he")
+            return "".join(s.text for s in segments)
+    load_s = time.perf_counter() - t0
+
+    out = []
+    for item in spec["lessons"]:
+        audio = load_audio(item["audio"])
+        if spec["seconds"]:
+            audio = audio[:spec["seconds"] * SAMPLE_RATE]
+        t0 = time.perf_counter()
+        text = transcribe(audio)
+        out.append({"lesson": item["lesson"], "audio_s": len(audio) / SAMPLE_RATE,
+                    "wall_s": time.perf_counter() - t0, "text": text})
+    return {"load_s": load_s, "peak_rss_mb": peak_rss_mb(), "lessons": out}
+
+
+def run_combination(spec):
+    """Run one combination in a fresh interpreter; returns its result dict or an error."""
+    proc = subprocess.run([sys.executable, __file__, "--worker", json.dumps(spec)],
+                          capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ["no output"]
+        return {"error": tail[0][:160]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    if "--worker" in sys.argv:
+        sys.stdout.reconfigure(encoding="utf-8")
+        print(json.dumps(run_worker(json.loads(sys.argv[sys.argv.index("--worker") + 1])),
+                         ensure_ascii=False))
+        return
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lessons", default=",".join(SAMPLE), help="module.lesson list")
+    ap.add_argument("--models", default=",".join(MODELS))
+    ap.add_argument("--backends", default=",".join(BACKENDS))
+    ap.add_argument("--quant", default="", help="restrict quantizations, e.g. int8")
+    ap.add_argument("--seconds", type=int, default=0, help="transcribe only the first N seconds")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+
+    lessons = []
+    for ref in args.lessons.split(","):
+        m, l = (int(x) for x in ref.split("."))
+        lesson = store.read_lesson(m, l)
+        if not lesson or not lesson["transcript"] or not lesson["id"]:
+            print(f"  skip {ref}: no reviewed transcript / video id in the store")
+            continue
+        print(f"  audio {ref} ({lesson['id']})...", end=" ", flush=True)
+        try:
+            lessons.append({"lesson": ref, "audio": str(ensure_audio(lesson["id"]))})
+            print("OK")
+        except Exception as e:
+            print(f"FAILED: {e}")
+    if not lessons:
+        raise SystemExit("no lessons to benchmark")
+
+    only_quant = set(filter(None, args.quant.split(",")))
+    rows = []
+    for backend in args.backends.split(","):
+        for model in args.models.split(","):
+            for quant in QUANT[backend]:
+                if only_quant and quant not in only_quant:
+                    continue
+                label = f"{backend} / {model} / {quant}"
+                print(f"\n{label} ...", flush=True)
+                res = run_combination({"backend": backend, "model": model, "quant": quant,
+                                       "seconds": args.seconds, "lessons": lessons})
+                if "error" in res:
+                    print(f"  FAILED: {res['error']}")
+                    rows.append({"label": label, "error": res["error"]})
+                    continue
+                audio = wall = 0.0
+                wers, exact = [], True
+                for r in res["lessons"]:
+                    m, l = (int(x) for x in r["lesson"].split("."))
+                    ref, ok = reference_text(m, l, args.seconds, r["audio_s"])
+                    exact &= ok
+                    wers.append(wer(ref, r["text"]))
+                    audio += r["audio_s"]
+                    wall += r["wall_s"]
+                    print(f"  {r['lesson']}: RTF {r['wall_s'] / r['audio_s']:.2f}  WER {wers[-1]:.1%}")
+                rows.append({"label": label, "rtf": wall / audio, "load_s": res["load_s"],
+                             "rss": res["peak_rss_mb"], "wer": sum(wers) / len(wers),
+                             "exact": exact, "audio_min": audio / 60})
+
+    today = datetime.date.today()
+    L = [f"# בנצ'מרק תמלול · {today}\n",
+         f"שיעורים: {', '.join(x['lesson'] for x in lessons)}"
+         + (f" · {args.seconds} שניות ראשונות מכל שיעור" if args.seconds else " · שיעורים מלאים"),
+         "\nWER מול התמלולים המאושרים ב-docs/transcripts/per-lesson (אחרי נרמול ניקוד, פיסוק ואותיות סופיות).\n",
+         "| backend / model / quant | RTF | טעינה (ש') | peak RSS (MB) | WER |",
+         "|---|---|---|---|---|"]
+    for r in sorted(rows, key=lambda r: (r.get("wer", 9), r.get("rtf", 9))):
+        if "error" in r:
+            L.append(f"| {r['label']} | — | — | — | נכשל: {r['error']} |")
+            continue
+        L.append(f"| {r['label']} | {r['rtf']:.2f} | {r['load_s']:.1f} | {r['rss']:.0f} | "
+                 f"{'' if r['exact'] else '≈'}{r['wer']:.1%} |")
+    out = ROOT / "docs" / f"transcription-benchmark-{today}.md"
+    out.write_text("\n".join(L) + "\n", encoding="utf-8")
+    print("\n" + "\n".join(L[3:]))
+    print(f"\nwrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent YouTube caption harvester — one language probe per video.
+
+The old path asked YouTube for ['iw','he'], then ['iw'], then ['he'], then any
+language: up to four sequential fetches per video, each one paying for the watch
+page again, with every exception swallowed by a bare `except:`. A full course
+sweep took minutes and a blocked IP looked exactly like "this video has no
+captions".
+
+Here each video costs one list() call (the track list comes back with the watch
+page anyway) and one fetch() of the best track:
+
+    manual Hebrew > auto Hebrew > manual any language > auto any language
+
+Videos run concurrently on a small thread pool, under one shared rate limit so a
+sweep never looks like a flood. Definitive "no captions" answers (disabled,
+no tracks, video unavailable) are cached in caption-harvest.state.json for
+NEGATIVE_TTL_DAYS, so re-runs skip them; transient failures (network, request
+blocked) are reported and NOT cached.
+
+  py scripts/caption_harvester.py            # harvest every lesson still missing a transcript
+  py scripts/caption_harvester.py --refresh  # ignore the negative cache
+"""
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from transcript_segments import SegmentTable
+
+STATE_FILE = Path(__file__).resolve().parent / "caption-harvest.state.json"
+HEBREW = ("iw", "he")  # 'iw' is YouTube's legacy code for Hebrew
+WORKERS = 8
+REQUESTS_PER_SEC = 4.0
+NEGATIVE_TTL_DAYS = 14
+
+
+class RateLimiter:
+    """Spaces calls at least 1/per_sec apart across all threads."""
+
+    def __init__(self, per_sec):
+        self.interval = 1.0 / per_sec
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+def best_track(transcript_list):
+    """Pick the caption track to fetch from a TranscriptList, or None."""
+    tracks = list(transcript_list)
+    if not tracks:
+        return None
+
+    def rank(t):
+        return (t.language_code not in HEBREW, t.is_generated)
+    return min(tracks, key=rank)
+
+
+def load_negative_cache():
+    try:
+        return json.loads(STATE_FILE.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def save_negative_cache(cache):
+    STATE_FILE.write_text(json.dumps(cache, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+def _fresh(entry):
+    try:
+        at = datetime.fromisoformat(entry["at"])
+    except Exception:
+        return False
+    return datetime.now(timezone.utc) - at < timedelta(days=NEGATIVE_TTL_DAYS)
+
+
+def harvest(video_ids, workers=WORKERS, per_sec=REQUESTS_PER_SEC, refresh=False):
+    """Fetch captions for many videos concurrently.
+
+    Returns {video_id: (segments, info)} where segments is a SegmentTable or None
+    and info is the picked language ("he", "he (auto)", ...) or the reason there
+    are no captions. Negative results are cached unless they were transient."""
+    from youtube_transcript_api import YouTubeTranscriptApi
+    from youtube_transcript_api._errors import (
+        NoTranscriptFound, TranscriptsDisabled, VideoUnavailable)
+    definitive = (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable)
+
+    cache = load_negative_cache()
+    limiter = RateLimiter(per_sec)
+    local = threading.local()  # requests.Session inside the api is not thread-safe
+    results, misses = {}, {}
+
+    todo = []
+    for vid in dict.fromkeys(video_ids):
+        entry = None if refresh else cache.get(vid)
+        if entry and _fresh(entry):
+            results[vid] = (None, f"cached: {entry['reason']}")
+        else:
+            todo.append(vid)
+
+    def one(vid):
+        if not hasattr(local, "api"):
+            local.api = YouTubeTranscriptApi()
+        try:
+            limiter.wait()
+            track = best_track(local.api.list(vid))
+            if track is None:
+                misses[vid] = "no caption tracks"
+                return vid, (None, misses[vid])
+            limiter.wait()
+            segments = SegmentTable.from_youtube(track.fetch())
+            if not segments.text.strip():
+                misses[vid] = f"empty {track.language_code} track"
+                return vid, (None, misses[vid])
+            label = track.language_code + (" (auto)" if track.is_generated else "")
+            return vid, (segments, label)
+        except definitive as e:
+            misses[vid] = type(e).__name__
+            return vid, (None, misses[vid])
+        except Exception as e:  # network / blocked — worth retrying next run
+            return vid, (None, f"error: {type(e).__name__}: {str(e)[:80]}")
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            for vid, res in pool.map(one, todo):
+                results[vid] = res
+        now = datetime.now(timezone.utc).isoformat()
+        for vid in todo:
+            if vid in misses:
+                cache[vid] = {"reason": misses[vid], "at": now}
+            elif results[vid][0] is not None:
+                cache.pop(vid, None)
+        save_negative_cache(cache)
+    return results
+
+
+def main():
+    import transcript_store as store
+
+    sys.stdout.reconfigure(encoding="utf-8")
+    missing = store.find_missing(store.load_course())
+    if not missing:
+        print("All lessons already have transcripts!")
+        return
+    started = time.monotonic()
+    results = harvest([vid for _, _, vid, _ in missing], refresh="--refresh" in sys.argv)
+    ok = 0
+    for mod_id, les_num, vid, title in missing:
+        segments, info = results[vid]
+        if segments:
+            store.save_lesson(mod_id, les_num, segments=segments)
+            ok += 1
+            print(f"  {mod_id}.{les_num}: {title} — OK [{info}] ({len(segments.text)} chars)")
+        else:
+            print(f"  {mod_id}.{les_num}: {title} — no captions ({info})")
+    if ok:
+        store.render()
+    print(f"\n{ok}/{len(missing)} filled from captions in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -50,29 +50,36 @@ def send_whatsapp(message):
     urllib.request.urlopen(req, timeout=15).read()
 
 
-def main():
+def check():
+    """(exit code, message) — code 0 = fresh backup; otherwise message is the alert."""
     if not BACKUP_ROOT.exists():
-        send_whatsapp(f"🚨 watchdog: תיקיית הגיבויים לא קיימת — {BACKUP_ROOT}")
-        sys.exit(2)
+        return 2, f"🚨 watchdog: תיקיית הגיבויים לא קיימת — {BACKUP_ROOT}"
 
     zips = sorted(BACKUP_ROOT.glob("backup_*.zip"), key=lambda f: f.stat().st_mtime, reverse=True)
     if not zips:
-        send_whatsapp("🚨 watchdog: אין אף קובץ גיבוי בתיקייה. הגיבוי האוטומטי לא רץ או נכשל.")
-        sys.exit(2)
+        return 2, "🚨 watchdog: אין אף קובץ גיבוי בתיקייה. הגיבוי האוטומטי לא רץ או נכשל."
 
     newest = zips[0]
     age = datetime.now() - datetime.fromtimestamp(newest.stat().st_mtime)
     if age > timedelta(hours=MAX_AGE_HOURS):
         last_str = datetime.fromtimestamp(newest.stat().st_mtime).strftime("%Y-%m-%d %H:%M")
         hours = int(age.total_seconds() // 3600)
-        send_whatsapp(
+        return 1, (
             f"🚨 watchdog: אין גיבוי טרי ב-{MAX_AGE_HOURS} השעות האחרונות.\n"
             f"גיבוי אחרון: {last_str} (לפני {hours} שעות)\n"
             f"בדקי את BeitVmetaplim-DailyBackup ב-Task Scheduler."
         )
-        sys.exit(1)
 
-    print(f"OK — newest backup: {newest.name} ({int(age.total_seconds() // 3600)}h old)")
+    return 0, f"newest backup: {newest.name} ({int(age.total_seconds() // 3600)}h old)"
+
+
+def main():
+    code, message = check()
+    if code:
+        send_whatsapp(message)
+        sys.exit(code)
+
+    print(f"OK — {message}")
     sys.exit(0)
 
 
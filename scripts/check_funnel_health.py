@@ -18,19 +18,43 @@ also catches deploy drift:
   3. Known regressions — pages must not write the dropped `roles:` column to
                          profiles (made the portal signup upsert fail silently).
 
+Layers 2 and 3 run over the WHOLE site: every page in the live sitemap.xml
+(plus any page a rule names explicitly) is fetched concurrently — WORKERS
+threads, each keeping one keep-alive connection open, gzip, conditional
+requests. The ETag / Last-Modified of each page is cached in
+scripts/journey_state/funnel_cache.json; a 304 means the HTML is unchanged,
+so the page's previous verdict stands (unless the rules changed since). The
+rules themselves live in scripts/funnel_rules.json. Status, TTFB and
+transfer size per page are written to scripts/journey_state/funnel_crawl.json.
+
 On ANY failure it sends ONE WhatsApp to Hillel and exits non-zero.
 Zero junk: it never creates a real lead.
 
-Run daily via Windows Scheduled Task (see install note at bottom).
-Independent of any one form — add a page to PAGES and it's covered.
+  python scripts/check_funnel_health.py              # backend + whole-site crawl
+  python scripts/check_funnel_health.py --no-alert   # print only, no WhatsApp
+  python scripts/check_funnel_health.py --site https://preview.vercel.app
+
+Run daily via Windows Scheduled Task.
+Independent of any one form — add a rule to funnel_rules.json and it's covered.
 """
 
+import argparse
+import fnmatch
+import gzip
+import hashlib
+import http.client
 import json
 import os
 import sys
+import threading
+import time
 import urllib.request
 import urllib.error
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
+from urllib.parse import urljoin, urlsplit
 
 
 def _load_env_local():
@@ -64,24 +88,13 @@ ANON_KEY = (
     "ESXViZ0DZxopHxHNuC6vRn3iIZz1KZkQcXwgLhK_nQw"
 )
 
-# Public pages that capture leads / registrations. Each entry says what the
-# page's HTML must (and must not) contain. Add new lead forms here.
-PAGES = [
-    {
-        "name": "שאלון התאמה",
-        "url": f"{SITE}/pages/questionnaire-form.html",
-        "must_have": ["submit-lead", "turnstileToken", "challenges.cloudflare.com"],
-        "must_not_have": [],
-    },
-    {
-        "name": "הרשמה לפורטל (v2)",
-        "url": f"{SITE}/pages/free-portal-v2.html",
-        # signs up via auth, then redirects to portal-questionnaire; must still
-        # gate with Turnstile and must NOT write the dropped `roles:` column.
-        "must_have": ["turnstileToken", "challenges.cloudflare.com"],
-        "must_not_have": ["roles: ['student_lead']", 'roles: ["student_lead"]'],
-    },
-]
+RULES_FILE = Path(__file__).resolve().parent / "funnel_rules.json"
+STATE_DIR = Path(__file__).resolve().parent / "journey_state"
+CACHE_FILE = STATE_DIR / "funnel_cache.json"
+REPORT_FILE = STATE_DIR / "funnel_crawl.json"
+USER_AGENT = "funnel-watchdog/1.0"
+WORKERS = 8
+MAX_REDIRECTS = 5
 
 
 def send_whatsapp(message):
@@ -93,12 +106,6 @@ def send_whatsapp(message):
     urllib.request.urlopen(req, timeout=15).read()
 
 
-def fetch(url, timeout=20):
-    req = urllib.request.Request(url, headers={"User-Agent": "funnel-watchdog/1.0"})
-    with urllib.request.urlopen(req, timeout=timeout) as r:
-        return r.status, r.read().decode("utf-8", "replace")
-
-
 def check_backend(failures):
     """submit-lead must be alive and still rejecting tokenless POSTs (403)."""
     url = f"{FUNCTIONS_URL}/submit-lead"
@@ -129,43 +136,218 @@ def check_backend(failures):
         )
 
 
-def check_pages(failures):
-    for p in PAGES:
-        try:
-            status, html = fetch(p["url"])
-        except Exception as e:
-            failures.append(f"\"{p['name']}\" לא נטען: {type(e).__name__}.")
-            continue
-        if status != 200:
-            failures.append(f"\"{p['name']}\" מחזיר HTTP {status} (לא 200).")
+# ---- Whole-site crawl -------------------------------------------------------
+
+def load_rules():
+    raw = RULES_FILE.read_bytes()
+    return json.loads(raw.decode("utf-8"))["rules"], hashlib.sha1(raw).hexdigest()
+
+
+def is_literal(pattern):
+    return not any(c in pattern for c in "*?[")
+
+
+def rules_for(path, rules):
+    return [r for r in rules if fnmatch.fnmatchcase(path, r["match"])]
+
+
+def page_name(path, rules):
+    for r in rules_for(path, rules):
+        if r.get("name"):
+            return r["name"]
+    return path
+
+
+def apply_rules(name, html, rules):
+    """Failure messages for one page's HTML."""
+    out = []
+    for r in rules:
+        if r.get("if_has") and r["if_has"] not in html:
             continue
-        for token in p["must_have"]:
+        for token in r.get("must_have", []):
             if token not in html:
-                failures.append(
-                    f"\"{p['name']}\" חסר רכיב חובה בקוד החי: '{token}'. "
+                out.append(
+                    f"\"{name}\" חסר רכיב חובה בקוד החי: '{token}'. "
                     f"הטופס כנראה שבור."
                 )
-        for token in p["must_not_have"]:
+        for token in r.get("must_not_have", []):
             if token in html:
-                failures.append(
-                    f"\"{p['name']}\" מכיל קוד פגום שאמור היה להימחק: '{token}'."
+                out.append(
+                    f"\"{name}\" מכיל קוד פגום שאמור היה להימחק: '{token}'."
                 )
+    return out
+
+
+def sitemap_paths(xml_text):
+    root = ET.fromstring(xml_text)
+    return [urlsplit(loc.text.strip()).path or "/"
+            for loc in root.iter("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
+            if loc.text]
+
+
+class Pool:
+    """One keep-alive connection per (worker thread, host)."""
+
+    def __init__(self, timeout=20):
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _conn(self, scheme, netloc, fresh=False):
+        conns = self.local.__dict__.setdefault("conns", {})
+        key = (scheme, netloc)
+        if fresh or key not in conns:
+            if key in conns:
+                conns[key].close()
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conns[key] = cls(netloc, timeout=self.timeout)
+        return conns[key]
+
+    def get(self, url, headers):
+        """(status, response headers, raw body, ttfb seconds) — follows redirects."""
+        for _ in range(MAX_REDIRECTS + 1):
+            u = urlsplit(url)
+            target = (u.path or "/") + (f"?{u.query}" if u.query else "")
+            for attempt in (0, 1):   # a keep-alive connection the server closed: retry once
+                conn = self._conn(u.scheme, u.netloc, fresh=attempt == 1)
+                try:
+                    t0 = time.perf_counter()
+                    conn.request("GET", target, headers={
+                        "User-Agent": USER_AGENT, "Accept-Encoding": "gzip", **headers})
+                    resp = conn.getresponse()
+                    ttfb = time.perf_counter() - t0
+                    raw = resp.read()
+                    break
+                except (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                        http.client.ImproperConnectionState,
+                        ConnectionResetError, BrokenPipeError):
+                    if attempt:
+                        raise
+                except Exception:
+                    conn.close()   # half-read; the next request on it would fail
+                    raise
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                url = urljoin(url, resp.getheader("Location"))
+                continue
+            return resp.status, resp, raw, ttfb
+        raise RuntimeError(f"too many redirects: {url}")
+
+
+def crawl_page(pool, site, path, rules, rules_sha, cached):
+    """One page: status, timings and its failure messages."""
+    name = page_name(path, rules)
+    mine = rules_for(path, rules)
+    prev = cached if cached and cached.get("rules") == rules_sha else None
+    cond = {}
+    if prev and prev.get("etag"):
+        cond["If-None-Match"] = prev["etag"]
+    if prev and prev.get("last_modified"):
+        cond["If-Modified-Since"] = prev["last_modified"]
+    rec = {"path": path, "name": name}
+    try:
+        status, resp, raw, ttfb = pool.get(site + path, cond)
+    except Exception as e:
+        rec.update(status=None, failures=[f"\"{name}\" לא נטען: {type(e).__name__}."])
+        return rec
+    rec.update(status=status, ttfb_ms=round(ttfb * 1000), bytes=len(raw))
+    if status == 304 and prev:
+        rec.update(cached=True, etag=prev.get("etag"), last_modified=prev.get("last_modified"),
+                   failures=prev["failures"])
+        return rec
+    if status != 200:
+        rec["failures"] = [f"\"{name}\" מחזיר HTTP {status} (לא 200)."]
+        return rec
+    if resp.getheader("Content-Encoding", "").lower() == "gzip":
+        raw = gzip.decompress(raw)
+    html = raw.decode("utf-8", "replace")
+    rec.update(cached=False, etag=resp.getheader("ETag"),
+               last_modified=resp.getheader("Last-Modified"),
+               failures=apply_rules(name, html, mine))
+    return rec
+
+
+def crawl(site, sitemap=None):
+    """Fetch every sitemap page (+ pages rules name) at once. Returns the page records;
+    a sitemap that can't be read is itself a failure record."""
+    rules, rules_sha = load_rules()
+    pool = Pool()
+    try:
+        if sitemap and not sitemap.startswith(("http://", "https://")):
+            xml_text = Path(sitemap).read_text(encoding="utf-8")
+        else:
+            status, resp, raw, _ = pool.get(sitemap or f"{site}/sitemap.xml", {})
+            if status != 200:
+                raise RuntimeError(f"HTTP {status}")
+            if resp.getheader("Content-Encoding", "").lower() == "gzip":
+                raw = gzip.decompress(raw)
+            xml_text = raw.decode("utf-8")
+        paths = sitemap_paths(xml_text)
+    except Exception as e:
+        return [{"path": "/sitemap.xml", "name": "sitemap.xml", "status": None,
+                 "failures": [f"\"sitemap.xml\" לא נטען: {type(e).__name__}."]}]
+    for r in rules:
+        if is_literal(r["match"]) and r["match"] not in paths:
+            paths.append(r["match"])
+
+    try:
+        cache = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cache = {}
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        pages = list(ex.map(
+            lambda p: crawl_page(pool, site, p, rules, rules_sha, cache.get(site + p)), paths))
+
+    for p in pages:
+        if p["status"] in (200, 304) and (p.get("etag") or p.get("last_modified")):
+            cache[site + p["path"]] = {"etag": p.get("etag"), "last_modified": p.get("last_modified"),
+                                       "rules": rules_sha, "failures": p["failures"]}
+        else:
+            cache.pop(site + p["path"], None)
+    STATE_DIR.mkdir(exist_ok=True)
+    CACHE_FILE.write_text(json.dumps(cache, ensure_ascii=False, indent=1), encoding="utf-8")
+    return pages
+
+
+def check_pages(failures, site=SITE, sitemap=None):
+    t0 = time.perf_counter()
+    pages = crawl(site, sitemap)
+    elapsed = time.perf_counter() - t0
+    for p in pages:
+        failures.extend(p["failures"])
+    STATE_DIR.mkdir(exist_ok=True)
+    REPORT_FILE.write_text(json.dumps({
+        "at": datetime.now().isoformat(timespec="seconds"), "site": site,
+        "seconds": round(elapsed, 2),
+        "pages": [{k: p.get(k) for k in ("path", "status", "ttfb_ms", "bytes", "cached")}
+                  for p in pages],
+    }, ensure_ascii=False, indent=1), encoding="utf-8")
+    for p in sorted(pages, key=lambda p: p["path"]):
+        print(f"  {p['status'] or '---'}  {p.get('ttfb_ms', '-'):>5}ms  "
+              f"{p.get('bytes', 0) / 1024:7.1f}KB  {'304' if p.get('cached') else '   '}  {p['path']}")
+    print(f"  {len(pages)} pages in {elapsed:.1f}s")
 
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--site", default=SITE, help="base URL to crawl (default: production)")
+    ap.add_argument("--sitemap", help="sitemap URL or local file (default: <site>/sitemap.xml)")
+    ap.add_argument("--no-alert", action="store_true", help="print failures, no WhatsApp")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+
     failures = []
     check_backend(failures)
-    check_pages(failures)
+    check_pages(failures, args.site.rstrip("/"), args.sitemap)
 
     if failures:
         msg = "🚨 בדיקת משפך לידים נכשלה (בית המטפלים):\n\n" + "\n".join(
             f"• {f}" for f in failures
         ) + "\n\nלידים אולי לא נכנסים כרגע — כדאי לבדוק מיד."
-        send_whatsapp(msg)
+        if not args.no_alert:
+            send_whatsapp(msg)
         print("FAIL:\n" + "\n".join(failures))
         sys.exit(1)
 
-    print("OK — funnel healthy (backend enforcing, all forms wired).")
+    print("OK — funnel healthy (backend enforcing, all pages pass).")
     sys.exit(0)
 
 
@@ -31,6 +31,8 @@ import urllib.request
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import send_scheduler
+
 
 def _load_env_local():
     env_file = Path(__file__).resolve().parent.parent / ".env.local"
@@ -119,8 +121,18 @@ def send_email(subject, html_body):
     })
     url = f"{GMAIL_API_URL}?{params}"
     req = urllib.request.Request(url)
-    with urllib.request.urlopen(req, timeout=20) as resp:
-        return resp.read().decode("utf-8")
+    # Alert class: jumps ahead of any campaign draining the shared Gmail quota
+    sched = send_scheduler.Scheduler("green_api_canary", send_scheduler.ALERT)
+    if not sched.acquire(timeout=300):
+        raise RuntimeError("no Gmail send slot (daily quota used up)")
+    try:
+        with urllib.request.urlopen(req, timeout=20) as resp:
+            text = resp.read().decode("utf-8")
+    except Exception as e:
+        sched.release(False, e)
+        raise
+    sched.release('"success":true' in text.replace(" ", ""), text)
+    return text
 
 
 def alert_broken(reason):
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Rank, percentile and "top X%" for learners, inside whatever cohort you slice.
+
+monthly_journey_email ranked every learner with totals_sorted.index(total) inside the
+per-learner loop — a linear scan per learner, quadratic overall — and hot_learners
+had its own tier cut-offs. Here each cohort is sorted ONCE and every question is a
+binary search:
+
+    stats = CohortStats(people, value=lambda p: p["lessons"],
+                        slices={"signup": lambda p: (p["created_at"] or "")[:7]})
+    c = stats.cohort()                       # everyone
+    c = stats.cohort("signup", "2026-08")    # joined in August
+    c.rank(12)        # 1 + how many scored more (ties share the best rank)
+    c.below(12)       # % of the cohort strictly below 12
+    c.top_pct(12)     # "you are in the top N%"  (rank / size, in percent)
+    c.cutoff(10)      # smallest value that still makes the top 10%
+
+Slices are plain functions person → key (or an iterable of keys, for people who
+belong to several cohorts at once, e.g. every course they studied). The helpers
+below build the three the reports use: by course, by signup month, by activity
+window. Building is O(n log n) for all cohorts together; each query is O(log n).
+"""
+import math
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+ACTIVITY_WINDOWS = (7, 30, 90)
+
+
+class Cohort:
+    def __init__(self, values):
+        self.values = sorted(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def rank(self, v):
+        """1-based, best first; equal values share the best rank."""
+        return len(self.values) - bisect_right(self.values, v) + 1
+
+    def below(self, v):
+        """Percent of the cohort strictly below v (0-100)."""
+        return bisect_left(self.values, v) / len(self.values) * 100 if self.values else 0.0
+
+    def top_pct(self, v):
+        """v's position from the top as a percent of the cohort (top 1% = best)."""
+        return self.rank(v) / len(self.values) * 100 if self.values else 100.0
+
+    def cutoff(self, pct):
+        """Smallest value whose holder is inside the top `pct` percent."""
+        if not self.values:
+            return None
+        k = max(1, math.floor(len(self.values) * pct / 100))  # how many fit in the top pct
+        return self.values[-k]
+
+
+class CohortStats:
+    def __init__(self, people, value, slices=None):
+        self.slices = slices or {}
+        buckets = defaultdict(list)
+        for p in people:
+            v = value(p)
+            buckets[("all", None)].append(v)
+            for name, fn in self.slices.items():
+                keys = fn(p)
+                if keys is None:
+                    continue
+                if isinstance(keys, (str, int)):
+                    keys = (keys,)
+                for k in keys:
+                    buckets[(name, k)].append(v)
+        self._cohorts = {k: Cohort(v) for k, v in buckets.items()}
+        self._empty = Cohort(())
+
+    def cohort(self, slice_name=None, key=None):
+        if slice_name is not None and slice_name not in self.slices:
+            raise KeyError(f"no slice named {slice_name!r}")
+        return self._cohorts.get((slice_name or "all", key), self._empty)
+
+    def keys(self, slice_name):
+        return sorted(k for name, k in self._cohorts if name == slice_name)
+
+
+# ── Slices over learner_features rows ────────────────────────────────────────
+
+def by_course(p):
+    """Every course the person finished a lesson in."""
+    return [c for c, n in (p.get("courses") or {}).items() if n]
+
+
+def by_signup_month(p):
+    return (p.get("created_at") or "")[:7] or None
+
+
+def by_activity(p, windows=ACTIVITY_WINDOWS):
+    """Every window (in days) the person was active within: 7 ⊂ 30 ⊂ 90."""
+    d = p.get("days_ago")
+    return [] if d is None else [w for w in windows if d <= w]
+
+
+LEARNER_SLICES = {"course": by_course, "signup": by_signup_month, "active": by_activity}
+
+
+def rounded_top(pct, step=5):
+    """Copy-friendly "top N%": rounded up to the next `step`, never below `step`."""
+    return max(step, math.ceil(pct / step) * step)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+The free practitioner course — modules, lessons, video ids, titles, durations — in one
+place for every script.
+
+The course layout lived in five copies: learner_features regex-parsed the 350KB portal
+page on every build, download_transcripts and whisper_transcripts carried hand-typed
+lesson lists (with the course's first-draft titles and durations), whisper_batch a
+(module, lesson) → mp3 map, monthly_journey_email a hard-coded "51 lessons". Each
+copy drifted on its own whenever a lesson was renamed or re-cut.
+
+PRACTITIONER_MODULES in pages/course-library-v2.html stays the source of truth (it is
+what learners see). It is parsed once into a compact index, data/course-catalog.json,
+together with the page's sha1; load() re-parses only when the page changed. Loaded,
+every lookup is a dict or list index:
+
+    cat = course_catalog.load()
+    cat.get(video_id)           # Lesson(video_id, title, duration, module_id,
+                                #        module_title, num, pos) or None
+    cat.at(module_id, num)      # the num-th (1-based) lesson of a module
+    cat.next_unwatched(done)    # first lesson, in course order, not in `done`
+    len(cat), list(cat)         # 51 lessons in course order
+
+Only the free course is indexed. The master/techniques catalog is paid content served
+by the backend, and its video ids must not end up in a file under data/.
+
+  py scripts/course_catalog.py              # rebuild if stale + summary
+  py scripts/course_catalog.py --list       # every lesson with its position
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGE = ROOT / "pages" / "course-library-v2.html"
+INDEX_FILE = ROOT / "data" / "course-catalog.json"
+FORMAT_VERSION = 1
+
+MODULE_RE = re.compile(r"\{\s*id:\s*(\d+),\s*title:\s*'((?:[^'\\]|\\.)*)',\s*lessons:\s*\[(.*?)\]\s*\}",
+                       re.S)
+LESSON_RE = re.compile(r"\{\s*id:\s*'([^']+)',\s*title:\s*'((?:[^'\\]|\\.)*)'"
+                       r"(?:,\s*duration:\s*'([^']*)')?")
+
+Lesson = namedtuple("Lesson", "video_id title duration module_id module_title num pos")
+
+
+def _unescape(s):
+    return s.replace("\\'", "'")
+
+
+def parse_page(src):
+    """The PRACTITIONER_MODULES literal → (modules [[id, title]],
+    lessons [[video_id, title, duration, module_id]]), in course order."""
+    start = src.index("PRACTITIONER_MODULES = [")
+    end = src.index("\n  ];", start)
+    modules, lessons = [], []
+    for mid, mtitle, body in MODULE_RE.findall(src[start:end]):
+        modules.append([int(mid), _unescape(mtitle)])
+        for vid, title, duration in LESSON_RE.findall(body):
+            lessons.append([vid, _unescape(title), duration, int(mid)])
+    if not lessons:
+        raise ValueError("PRACTITIONER_MODULES has no lessons — did the page layout change?")
+    return modules, lessons
+
+
+class Catalog:
+    def __init__(self, modules, lessons):
+        self.modules = [(mid, title) for mid, title in modules]
+        titles = dict(self.modules)
+        out, start, num = [], {}, 0
+        for pos, (vid, title, duration, mid) in enumerate(lessons):
+            if mid not in start:
+                start[mid], num = pos, 0
+            num += 1
+            out.append(Lesson(vid, title, duration, mid, titles.get(mid, ""), num, pos))
+        self.lessons = tuple(out)
+        self._pos = {l.video_id: l.pos for l in out}
+        self._start = start
+
+    def __len__(self):
+        return len(self.lessons)
+
+    def __iter__(self):
+        return iter(self.lessons)
+
+    def __contains__(self, video_id):
+        return video_id in self._pos
+
+    @property
+    def ids(self):
+        return self._pos.keys()
+
+    def get(self, video_id):
+        pos = self._pos.get(video_id)
+        return None if pos is None else self.lessons[pos]
+
+    def at(self, module_id, num):
+        """Lesson `num` (1-based) of module `module_id`, or None."""
+        start = self._start.get(module_id)
+        if start is None or num < 1:
+            return None
+        pos = start + num - 1
+        if pos < len(self.lessons) and self.lessons[pos].module_id == module_id:
+            return self.lessons[pos]
+        return None
+
+    def module(self, module_id):
+        """The module's lessons, in order."""
+        start = self._start.get(module_id)
+        if start is None:
+            return ()
+        end = start
+        while end < len(self.lessons) and self.lessons[end].module_id == module_id:
+            end += 1
+        return self.lessons[start:end]
+
+    def next_unwatched(self, done):
+        """First lesson in course order whose video id is not in `done` (None when the
+        course is finished). Sorts the learner's positions instead of walking the
+        course: O(k log k) in the lessons they did, not O(course)."""
+        positions = sorted({p for p in map(self._pos.get, done) if p is not None})
+        for i, p in enumerate(positions):
+            if p != i:
+                return self.lessons[i]
+        return self.lessons[len(positions)] if len(positions) < len(self.lessons) else None
+
+    def to_json(self):
+        return {"modules": [list(m) for m in self.modules],
+                "lessons": [[l.video_id, l.title, l.duration, l.module_id] for l in self.lessons]}
+
+
+# ── Index file ───────────────────────────────────────────────────────────────
+
+_cache = {}
+
+
+def _page_sha1():
+    try:
+        return hashlib.sha1(PAGE.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def build():
+    """Parse the portal page and write the index (atomically)."""
+    raw = PAGE.read_bytes()
+    modules, lessons = parse_page(raw.decode("utf-8").replace("\r\n", "\n"))
+    cat = Catalog(modules, lessons)
+    data = {"version": FORMAT_VERSION, "source": PAGE.relative_to(ROOT).as_posix(),
+            "sha1": hashlib.sha1(raw).hexdigest(), **cat.to_json()}
+    INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = INDEX_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n",
+                   encoding="utf-8")
+    os.replace(tmp, INDEX_FILE)
+    return cat
+
+
+def load():
+    """The catalog, from the index — rebuilt first when the page no longer matches it.
+    Without the page (a checkout of scripts/ + data/ only) the index is used as is."""
+    if "catalog" in _cache:
+        return _cache["catalog"]
+    try:
+        data = json.loads(INDEX_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        data = None
+    sha1 = _page_sha1()
+    if (data is None or data.get("version") != FORMAT_VERSION
+            or (sha1 is not None and data.get("sha1") != sha1)):
+        cat = build()
+    else:
+        cat = Catalog(data["modules"], data["lessons"])
+    _cache["catalog"] = cat
+    return cat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--list", action="store_true", help="print every lesson")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    cat = load()
+    print(f"{len(cat)} lessons in {len(cat.modules)} modules ({INDEX_FILE.relative_to(ROOT).as_posix()})")
+    for mid, title in cat.modules:
+        lessons = cat.module(mid)
+        print(f"  {mid}. {title} ({len(lessons)})")
+        if args.list:
+            for l in lessons:
+                print(f"      {l.pos:>3} {l.module_id}.{l.num:<2} {l.video_id}  {l.duration:>6}  {l.title}")
+
+
+if __name__ == "__main__":
+    main()
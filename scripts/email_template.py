@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled email templates that know their own URL-encoded size.
+
+The Apps Script mailer takes the whole message as a GET query string, and Google
+rejects URLs past ~7.5K characters (monthly_journey_email.URL_BUDGET). The monthly
+email used to find out whether it fit by rendering the full HTML and running
+urlencode over it — up to three times per learner, dropping a quote each time.
+
+Percent-encoding is per character, so the encoded length of a concatenation is the
+sum of the encoded lengths of its pieces. A Template is split once into static text
+and {slot} placeholders; the static part's encoded cost is computed at compile time,
+and only the (short) slot values are measured per learner:
+
+    T = Template(HTML_SOURCE, portal=PORTAL_URL)   # {portal} baked in at compile time
+    T.cost(values)     # encoded length of T.render(values), without rendering it
+    T.render(values)
+
+fit() picks which optional pieces (a quote, a badge) to keep in ONE pass: each
+optional slot has a full and a fallback value, and slots are kept greedily in
+priority order while the total stays under the budget.
+"""
+import re
+
+SLOT_RE = re.compile(r"\{(\w+)\}")
+_UNRESERVED = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~")
+_char_cost = {}
+
+
+def encoded_cost(text):
+    """len(urllib.parse.quote_plus(text)) — computed per character, cached."""
+    total = 0
+    for ch in text:
+        c = _char_cost.get(ch)
+        if c is None:
+            c = 1 if ch in _UNRESERVED or ch == " " else 3 * len(ch.encode("utf-8"))
+            _char_cost[ch] = c
+        total += c
+    return total
+
+
+def query_cost(params, sized=None):
+    """len(urllib.parse.urlencode(params)) plus `sized` {key: encoded value length}
+    for values that are only known by size (a template not rendered yet)."""
+    sized = sized or {}
+    n = len(params) + len(sized)
+    return (sum(encoded_cost(k) + 1 + encoded_cost(str(v)) for k, v in params.items())
+            + sum(encoded_cost(k) + 1 + c for k, c in sized.items()) + max(0, n - 1))
+
+
+class Template:
+    def __init__(self, source, **baked):
+        """Split `source` at {slot}s; slots named in `baked` are filled in right away."""
+        pieces = SLOT_RE.split(source)
+        statics, slots = [pieces[0]], []
+        for i in range(1, len(pieces), 2):
+            name, text = pieces[i], pieces[i + 1]
+            if name in baked:
+                statics[-1] += str(baked[name]) + text
+            else:
+                slots.append(name)
+                statics.append(text)
+        self.statics = statics
+        self.slots = slots
+        self.static_cost = sum(encoded_cost(s) for s in statics)
+
+    @property
+    def source(self):
+        """The text with baked slots filled in and the others still as {slot} —
+        what a server-side mail-merge renders (gmail_transport.send_merge)."""
+        out = [self.statics[0]]
+        for name, text in zip(self.slots, self.statics[1:]):
+            out += ["{" + name + "}", text]
+        return "".join(out)
+
+    def render(self, values):
+        out = [self.statics[0]]
+        for name, text in zip(self.slots, self.statics[1:]):
+            out.append(str(values[name]))
+            out.append(text)
+        return "".join(out)
+
+    def cost(self, values):
+        return self.static_cost + sum(encoded_cost(str(values[s])) for s in self.slots)
+
+    def fit(self, values, optional, budget, overhead=0):
+        """Choose values for the optional slots so the rendered template (+ overhead)
+        costs at most `budget`.
+
+        values    required slot values
+        optional  [(slot, full, fallback)] in keep-priority order
+        → (values with every slot filled, [slots that fell back])
+
+        Everything starts at its fallback; each optional slot is then upgraded to its
+        full value if the total still fits. One pass, no rendering."""
+        chosen = dict(values)
+        for slot, _, fallback in optional:
+            chosen[slot] = fallback
+        total = overhead + self.cost(chosen)
+        dropped = []
+        for slot, full, fallback in optional:
+            extra = (encoded_cost(str(full)) - encoded_cost(str(fallback))) * self.slots.count(slot)
+            if total + extra <= budget:
+                chosen[slot] = full
+                total += extra
+            elif full != fallback:
+                dropped.append(slot)
+        return chosen, dropped
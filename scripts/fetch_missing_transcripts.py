@@ -1,93 +1,34 @@
 """
 Step 1: Try YouTube captions for all missing lessons.
 Step 2: For any still missing, use Whisper small model.
-Updates nlp-course-transcripts.json and .md in place.
+Each lesson is saved to its per-lesson file as soon as it is filled; the combined
+nlp-course-transcripts.json and .md are rebuilt from the store (transcript_store).
 """
 
-import json
 import os
 import sys
 import io
 import tempfile
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+import transcript_store as store
+from caption_harvester import harvest
+from transcript_segments import SegmentTable
 
-DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'docs')
-JSON_FILE = os.path.join(DOCS_DIR, 'nlp-course-transcripts.json')
-MD_FILE = os.path.join(DOCS_DIR, 'nlp-course-transcripts.md')
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
 
 def load_transcripts():
-    with open(JSON_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-
-def save_transcripts(data):
-    with open(JSON_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
-def save_markdown(data):
-    md = []
-    md.append("# תמלולי קורס NLP - יסודות ומעשה\n")
-    md.append("## 51 שיעורים | 7 מודולים\n\n")
-    md.append("---\n\n")
-
-    for module in data:
-        md.append(f"# מודול {module['id']}: {module['title']}\n\n")
-        for i, lesson in enumerate(module['lessons'], 1):
-            md.append(f"## שיעור {module['id']}.{i}: {lesson['title']}\n")
-            md.append(f"**משך:** {lesson['duration']} | ")
-            md.append(f"**קישור:** [צפה ביוטיוב]({lesson['youtube_url']})\n\n")
-            if lesson.get('transcript'):
-                md.append(f"### תמלול:\n{lesson['transcript']}\n\n")
-            else:
-                md.append("### תמלול:\n*תמלול אינו זמין לסרטון זה*\n\n")
-            md.append("---\n\n")
-
-    with open(MD_FILE, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(md))
-
-
-def find_missing(data):
-    """Return list of (module_idx, lesson_idx, video_id, title) for missing transcripts."""
-    missing = []
-    for mi, module in enumerate(data):
-        for li, lesson in enumerate(module['lessons']):
-            if not lesson.get('transcript'):
-                missing.append((mi, li, lesson['id'], lesson['title']))
-    return missing
-
-
-def try_youtube_captions(video_id):
-    """Try to get YouTube captions (Hebrew or auto-generated)."""
-    from youtube_transcript_api import YouTubeTranscriptApi
-    api = YouTubeTranscriptApi()
-
-    # Try Hebrew captions
-    for langs in [['iw', 'he'], ['iw'], ['he']]:
-        try:
-            transcript = api.fetch(video_id, languages=langs)
-            text = " ".join([s.text for s in transcript])
-            if text.strip():
-                return text
-        except:
-            pass
+    return store.load_course()
 
-    # Try any available transcript
-    try:
-        transcript = api.fetch(video_id)
-        text = " ".join([s.text for s in transcript])
-        if text.strip():
-            return text
-    except:
-        pass
 
-    return None
+def try_youtube_captions(video_ids):
+    """YouTube captions for many videos at once — one track probe per video,
+    fetched concurrently (see caption_harvester). {video_id: (segments, info)}"""
+    return harvest(video_ids)
 
 
 def transcribe_with_whisper(video_id, model):
-    """Download audio and transcribe with Whisper."""
+    """Download audio and transcribe with Whisper, keeping the segment timing."""
     import yt_dlp
 
     temp_dir = tempfile.mkdtemp()
@@ -115,13 +56,13 @@ def transcribe_with_whisper(video_id, model):
 
     try:
         result = model.transcribe(audio_path, language="he")
-        text = result["text"]
+        segments = SegmentTable.from_whisper(result)
         os.remove(audio_path)
         try:
             os.rmdir(temp_dir)
         except:
             pass
-        return text
+        return segments
     except Exception as e:
         print(f"    Transcription failed: {e}")
         return None
@@ -129,7 +70,7 @@ def transcribe_with_whisper(video_id, model):
 
 def main():
     data = load_transcripts()
-    missing = find_missing(data)
+    missing = store.find_missing(data)
     print(f"Found {len(missing)} lessons with missing transcripts.\n")
 
     if not missing:
@@ -143,24 +84,22 @@ def main():
 
     yt_success = 0
     still_missing = []
+    captions = try_youtube_captions([vid for _, _, vid, _ in missing])
 
-    for mi, li, vid, title in missing:
-        mod_id = data[mi]['id']
-        les_num = li + 1
+    for mod_id, les_num, vid, title in missing:
         print(f"  {mod_id}.{les_num}: {title} ({vid})...", end=" ")
 
-        text = try_youtube_captions(vid)
-        if text:
-            data[mi]['lessons'][li]['transcript'] = text
+        segments, info = captions[vid]
+        if segments:
+            store.save_lesson(mod_id, les_num, segments=segments)
             yt_success += 1
-            print(f"OK ({len(text)} chars)")
+            print(f"OK [{info}] ({len(segments.text)} chars, {len(segments)} segments)")
         else:
-            still_missing.append((mi, li, vid, title))
-            print("NO CAPTIONS")
+            still_missing.append((mod_id, les_num, vid, title))
+            print(f"NO CAPTIONS ({info})")
 
     print(f"\nYouTube captions: {yt_success}/{len(missing)} successful")
-    save_transcripts(data)
-    save_markdown(data)
+    store.render()
     print("Saved progress.\n")
 
     if not still_missing:
@@ -180,24 +119,21 @@ def main():
     wh_success = 0
     wh_failed = 0
 
-    for mi, li, vid, title in still_missing:
-        mod_id = data[mi]['id']
-        les_num = li + 1
+    for mod_id, les_num, vid, title in still_missing:
         print(f"  {mod_id}.{les_num}: {title} ({vid})...")
         print(f"    Downloading & transcribing...", end=" ")
 
-        text = transcribe_with_whisper(vid, model)
-        if text:
-            data[mi]['lessons'][li]['transcript'] = text
+        segments = transcribe_with_whisper(vid, model)
+        if segments and segments.text:
             wh_success += 1
-            print(f"OK ({len(text)} chars)")
-            # Save after each successful transcription
-            save_transcripts(data)
+            print(f"OK ({len(segments.text)} chars, {len(segments)} segments)")
+            # Save after each successful transcription — only this lesson's file
+            store.save_lesson(mod_id, les_num, segments=segments)
         else:
             wh_failed += 1
             print("FAILED")
 
-    save_markdown(data)
+    store.render()
 
     # --- Summary ---
     total_filled = yt_success + wh_success
@@ -208,8 +144,9 @@ def main():
     print(f"  Failed: {wh_failed}")
     print(f"  Total filled: {total_filled}/{len(missing)}")
     print(f"\nFiles updated:")
-    print(f"  {JSON_FILE}")
-    print(f"  {MD_FILE}")
+    print(f"  {store.STORE_DIR}")
+    print(f"  {store.JSON_FILE}")
+    print(f"  {store.MD_FILE}")
 
 
 if __name__ == "__main__":
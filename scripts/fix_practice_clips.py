@@ -32,8 +32,8 @@ VERIFIED = {
 }
 
 
-def fix_practice():
-    html = PRACTICE.read_text(encoding="utf-8")
+def quarantine_practice(html):
+    """master-practice.html text -> (new text, {"kept": n, "quarantined": n})."""
     hits = {"kept": 0, "quarantined": 0}
 
     def sub(m):
@@ -49,16 +49,14 @@ def fix_practice():
         hits["quarantined"] += 1
         return f"{{ id: 'PLACEHOLDER', wrongId: '{vid}',"
 
-    out = re.sub(r"\{\s*id:\s*'([A-Za-z0-9_\-]{11})',", sub, html)
-    PRACTICE.write_text(out, encoding="utf-8")
-    print(f"master-practice.html   kept {hits['kept']}, quarantined {hits['quarantined']}")
+    return re.sub(r"\{\s*id:\s*'([A-Za-z0-9_\-]{11})',", sub, html), hits
 
 
-def fix_portal():
-    lines = PORTAL.read_text(encoding="utf-8").splitlines(keepends=True)
+def quarantine_portal(text):
+    """course-library-v2.html text -> (new text, kept, removed)."""
     out, removed, kept = [], 0, 0
     row = re.compile(r"^\s*\{\s*id:'([A-Za-z0-9_\-]{11})',\s*t:'.*\},?\s*$")
-    for line in lines:
+    for line in text.splitlines(keepends=True):
         m = row.match(line)
         if not m:
             out.append(line)
@@ -68,7 +66,18 @@ def fix_portal():
             out.append(line)
         else:
             removed += 1
-    PORTAL.write_text("".join(out), encoding="utf-8")
+    return "".join(out), kept, removed
+
+
+def fix_practice():
+    out, hits = quarantine_practice(PRACTICE.read_text(encoding="utf-8"))
+    PRACTICE.write_text(out, encoding="utf-8")
+    print(f"master-practice.html   kept {hits['kept']}, quarantined {hits['quarantined']}")
+
+
+def fix_portal():
+    out, kept, removed = quarantine_portal(PORTAL.read_text(encoding="utf-8"))
+    PORTAL.write_text(out, encoding="utf-8")
     print(f"course-library-v2.html kept {kept}, removed {removed}")
 
 
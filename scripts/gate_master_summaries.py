@@ -68,10 +68,34 @@ TITLE_RE = re.compile(r"<title>(.*?)</title>", re.S | re.I)
 SHELL_MARK = "paid-content.js"
 
 
+def make_shell(html):
+    """(shell, body fragment) for a full summary page; None if it is already a shell
+    or has no <body>."""
+    if SHELL_MARK in html:
+        return None
+    body = BODY_RE.search(html)
+    if not body:
+        return None
+    title = TITLE_RE.search(html)
+    shell = SHELL.format(title=title.group(1).strip() if title else "בית המטפלים")
+    return shell, body.group(1).strip()
+
+
+def upload(base, key, name, fragment):
+    """Put the body in the private bucket (service key bypasses RLS). Returns the
+    response; 200/201 = stored."""
+    return requests.post(
+        f"{base}/storage/v1/object/{BUCKET}/{PREFIX}{name}",
+        headers={"apikey": key, "Authorization": f"Bearer {key}",
+                 "Content-Type": "text/html; charset=utf-8", "x-upsert": "true"},
+        data=fragment.encode("utf-8"),
+        timeout=30,
+    )
+
+
 def main():
     base, key = load_env()
     BACKUP.mkdir(parents=True, exist_ok=True)
-    headers = {"apikey": key, "Authorization": f"Bearer {key}"}
 
     pages = sorted(PAGES.glob("*.html"))
     if not pages:
@@ -84,31 +108,20 @@ def main():
             print(f"skip   {page.name} (already a shell)")
             continue
 
-        body = BODY_RE.search(html)
-        title = TITLE_RE.search(html)
-        if not body:
+        gated = make_shell(html)
+        if not gated:
             print(f"WARN   {page.name} has no <body> — left untouched")
             continue
 
-        fragment = body.group(1).strip()
+        shell, fragment = gated
         (BACKUP / page.name).write_text(html, encoding="utf-8")
 
-        # Upload the body to the private bucket (service key bypasses RLS).
-        up = requests.post(
-            f"{base}/storage/v1/object/{BUCKET}/{PREFIX}{page.name}",
-            headers={**headers, "Content-Type": "text/html; charset=utf-8",
-                     "x-upsert": "true"},
-            data=fragment.encode("utf-8"),
-            timeout=30,
-        )
+        up = upload(base, key, page.name, fragment)
         if up.status_code not in (200, 201):
             print(f"FAIL   {page.name} upload {up.status_code}: {up.text[:200]}")
             continue
 
-        page.write_text(
-            SHELL.format(title=title.group(1).strip() if title else "בית המטפלים"),
-            encoding="utf-8",
-        )
+        page.write_text(shell, encoding="utf-8")
         print(f"gated  {page.name} ({len(fragment):,} chars -> {BUCKET}/{PREFIX}{page.name})")
 
     print("\nDone. Commit + push to redeploy the shells.")
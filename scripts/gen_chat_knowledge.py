@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Canonicalize the ai-chat knowledge bases and keep them inside a token budget.
+
+supabase/functions/ai-chat/knowledge.ts (~66KB) and knowledge-master.ts (~27KB) are
+edited by hand. ai-chat sends header + a slice of the KB + rules as ONE prompt-cached
+system block (see selectKnowledge / callSonnet in ai-chat/index.ts), so any byte that
+moves inside a slice — a CRLF from an editor, a trailing space, sections swapped,
+a "Last updated" line — turns every cached read of that slice into a full-price
+write. Nothing tracked how big the slices were getting either.
+
+This script is the build step after editing a KB:
+
+  - rewrites the file in one deterministic layout: preamble, numbered sections
+    (מודול N / מפגש N) in order, appendices (glossary, quotes — the parts that grow)
+    last; NFC, LF, no trailing spaces, no runs of blank lines. Running it twice
+    changes nothing.
+  - estimates tokens per section and per cache scope (preamble + section + appendices,
+    exactly what selectKnowledge sends), against the budgets below;
+  - compares section hashes with kb-manifest.json from the previous build and lists
+    which sections changed — and therefore which cache scopes will start cold.
+
+Writes supabase/functions/ai-chat/kb-report.md. Exits 1 (and leaves the .ts files
+and the manifest untouched) when anything is over budget. --check writes nothing, so
+it can run in CI on a clean tree.
+
+  py scripts/gen_chat_knowledge.py          # canonicalize + report
+  py scripts/gen_chat_knowledge.py --check  # print the summary only, fail if a file is not canonical
+"""
+import hashlib
+import json
+import re
+import sys
+import unicodedata
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CHAT_DIR = ROOT / "supabase" / "functions" / "ai-chat"
+MANIFEST = CHAT_DIR / "kb-manifest.json"
+REPORT = CHAT_DIR / "kb-report.md"
+
+# Budgets in estimated tokens. "scope" is one cached slice as sent per request;
+# "full" is the fallback when the lesson is unknown (the whole KB).
+KBS = {
+    "practitioner": {
+        "file": CHAT_DIR / "knowledge.ts",
+        "const": "NLP_KNOWLEDGE",
+        "section_re": re.compile(r"^מודול\s+(\d+)"),
+        "budget": {"preamble": 300, "section": 5000, "appendix": 1500, "scope": 6500, "full": 18000},
+    },
+    "master": {
+        "file": CHAT_DIR / "knowledge-master.ts",
+        "const": "MASTER_KNOWLEDGE",
+        "section_re": re.compile(r"^מפגש\s+(\d+)"),
+        "budget": {"preamble": 300, "section": 1500, "appendix": 800, "scope": 2500, "full": 9000},
+    },
+}
+
+HEBREW_RE = re.compile(r"[֐-׿]")
+# Rough, conservative: Hebrew runs ~2 chars/token on the models we use, Latin ~4.
+HEBREW_CHARS_PER_TOKEN = 2.0
+OTHER_CHARS_PER_TOKEN = 4.0
+
+
+def estimate_tokens(text):
+    heb = len(HEBREW_RE.findall(text))
+    return round(heb / HEBREW_CHARS_PER_TOKEN + (len(text) - heb) / OTHER_CHARS_PER_TOKEN)
+
+
+def sha(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+# ── Parse / layout ───────────────────────────────────────────────────────────
+
+def read_kb(path, const):
+    """(header comment lines, KB body) from a knowledge .ts file."""
+    src = path.read_text(encoding="utf-8")
+    m = re.search(rf"export const {const} = `(.*)`;?\s*$", src, re.S)
+    if not m:
+        raise SystemExit(f"{path.name}: no `export const {const} = `...`` template literal")
+    header = [ln for ln in src[:m.start()].splitlines()
+              if ln.startswith("//") and not ln.startswith("// Last updated")]
+    return header, m.group(1)
+
+
+def normalize(body):
+    body = unicodedata.normalize("NFC", body.replace("\r\n", "\n").replace("\r", "\n"))
+    body = "\n".join(ln.rstrip() for ln in body.split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", body)
+
+
+def split_sections(body, section_re):
+    """Same cut as splitKnowledge() in ai-chat/index.ts: a section runs from its
+    '## ' heading to the next one. → (preamble, [(num, title, text)], [(title, text)])"""
+    lines = (body[:-1] if body.endswith("\n") else body).split("\n")
+    heads = [i for i, ln in enumerate(lines) if re.match(r"^##\s+", ln)]
+    first = heads[0] if heads else len(lines)
+    preamble = "\n".join(lines[:first])
+    numbered, appendices = [], []
+    for idx, start in enumerate(heads):
+        end = heads[idx + 1] if idx + 1 < len(heads) else len(lines)
+        text = "\n".join(lines[start:end])
+        title = re.sub(r"^##\s+", "", lines[start]).strip()
+        m = section_re.match(title)
+        if m:
+            numbered.append((int(m.group(1)), title, text))
+        else:
+            appendices.append((title, text))
+    nums = [n for n, _, _ in numbered]
+    if len(nums) != len(set(nums)):
+        raise SystemExit(f"duplicate section numbers: {sorted(nums)}")
+    return preamble, sorted(numbered), appendices
+
+
+def layout(preamble, numbered, appendices):
+    """Stable core first, the parts that grow last. Each part keeps its own
+    trailing blank line, so an unchanged layout round-trips byte for byte."""
+    parts = [preamble] + [t for _, _, t in numbered] + [t for _, t in appendices]
+    return "\n".join(parts) + "\n"
+
+
+def render_ts(header, const, body):
+    if "`" in body or "${" in body:
+        raise SystemExit(f"{const}: a backtick or ${{ inside the KB would break the template literal")
+    return "\n".join(header) + "\n\n" + f"export const {const} = `{body}`;\n"
+
+
+# ── Report ───────────────────────────────────────────────────────────────────
+
+def analyze(name, cfg, previous):
+    header, raw = read_kb(cfg["file"], cfg["const"])
+    preamble, numbered, appendices = split_sections(normalize(raw), cfg["section_re"])
+    body = layout(preamble, numbered, appendices)
+    ts = render_ts(header, cfg["const"], body)
+    budget = cfg["budget"]
+    appendix_text = "\n\n".join(t.strip() for _, t in appendices)
+
+    rows, over, hashes = [], [], {}
+
+    def row(kind, label, text, limit):
+        tokens = estimate_tokens(text)
+        hashes[label] = sha(text.strip())
+        prev = previous.get(label)
+        changed = "חדש" if prev is None else ("שונה" if prev != hashes[label] else "")
+        status = "OK" if tokens <= limit else "חריגה"
+        if tokens > limit:
+            over.append(f"{name}: {label} ~{tokens} > {limit} tokens")
+        rows.append((kind, label, len(text), tokens, limit, status, changed))
+
+    row("preamble", "preamble", preamble, budget["preamble"])
+    for _, title, text in numbered:
+        row("section", title, text, budget["section"])
+    for title, text in appendices:
+        row("appendix", title, text, budget["appendix"])
+    removed = sorted(set(previous) - set(hashes))
+
+    # cache scopes exactly as selectKnowledge builds them
+    scopes = []
+    for num, title, text in numbered:
+        scope_text = "\n\n".join(x for x in (preamble.strip(), text.strip(), appendix_text) if x)
+        tokens = estimate_tokens(scope_text)
+        scopes.append((f"{num}", tokens, budget["scope"]))
+        if tokens > budget["scope"]:
+            over.append(f"{name}: scope {num} ~{tokens} > {budget['scope']} tokens")
+    full_tokens = estimate_tokens(body)
+    scopes.append(("full", full_tokens, budget["full"]))
+    if full_tokens > budget["full"]:
+        over.append(f"{name}: full KB ~{full_tokens} > {budget['full']} tokens")
+
+    changed = {r[1] for r in rows if r[6]} | set(removed)
+    shared = {"preamble"} | {t for t, _ in appendices}
+    if not previous:
+        cold = "כל ה-scopes (build ראשון)"
+    elif changed & shared or removed:
+        cold = "כל ה-scopes (preamble/נספח השתנה)"
+    elif changed:
+        nums = [str(n) for n, t, _ in numbered if t in changed]
+        cold = ", ".join(nums + ["full"])
+    else:
+        cold = "אין — כל ה-cache נשמר"
+
+    return {"name": name, "ts": ts, "file": cfg["file"], "rows": rows, "scopes": scopes,
+            "removed": removed, "over": over, "hashes": hashes, "cold": cold,
+            "canonical": cfg["file"].read_text(encoding="utf-8") == ts}
+
+
+def report_md(results):
+    L = ["# ai-chat knowledge — דוח גודל ו-cache\n",
+         "נוצר ע\"י scripts/gen_chat_knowledge.py. הערכת טוקנים גסה "
+         f"(עברית ~{HEBREW_CHARS_PER_TOKEN:g} תווים/טוקן, אחר ~{OTHER_CHARS_PER_TOKEN:g}).\n"]
+    for r in results:
+        L += [f"## {r['name']} — {r['file'].name}\n",
+              "| סוג | סעיף | תווים | ~טוקנים | תקציב | סטטוס | מאז ה-build הקודם |",
+              "|---|---|---|---|---|---|---|"]
+        for kind, label, chars, tokens, limit, status, changed in r["rows"]:
+            L.append(f"| {kind} | {label} | {chars} | {tokens} | {limit} | {status} | {changed} |")
+        for label in r["removed"]:
+            L.append(f"| — | {label} | — | — | — | — | הוסר |")
+        L += ["", "| cache scope | ~טוקנים | תקציב |", "|---|---|---|"]
+        L += [f"| {s} | {t} | {b} |" for s, t, b in r["scopes"]]
+        L += ["", f"scopes שיתחילו קרים אחרי deploy: {r['cold']}", ""]
+    return "\n".join(L)
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+    check = "--check" in sys.argv
+    try:
+        manifest = json.loads(MANIFEST.read_text(encoding="utf-8"))
+    except Exception:
+        manifest = {}
+
+    results = [analyze(name, cfg, manifest.get(name, {})) for name, cfg in KBS.items()]
+    if not check:
+        REPORT.write_text(report_md(results), encoding="utf-8")
+    for r in results:
+        print(f"{r['name']}: {'canonical' if r['canonical'] else 'NOT canonical'}; "
+              f"changed: {', '.join(x[1] for x in r['rows'] if x[6]) or '-'}; cold: {r['cold']}")
+
+    over = [o for r in results for o in r["over"]]
+    if over:
+        print("\nOVER BUDGET:\n  " + "\n  ".join(over))
+    if check:
+        stale = [r["file"].name for r in results if not r["canonical"]]
+        if stale:
+            print("not canonical (run without --check): " + ", ".join(stale))
+        sys.exit(1 if over or stale else 0)
+    if over:
+        sys.exit(1)
+
+    for r in results:
+        if not r["canonical"]:
+            r["file"].write_text(r["ts"], encoding="utf-8", newline="\n")
+    MANIFEST.write_text(json.dumps({r["name"]: r["hashes"] for r in results},
+                                   ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    print(f"\nwrote {REPORT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,44 @@
 # -*- coding: utf-8 -*-
-"""Generate supabase/functions/gemini-mentor/knowledge.ts from the two client KB files.
-Extracts the template-literal body assigned to window.NLP_COURSE_KNOWLEDGE in each file.
+"""Generate the gemini-mentor knowledge modules.
+
+knowledge.ts — the two client KB files, extracted from the template literal assigned
+  to window.NLP_COURSE_KNOWLEDGE. Small (~2KB each) and stable, so it stays the
+  system prompt (and keeps the Sonnet prompt cache warm).
+
+retrieval.ts — the practitioner transcripts, cut into passages, with a precomputed
+  BM25 index over normalized Hebrew (same normalization as scripts/hebrew_search.py).
+  The mentor ranks passages for each question and attaches only the top few, so
+  the prompt does not grow with the size of the course. Query-side normalization
+  lives in gemini-mentor/retrieve.ts and reads its constants from this module.
+
+The master passages are paid content and never go into the repo: they are written
+to content-private/search-master/mentor-retrieval.json (gitignored), and --upload
+puts that file in the private `game-data` bucket, where the mentor loads it at cold
+start for paying users (needs SUPABASE_URL / SUPABASE_SERVICE_KEY in .env.local).
+
+Regenerate after editing the client KB files or the transcripts:
+  py scripts/gen_mentor_knowledge.py
+  py scripts/gen_mentor_knowledge.py --upload     # + refresh the master index in Storage
 """
-import io, sys
+import argparse
+import io
+import json
+import os
+import urllib.request
+from pathlib import Path
+
+import hebrew_search as hs
+
+ROOT = Path(__file__).resolve().parent.parent
+DEST = ROOT / "supabase" / "functions" / "gemini-mentor"
+MASTER_INDEX = hs.INDEX_DIRS["master"] / "mentor-retrieval.json"
+MASTER_BUCKET = "game-data"                       # retrieve.ts MASTER_BUCKET / MASTER_OBJECT
+MASTER_OBJECT = "mentor-retrieval-master.json"
+
+# ~120 words ≈ 700 chars: enough context for one idea, small enough that the
+# top 4 stay well under the KB itself.
+MENTOR_PASSAGE_WORDS = 120
 
-ROOT = r"C:\Users\saraa\OneDrive\שולחן העבודה\beit-vmetaplim"
 
 def extract(path):
     with io.open(path, encoding="utf-8") as f:
@@ -16,20 +50,97 @@ def extract(path):
         raise SystemExit(f"unexpected template interpolation/backtick inside {path}")
     return body
 
-prac = extract(ROOT + r"\js\nlp-game-knowledge.js")
-# master KB source moved out of the public repo with the rest of the paid content (2026-07-22)
-mast = extract(ROOT + r"\content-private\master-game\src\nlp-game-knowledge-master.js")
-
-out = (
-    "// AUTO-EXTRACTED from js/nlp-game-knowledge.js + js/nlp-game-knowledge-master.js\n"
-    "// so the mentor system prompt is chosen SERVER-SIDE (clients can no longer\n"
-    "// supply an arbitrary systemPrompt and use the function as a generic AI proxy).\n"
-    "// Regenerate with scripts/gen_mentor_knowledge.py after editing the client KB files.\n\n"
-    "export const PRACTITIONER_KB = `" + prac + "`\n\n"
-    "export const MASTER_KB = `" + mast + "`\n"
-)
-
-dest = ROOT + r"\supabase\functions\gemini-mentor\knowledge.ts"
-with io.open(dest, "w", encoding="utf-8", newline="\n") as f:
-    f.write(out)
-print("written", dest, "prac", len(prac), "chars; master", len(mast), "chars")
+
+def write_knowledge():
+    prac = extract(ROOT / "js" / "nlp-game-knowledge.js")
+    # master KB source moved out of the public repo with the rest of the paid content (2026-07-22)
+    mast = extract(ROOT / "content-private" / "master-game" / "src" / "nlp-game-knowledge-master.js")
+
+    out = (
+        "// AUTO-EXTRACTED from js/nlp-game-knowledge.js + js/nlp-game-knowledge-master.js\n"
+        "// so the mentor system prompt is chosen SERVER-SIDE (clients can no longer\n"
+        "// supply an arbitrary systemPrompt and use the function as a generic AI proxy).\n"
+        "// Regenerate with scripts/gen_mentor_knowledge.py after editing the client KB files.\n\n"
+        "export const PRACTITIONER_KB = `" + prac + "`\n\n"
+        "export const MASTER_KB = `" + mast + "`\n"
+    )
+    dest = DEST / "knowledge.ts"
+    with io.open(dest, "w", encoding="utf-8", newline="\n") as f:
+        f.write(out)
+    print("written", dest, "prac", len(prac), "chars; master", len(mast), "chars")
+
+
+def corpus(docs):
+    """Passages + BM25 postings for one course. docs = hebrew_search source tuples."""
+    titles, passages, bags = [], [], []
+    for _, title, _, text, _ in docs:
+        titles.append(title)
+        for start, end, words in hs.split_passages(hs.tokenize(text), MENTOR_PASSAGE_WORDS):
+            passages.append([len(titles) - 1, " ".join(text[start:end].split())])
+            bags.append(hs.bag(words))
+    return {"titles": titles, "passages": passages,
+            "postings": dict(sorted(hs.bm25_postings(bags).items()))}
+
+
+def write_retrieval():
+    data = {
+        "normalize": {
+            "prefixes": hs.PREFIXES,
+            "minStem": hs.MIN_STEM,
+            "maxPrefix": hs.MAX_PREFIX,
+            "stopwords": sorted(hs.STOPWORDS),
+        },
+        "corpora": {"practitioner": corpus(hs.practitioner_docs())},
+    }
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    out = (
+        "// AUTO-GENERATED by scripts/gen_mentor_knowledge.py from docs/transcripts/per-lesson.\n"
+        "// Practitioner lesson passages + BM25 postings (weight × 100) over normalized\n"
+        "// Hebrew; queried by retrieve.ts. The master corpus is NOT here (paid content —\n"
+        "// it lives in the private game-data bucket). Do not edit by hand.\n"
+        "// JSON.parse of a string literal: parses much faster on cold start than the\n"
+        "// same data written as an object literal, and keeps the type checker out of it.\n\n"
+        "export const RETRIEVAL = JSON.parse(" + json.dumps(body, ensure_ascii=False) + ")\n"
+    )
+    dest = DEST / "retrieval.ts"
+    with io.open(dest, "w", encoding="utf-8", newline="\n") as f:
+        f.write(out)
+    prac = data["corpora"]["practitioner"]
+    print("written", dest, f"{len(out.encode('utf-8')) / 1024:.0f}KB —",
+          f"practitioner {len(prac['passages'])} passages / {len(prac['postings'])} terms")
+
+    master = corpus(hs.master_docs())
+    MASTER_INDEX.parent.mkdir(parents=True, exist_ok=True)
+    MASTER_INDEX.write_text(json.dumps(master, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    print("written", MASTER_INDEX.relative_to(ROOT),
+          f"— master {len(master['passages'])} passages / {len(master['postings'])} terms (private)")
+
+
+def upload_master():
+    env_file = ROOT / ".env.local"
+    if env_file.exists():
+        for line in env_file.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, v = line.split("=", 1)
+                os.environ.setdefault(k.strip(), v.strip())
+    base = os.environ["SUPABASE_URL"].rstrip("/")
+    key = os.environ["SUPABASE_SERVICE_KEY"]
+    req = urllib.request.Request(
+        f"{base}/storage/v1/object/{MASTER_BUCKET}/{MASTER_OBJECT}",
+        data=MASTER_INDEX.read_bytes(), method="POST",
+        headers={"apikey": key, "Authorization": f"Bearer {key}",
+                 "Content-Type": "application/json", "x-upsert": "true"})
+    with urllib.request.urlopen(req, timeout=120) as r:
+        print("uploaded", f"{MASTER_BUCKET}/{MASTER_OBJECT}", r.status)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--upload", action="store_true",
+                    help="upload the master index to the private game-data bucket")
+    args = ap.parse_args()
+    write_knowledge()
+    write_retrieval()
+    if args.upload:
+        upload_master()
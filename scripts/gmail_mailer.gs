@@ -0,0 +1,87 @@
+/**
+ * Gmail mailer web app (Apps Script) — the endpoint behind GMAIL_API_URL.
+ *
+ * Deployed as a web app ("Execute as: me", "Anyone"); the shared secret lives in the
+ * script property MAILER_TOKEN. Two actions (plus a ping), same parameters via GET query string
+ * or POST form body (scripts/gmail_transport.py prefers POST — no URL size limit):
+ *
+ *   action=send   to, subject, body, html, name            → {success, error?}
+ *   action=merge  template_id, template?, recipients        → {success, results: [{success, error?}]}
+ *   action=ping                                             → {success, remaining}
+ *
+ * merge is the batched mail-merge: `template` is JSON {subject, body, html, name} with
+ * {slot} placeholders, `recipients` JSON [{to, vars}]. The template is cached for 6h
+ * under its id, so later calls send only the id; an expired id answers
+ * "unknown template" and the client sends it again. One result per recipient, in
+ * order, so a partial failure is recorded per learner (send_journal).
+ *
+ * fill_() must stay in step with gmail_transport.fill(): ASCII {name} slots, one
+ * pass, unknown slots left as they are.
+ */
+
+var DEFAULT_SENDER = 'בית המטפלים';
+var TEMPLATE_TTL_SEC = 6 * 60 * 60;
+
+function doGet(e) {
+  return json_(handle_(e.parameter || {}));
+}
+
+function doPost(e) {
+  return json_(handle_(e.parameter || {}));  // form fields land in e.parameter too
+}
+
+function handle_(p) {
+  if (!p.token || p.token !== PropertiesService.getScriptProperties().getProperty('MAILER_TOKEN')) {
+    return {success: false, error: 'Unauthorized'};
+  }
+  if (p.action === 'send') return sendOne_(p);
+  if (p.action === 'merge') return merge_(p);
+  if (p.action === 'ping') return {success: true, remaining: MailApp.getRemainingDailyQuota()};  // synthetic_monitor.py
+  return {success: false, error: 'Unknown action'};
+}
+
+function sendOne_(m) {
+  if (MailApp.getRemainingDailyQuota() < 1) {
+    return {success: false, error: 'daily quota exhausted'};
+  }
+  try {
+    var options = {name: m.name || DEFAULT_SENDER};
+    if (m.html) options.htmlBody = m.html;
+    GmailApp.sendEmail(m.to, m.subject || '', m.body || '', options);
+    return {success: true};
+  } catch (err) {
+    return {success: false, error: String(err && err.message || err)};
+  }
+}
+
+function merge_(p) {
+  var cache = CacheService.getScriptCache();
+  var key = 'tpl:' + p.template_id;
+  var raw = p.template || cache.get(key);
+  if (!raw) return {success: false, error: 'unknown template'};
+  if (p.template) cache.put(key, p.template, TEMPLATE_TTL_SEC);
+
+  var template = JSON.parse(raw);
+  var recipients = JSON.parse(p.recipients || '[]');
+  var results = recipients.map(function (r) {
+    var vars = r.vars || {};
+    return sendOne_({
+      to: r.to,
+      subject: fill_(template.subject, vars),
+      body: fill_(template.body, vars),
+      html: fill_(template.html, vars),
+      name: fill_(template.name, vars)
+    });
+  });
+  return {success: true, results: results};
+}
+
+function fill_(text, vars) {
+  return String(text || '').replace(/\{([A-Za-z0-9_]+)\}/g, function (whole, name) {
+    return Object.prototype.hasOwnProperty.call(vars, name) ? String(vars[name]) : whole;
+  });
+}
+
+function json_(obj) {
+  return ContentService.createTextOutput(JSON.stringify(obj)).setMimeType(ContentService.MimeType.JSON);
+}
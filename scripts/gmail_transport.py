@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+"""
+Gmail Apps Script mailer transport — the message goes in a POST body, not the URL.
+
+Every mailing script sent its whole message as GET query parameters, so the URL size
+was the real limit: monthly_journey_email fitted its HTML under URL_BUDGET (dropping
+the learner's own quotes to get there), study_buddy_seed_invite refused anything over
+MAX_URL_CHARS, and long URLs drew sporadic HTTP 400s from Google's front-end that
+send_gmail retried up to four times.
+
+"POST breaks on Google's redirect" was only half the story. A web-app POST is
+executed and then answered with a 302 to script.googleusercontent.com/macros/echo,
+where the result waits; the client has to follow that with a plain GET and no body.
+Re-POSTing the body there (what some clients do) or treating the 302 as a failure is
+what broke. send() does it explicitly:
+
+    POST  <GMAIL_API_URL>     form-encoded action=send&token=…&html=…  (any size)
+      → 302 Location: …/macros/echo?…    GET it once → {"success": true}
+
+The deployed script needs a doPost next to its doGet (form fields arrive in
+e.parameter just like query parameters):  function doPost(e) { return doGet(e); }
+If it has none (non-JSON reply / 405 to the POST itself), send() falls back to GET —
+only for messages whose URL fits GET_URL_LIMIT — and remembers that for the rest of
+the process. Bigger messages then raise TooLargeForGet, so a caller can still shrink
+them. That decision is only ever made from the POST's own reply: once the 302 came
+back the script has run, so a bad echo raises MaybeSent and is never re-sent by GET.
+
+Mail-merge (action=merge): the HTTPS round trip to Apps Script, not the quota, set
+the pace of a campaign — one call per email. merge() sends ONE call with a template
+({slot} placeholders in subject/body/html) and a batch of recipients, each with its
+own variables, and gets one result per recipient back. The template travels once per
+endpoint: later calls carry only its id (the script keeps it in CacheService).
+send_merge() drives a whole campaign through send_scheduler in such batches. Apps
+Script counts every message against its ~10/minute, so the scheduler meters
+recipients and a batch is as big as its bucket grants: at most send_scheduler.BURST
+(3), i.e. a third of the calls one-per-email took. On a deployment without the merge
+action it falls back to send() per recipient, filling the template here with the
+same rules (fill()).
+
+A merge call that dies after the script may have run — timeout, dropped connection,
+a lost echo, a reply that does not account for every recipient — may or may not have
+sent its batch. Those recipients come back as UNKNOWN, not as failures: callers
+journal them so the next run does not mail them a second time, and nothing retries
+the call (neither as a merge nor one by one).
+
+The script side of both actions is scripts/gmail_mailer.gs.
+
+  py scripts/gmail_transport.py --self-test   # run against a local stand-in endpoint
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+GET_URL_LIMIT = 7300   # 7,622-char URLs got HTTP 400 from Apps Script; headroom under that
+TIMEOUT = 45
+SENDER_NAME = "בית המטפלים"
+MERGE_RETRIES = 3      # per recipient, for "rate limit" results
+MERGE_SLOT_RE = re.compile(r"\{([A-Za-z0-9_]+)\}")  # same pattern as fill_() in gmail_mailer.gs
+
+UNKNOWN = "unknown"   # send_merge result when the call died and the batch may have gone out
+
+_post_ok = {}  # endpoint → False once it turned out to have no doPost
+_merge_ok = {}  # endpoint → False once it turned out to have no merge action
+_known_templates = set()  # (endpoint, template id) the script already has cached
+
+
+class MailError(RuntimeError):
+    pass
+
+
+class TooLargeForGet(MailError):
+    pass
+
+
+class MergeUnsupported(MailError):
+    pass
+
+
+class MaybeSent(MailError):
+    """The script ran (it answered with the 302) but its result was lost — the
+    message may have gone out. Do not send it again."""
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None  # surface the 302 — the echo URL is followed by hand, as a GET
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def _open(req):
+    """(status, text, echoed) for `req`, following one redirect with a body-less GET.
+    echoed = the reply came from the echo URL, i.e. the script already ran."""
+    try:
+        with _opener.open(req, timeout=TIMEOUT) as r:
+            return r.status, r.read().decode("utf-8", "replace"), False
+    except urllib.error.HTTPError as e:
+        if e.code not in (301, 302, 303, 307, 308) or not e.headers.get("Location"):
+            return e.code, e.read().decode("utf-8", "replace"), False
+        location = urllib.parse.urljoin(req.full_url, e.headers["Location"])
+    for attempt in range(2):  # the echo GET is idempotent — one retry is safe
+        try:
+            with _opener.open(urllib.request.Request(location), timeout=TIMEOUT) as r:
+                return r.status, r.read().decode("utf-8", "replace"), True
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8", "replace"), True
+        except (urllib.error.URLError, TimeoutError):
+            if attempt:
+                raise
+
+
+def _result(status, text):
+    """Parsed Apps Script JSON, or None when the reply is not from our handler."""
+    if status != 200:
+        return None
+    try:
+        result = json.loads(text)
+    except ValueError:
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def send(to, subject, plain, html="", name=SENDER_NAME, url=None, token=None):
+    """Send one email. Returns the Apps Script reply ({"success": true, ...});
+    raises MailError (its text carries the script's error, e.g. "rate limit"), or
+    MaybeSent when the script ran but its reply was lost.
+
+    url/token default to GMAIL_API_URL / GMAIL_API_TOKEN."""
+    url = url or os.environ["GMAIL_API_URL"]
+    fields = {"token": token or os.environ["GMAIL_API_TOKEN"], "action": "send", "to": to,
+              "subject": subject, "body": plain, "html": html, "name": name}
+    data = urllib.parse.urlencode(fields)
+
+    if _post_ok.get(url, True):
+        status, text, echoed = _open(urllib.request.Request(
+            url, data=data.encode("utf-8"), method="POST",
+            headers={"Content-Type": "application/x-www-form-urlencoded; charset=utf-8"}))
+        result = _result(status, text)
+        if result is not None:
+            return _check(result)
+        if echoed:
+            raise MaybeSent(f"Apps Script ran, echo returned HTTP {status}: {text[:200]}")
+        if status not in (200, 404, 405):
+            raise MailError(f"Apps Script POST failed: HTTP {status} {text[:200]}")
+        _post_ok[url] = False  # no doPost in this deployment — GET from now on
+
+    get_url = f"{url}?{data}"
+    if len(get_url) > GET_URL_LIMIT:
+        raise TooLargeForGet(f"{len(get_url)}-char URL and the mailer accepts no POST body")
+    status, text, echoed = _open(urllib.request.Request(get_url))
+    if status == 400 and not echoed:  # Google's front-end 400s long URLs sporadically — once more
+        status, text, echoed = _open(urllib.request.Request(get_url))
+    result = _result(status, text)
+    if result is None and echoed:
+        raise MaybeSent(f"Apps Script ran, echo returned HTTP {status}: {text[:200]}")
+    if result is None:
+        raise MailError(f"Apps Script returned HTTP {status}: {text[:200]}")
+    return _check(result)
+
+
+def _check(result):
+    if not result.get("success"):
+        raise MailError(f"Apps Script error: {result.get('error') or json.dumps(result)[:200]}")
+    return result
+
+
+# ── Mail-merge ───────────────────────────────────────────────────────────────
+
+def fill(text, values):
+    """{key} → values[key] in one pass; unknown keys stay as they are."""
+    return MERGE_SLOT_RE.sub(lambda m: str(values[m.group(1)]) if m.group(1) in values else m.group(0),
+                             text or "")
+
+
+def template_id(template):
+    raw = json.dumps(template, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def merge(template, recipients, url=None, token=None):
+    """One merge call. template = {"subject", "body", "html", "name"} with {slot}s;
+    recipients = [{"to", "vars"}]. Returns one {"success", "error"?} per recipient,
+    in order. Raises MergeUnsupported when the endpoint cannot merge (decided only
+    from the POST's own reply), MaybeSent when the script ran but its results were
+    lost, MailError when the call as a whole was refused."""
+    url = url or os.environ["GMAIL_API_URL"]
+    if _post_ok.get(url) is False or _merge_ok.get(url) is False:
+        raise MergeUnsupported("mailer has no POST merge action")
+    tid = template_id(template)
+    rows = json.dumps([{"to": r["to"], "vars": r["vars"]} for r in recipients], ensure_ascii=False)
+    for _ in range(2):
+        fields = {"token": token or os.environ["GMAIL_API_TOKEN"], "action": "merge",
+                  "template_id": tid, "recipients": rows}
+        if (url, tid) not in _known_templates:
+            fields["template"] = json.dumps(template, ensure_ascii=False)
+        status, text, echoed = _open(urllib.request.Request(
+            url, data=urllib.parse.urlencode(fields).encode("utf-8"), method="POST",
+            headers={"Content-Type": "application/x-www-form-urlencoded; charset=utf-8"}))
+        result = _result(status, text)
+        if result is None:
+            if echoed:
+                raise MaybeSent(f"Apps Script merge ran, echo returned HTTP {status}: {text[:200]}")
+            if status in (200, 404, 405):
+                _post_ok[url] = False
+                raise MergeUnsupported("mailer has no doPost")
+            raise MailError(f"Apps Script merge failed: HTTP {status} {text[:200]}")
+        error = str(result.get("error") or "")
+        if error == "unknown template" and "template" not in fields:
+            _known_templates.discard((url, tid))  # cache expired on the script side
+            continue
+        if "unknown action" in error.lower():
+            _merge_ok[url] = False
+            raise MergeUnsupported("mailer has no merge action")
+        _check(result)
+        _known_templates.add((url, tid))
+        results = result.get("results") or []
+        if len(results) != len(recipients):
+            raise MaybeSent(f"merge returned {len(results)} results for {len(recipients)} recipients")
+        return results
+    raise MailError("merge: template rejected twice")
+
+
+def _send_filled(template, r, url, token):
+    """send() one recipient with the template filled in here (no merge action)."""
+    values = r["vars"]
+    for _ in range(2):
+        f = {k: fill(v, values) for k, v in template.items()}
+        try:
+            send(r["to"], f.get("subject", ""), f.get("body", ""), f.get("html", ""),
+                 f.get("name") or SENDER_NAME, url=url, token=token)
+            return {"success": True}
+        except TooLargeForGet as e:
+            if not r.get("shrink"):
+                return {"success": False, "error": str(e)}
+            values = r["shrink"]()
+        except (MaybeSent, OSError) as e:
+            return {"success": False, "unknown": True, "error": str(e)}
+        except MailError as e:
+            return {"success": False, "error": str(e)}
+    return {"success": False, "error": "too large for a GET-only mailer even after shrinking"}
+
+
+def send_merge(sched, template, recipients, url=None, token=None, stop=None):
+    """Send a campaign in merge batches, paced by a send_scheduler.Scheduler.
+
+    recipients = [{"to", "vars", "shrink"?}] — shrink() returns smaller vars, used only
+    when the mailer is GET-only and the message does not fit a URL.
+    Yields (recipient, True | UNKNOWN | error text) as results arrive. Stops early, without
+    yielding the rest, when the scheduler has no slot left today or stop() turns
+    True (checked between calls — do not break out mid-batch, the rest of that
+    batch has already been sent). Rate-limited recipients are queued again (the
+    scheduler backs off first). A call that may have run without a usable answer
+    (network failure, MaybeSent) yields UNKNOWN for its whole batch and is not
+    retried — the script may already have sent it."""
+    queue = deque((r, 0) for r in recipients)
+    batched = True
+    while queue and not (stop and stop()):
+        n = sched.acquire(len(queue) if batched else 1)     # the batch: what the bucket grants
+        if not n:
+            return
+        chunk = [queue.popleft() for _ in range(n)]
+        if batched:
+            try:
+                results = merge(template, [r for r, _ in chunk], url, token)
+            except MergeUnsupported:
+                sched.settle(n, 0)
+                queue.extendleft(reversed(chunk))
+                batched = False
+                continue
+            except (MaybeSent, OSError):  # the script may have sent the batch anyway
+                sched.settle(n, n)
+                for r, _ in chunk:
+                    yield r, UNKNOWN
+                continue
+            except MailError as e:  # an error reply from the script (token, HTTP status)
+                results = [{"success": False, "error": str(e)}] * n
+        else:
+            results = [_send_filled(template, chunk[0][0], url, token)]
+        errors = [str(x.get("error") or "unknown error") for x in results
+                  if not (x.get("success") or x.get("unknown"))]
+        sched.settle(n, n - len(errors), "; ".join(errors))
+        for (r, tries), x in zip(chunk, results):
+            error = str(x.get("error") or "unknown error")
+            if x.get("success"):
+                yield r, True
+            elif x.get("unknown"):
+                yield r, UNKNOWN
+            elif "rate limit" in error.lower() and tries + 1 < MERGE_RETRIES:
+                queue.append((r, tries + 1))
+            else:
+                yield r, error
+
+
+# ── Local stand-in for the Apps Script web app ───────────────────────────────
+
+class StandIn:
+    """The mailer as Google serves it, on localhost: POST → 302 → echo GET,
+    GET → 302 → echo GET, 400 for URLs over `url_limit`, optional doPost and merge
+    action (the same contract as gmail_mailer.gs). Accepted messages land in
+    .outbox; `fail` = {address: error} makes single recipients fail. `per_minute`
+    refuses messages over that many in any 60s (by `clock`) with Google's "Rate limit
+    exceeded", counted in .refused; `hang_up` runs a call, then drops the connection
+    without answering; `lose_echo` runs it, then answers the echo GET with a 404."""
+
+    def __init__(self, token="T", post=True, merge=True, url_limit=7600, error=None, fail=None,
+                 per_minute=None, clock=time.time, hang_up=False, lose_echo=False):
+        self.token, self.post, self.merge, self.url_limit = token, post, merge, url_limit
+        self.error, self.fail = error, dict(fail or {})
+        self.per_minute, self.clock, self.hang_up = per_minute, clock, hang_up
+        self.lose_echo = lose_echo
+        self.outbox, self.echo, self.templates, self.calls, self.uploads = [], {}, {}, 0, 0
+        self.sent_at, self.refused = deque(), 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, body, ctype="application/json", location=None):
+                raw = body.encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                if location:
+                    self.send_header("Location", location)
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _run(self, params):
+                key = uuid.uuid4().hex
+                stand_in.calls += 1
+                if params.get("token") != stand_in.token:
+                    stand_in.echo[key] = {"success": False, "error": "Unauthorized"}
+                elif params.get("action") == "send":
+                    stand_in.echo[key] = stand_in.deliver(params)
+                elif params.get("action") == "merge" and stand_in.merge:
+                    stand_in.echo[key] = stand_in.run_merge(params)
+                else:
+                    stand_in.echo[key] = {"success": False, "error": "Unknown action"}
+                if stand_in.hang_up:
+                    self.close_connection = True
+                    return
+                self._reply(302, "", "text/html", location=f"/macros/echo?key={key}")
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                params = dict(urllib.parse.parse_qsl(query))
+                if path == "/macros/echo":
+                    result = stand_in.echo.pop(params.get("key"), {})
+                    if stand_in.lose_echo:
+                        return self._reply(404, "<html>Not Found</html>", "text/html")
+                    return self._reply(200, json.dumps(result))
+                if len(f"http://{self.headers['Host']}{self.path}") > stand_in.url_limit:
+                    return self._reply(400, "<html>Bad Request</html>", "text/html")
+                self._run(params)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+                if not stand_in.post:
+                    return self._reply(200, "<html>Script function not found: doPost</html>", "text/html")
+                self._run(dict(urllib.parse.parse_qsl(body)))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/exec"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def deliver(self, message):
+        error = self.error or self.fail.get(message.get("to"))
+        if error:
+            return {"success": False, "error": error}
+        if self.per_minute:
+            now = self.clock()
+            while self.sent_at and now - self.sent_at[0] >= 60:
+                self.sent_at.popleft()
+            if len(self.sent_at) >= self.per_minute:
+                self.refused += 1
+                return {"success": False, "error": "Service invoked too many times in a short time. "
+                                                   "Rate limit exceeded"}
+            self.sent_at.append(now)
+        self.outbox.append(message)
+        return {"success": True}
+
+    def run_merge(self, params):
+        tid = params.get("template_id")
+        if params.get("template"):
+            self.templates[tid] = json.loads(params["template"])
+            self.uploads += 1
+        template = self.templates.get(tid)
+        if template is None:
+            return {"success": False, "error": "unknown template"}
+        results = []
+        for r in json.loads(params.get("recipients") or "[]"):
+            message = {k: fill(v, r.get("vars") or {}) for k, v in template.items()}
+            results.append(self.deliver(dict(message, to=r.get("to"))))
+        return {"success": True, "results": results}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def self_test():
+    big = "<p>" + "שלום עולם " * 6000 + "</p>"   # ~60K chars → ~500K URL-encoded
+    small = "<p>שלום</p>"
+    ok = True
+
+    def check(name, cond):
+        nonlocal ok
+        ok &= bool(cond)
+        print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+
+    s = StandIn()
+    send("a@x.com", "נושא", "גוף", big, url=s.url, token="T")
+    check("large message via POST + 302 echo", s.outbox and s.outbox[-1]["html"] == big)
+    try:
+        send("a@x.com", "נושא", "גוף", small, url=s.url, token="bad")
+        check("script error surfaces", False)
+    except MailError as e:
+        check("script error surfaces", "Unauthorized" in str(e))
+    s.error = "Service invoked too many times in a short time. Rate limit exceeded"
+    try:
+        send("a@x.com", "נושא", "גוף", small, url=s.url, token="T")
+    except MailError as e:
+        check("rate limit text reaches the caller", "rate limit" in str(e).lower())
+    s.close()
+
+    s = StandIn(lose_echo=True)
+    try:
+        send("c@x.com", "נושא", "גוף", small, url=s.url, token="T")
+        check("lost echo after POST: MaybeSent, no GET re-send", False)
+    except MaybeSent:
+        check("lost echo after POST: MaybeSent, no GET re-send",
+              len(s.outbox) == 1 and s.calls == 1 and _post_ok.get(s.url) is not False)
+    s.close()
+
+    class Sched:  # send_scheduler stand-in: 20 slots per call, records the settlements
+        def __init__(self):
+            self.settled = []
+
+        def acquire(self, n=1, timeout=None):
+            return min(n, 20)
+
+        def settle(self, granted, sent, info=""):
+            self.settled.append((granted, sent))
+
+    template = {"subject": "שלום {first}", "body": "{first}", "html": "<p>{first}, {lessons} שיעורים {x}</p>"}
+    people = [{"to": f"p{i}@x.com", "vars": {"first": f"לומד{i}", "lessons": i}} for i in range(45)]
+    s = StandIn(fail={"p7@x.com": "Invalid email: p7@x.com"})
+    sched = Sched()
+    got = dict((r["to"], res) for r, res in send_merge(sched, template, people, url=s.url, token="T"))
+    check("merge: 45 recipients in 3 calls", s.calls == 3 and len(s.outbox) == 44)
+    check("merge: per-recipient failure reported", got["p7@x.com"] != True and got["p8@x.com"] is True)
+    check("merge: filled like fill()", s.outbox[0]["html"] == "<p>לומד0, 0 שיעורים {x}</p>")
+    check("merge: template sent once, slots settled per batch",
+          s.uploads == 1 and sched.settled == [(20, 19), (20, 20), (5, 5)])
+    s.templates.clear()  # script-side cache expired
+    list(send_merge(sched, template, people[:2], url=s.url, token="T"))
+    check("merge: re-sends an expired template", len(s.outbox) == 46 and s.uploads == 2)
+    s.close()
+
+    # The real scheduler against a mailer that refuses past its per-minute limit. A
+    # bucket of BURST + MAX_RATE/min can emit at most that many in any 60s; simulated
+    # clock, so the run takes no real time.
+    import tempfile
+    import send_scheduler
+
+    class Clock:
+        def __init__(self):
+            self.now = 1_000_000.0
+
+        def time(self):
+            return self.now
+
+        def sleep(self, sec):
+            self.now += sec
+
+    clock = Clock()
+    saved = (send_scheduler.time, send_scheduler.STATE_DIR, send_scheduler.STATE_FILE,
+             send_scheduler.LOCK_FILE)
+    with tempfile.TemporaryDirectory() as tmp:
+        send_scheduler.time = clock
+        send_scheduler.STATE_DIR = Path(tmp)
+        send_scheduler.STATE_FILE = Path(tmp) / "send_quota.json"
+        send_scheduler.LOCK_FILE = Path(tmp) / "send_quota.lock"
+        try:
+            limit = send_scheduler.BURST + int(send_scheduler.MAX_RATE)
+            s = StandIn(per_minute=limit, clock=clock.time)
+            real = send_scheduler.Scheduler("self_test", send_scheduler.CAMPAIGN)
+            got = [res for _, res in send_merge(real, template, people[:30], url=s.url, token="T")]
+            check(f"scheduler: 30 sends, none over {limit}/min, <= BURST per call",
+                  got == [True] * 30 and s.refused == 0 and s.calls >= 30 / send_scheduler.BURST
+                  and clock.now - 1_000_000 >= (30 - send_scheduler.BURST) * 60 / send_scheduler.MAX_RATE - 1)
+            s.close()
+        finally:
+            (send_scheduler.time, send_scheduler.STATE_DIR, send_scheduler.STATE_FILE,
+             send_scheduler.LOCK_FILE) = saved
+
+    s = StandIn(hang_up=True)
+    sched = Sched()
+    got = [res for _, res in send_merge(sched, template, people[:5], url=s.url, token="T")]
+    check("merge: dropped connection → UNKNOWN, not retried",
+          got == [UNKNOWN] * 5 and s.calls == 1 and len(s.outbox) == 5 and sched.settled == [(5, 5)])
+    s.close()
+
+    s = StandIn(lose_echo=True)
+    sched = Sched()
+    got = [res for _, res in send_merge(sched, template, people[:5], url=s.url, token="T")]
+    check("merge: lost echo → UNKNOWN, no per-recipient re-send",
+          got == [UNKNOWN] * 5 and s.calls == 1 and len(s.outbox) == 5 and sched.settled == [(5, 5)])
+    s.close()
+
+    s = StandIn(merge=False)
+    got = list(send_merge(Sched(), template, people[:3], url=s.url, token="T"))
+    check("no merge action: falls back to one send per recipient",
+          [res for _, res in got] == [True] * 3 and s.outbox[-1]["subject"] == "שלום לומד2")
+    s.close()
+
+    s = StandIn(post=False)
+    send("b@x.com", "נושא", "גוף", small, url=s.url, token="T")
+    check("no doPost: small message falls back to GET", s.outbox and s.outbox[-1]["to"] == "b@x.com")
+    try:
+        send("b@x.com", "נושא", "גוף", big, url=s.url, token="T")
+        check("no doPost: large message raises TooLargeForGet", False)
+    except TooLargeForGet:
+        check("no doPost: large message raises TooLargeForGet", True)
+    s.close()
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--self-test", action="store_true")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    ap.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Hebrew full-text search over the course transcripts — static BM25 index.
+
+Until now the only way to find "where did Ram talk about anchoring" was a browser
+find over the 1.2MB nlp-course-transcripts.md. This builds an inverted index the
+portal can query with no server at all:
+
+  - every lesson is cut into short passages (PASSAGE_WORDS words), so a hit points
+    at a paragraph — and, when the lesson has timing, at a second of the video;
+  - Hebrew is normalized the same way at build and query time: niqqud/cantillation
+    removed, final letters folded (ם→מ ...), geresh/gershayim dropped (צה״ל → צהל);
+  - attached prefixes ו/ה/ב/ל/מ/ש/כ: a word cannot tell a prefix from a stem letter
+    (ה in הכללות is the article, in הכרה it is not), so nothing is stripped for
+    good. Every word is indexed as written AND as its prefix-stripped variants (up
+    to MAX_PREFIX letters, never below MIN_STEM), and a query word matches a
+    passage through the best of its own variants — so בהכללות, הכללות and
+    כללות find each other, and שלום is still שלומ, not לומ;
+  - BM25 weights are computed here, once, so a query is just "sum the postings";
+  - postings are sharded by the term's first two letters into small JSON files, so
+    the portal downloads only the shards of the words in the query (a few KB each)
+    instead of the whole index.
+
+Layout of an index directory:
+
+    meta.json            corpus, docs [[key, title, video_id]], shard names, passage block size
+    t/<shard>.json       {term: [passage_id, weight, passage_id, weight, ...]}  (weight = BM25 × 100)
+    p/<block>.json       [[doc, char_offset, seconds|null, snippet], ...]  PASSAGE_BLOCK per file
+
+Two corpora, kept apart on purpose:
+  practitioner  docs/transcripts/per-lesson   → data/search/practitioner  (public, deployed)
+  master        docs/master-course/*.txt      → content-private/search-master  (PAID — never
+                deployed, see .vercelignore; serve it the way get-game-data serves the
+                master game data)
+
+  py scripts/hebrew_search.py                         # rebuild both indexes
+  py scripts/hebrew_search.py --query "עוגן חזותי"     # search the practitioner index
+  py scripts/hebrew_search.py --query "מטא מודל" --corpus master
+"""
+import argparse
+import json
+import math
+import re
+import shutil
+import sys
+import unicodedata
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import transcript_store as store
+
+ROOT = Path(__file__).resolve().parent.parent
+MASTER_DIR = ROOT / "docs" / "master-course"
+INDEX_DIRS = {
+    "practitioner": ROOT / "data" / "search" / "practitioner",
+    "master": ROOT / "content-private" / "search-master",
+}
+
+FORMAT_VERSION = 2
+PASSAGE_WORDS = 80
+PASSAGE_BLOCK = 200
+SNIPPET_CHARS = 160
+K1, B = 1.2, 0.75
+
+PREFIXES = "והבלמשכ"
+MIN_STEM = 3
+MAX_PREFIX = 2
+FINALS = str.maketrans("ךםןףץ", "כמנפצ")
+# \w does not cover niqqud (combining marks), so they are added explicitly — a
+# pointed word must stay one word. A word may also carry a geresh/gershayim/
+# apostrophe inside it (צה״ל, ג'ירפה).
+WORD_CHAR = r"[\w\u0591-\u05bd\u05bf\u05c1\u05c2\u05c4\u05c5\u05c7]"
+WORD_RE = re.compile(rf"{WORD_CHAR}+(?:[\"'׳״]{WORD_CHAR}+)*")
+QUOTES_RE = re.compile(r"[\"'׳״]")
+# spoken-Hebrew filler that would otherwise be the biggest posting lists
+STOPWORDS = {w.translate(FINALS) for w in """
+    את של על זה זו זאת גם לא כן אני אתה את הוא היא אנחנו אתם אתן הם הן מה מי יש אין
+    כל או אם כי אז עם אל רק עוד כמו אבל פה שם הזה הזאת היה היתה להיות ככה בעצם כאילו
+    אוקיי אוקי טוב נכון שזה מאוד ממש עכשיו
+    """.split()}
+
+
+# ── Normalization (shared by the builder, the query API and the mentor index) ──
+
+def normalize_term(word):
+    """One raw word → its normalized surface form, or None if it is not worth
+    indexing. Prefixes are left on: see variants()."""
+    word = unicodedata.normalize("NFD", word)
+    word = "".join(ch for ch in word if not unicodedata.combining(ch))
+    word = QUOTES_RE.sub("", word).translate(FINALS).lower()
+    if len(word) < 2 or word in STOPWORDS or word.isdigit():
+        return None
+    return word
+
+
+def variants(term):
+    """`term` and what it would be without 1..MAX_PREFIX attached prefix letters,
+    keeping at least MIN_STEM letters: בהכללות → [בהכללות, הכללות, כללות]."""
+    out = [term]
+    while (len(out) <= MAX_PREFIX and out[-1][0] in PREFIXES
+           and len(out[-1]) - 1 >= MIN_STEM):
+        out.append(out[-1][1:])
+    return [out[0]] + [v for v in out[1:] if v not in STOPWORDS]
+
+
+def bag(words):
+    """Index terms of one passage: every word with all its variants."""
+    return Counter(v for w in words for v in variants(w))
+
+
+def query_terms(text):
+    """[[variants of word], ...] for a query, one list per distinct word."""
+    return [variants(t) for t in dict.fromkeys(terms(text))]
+
+
+def tokenize(text):
+    """[(start, end, term)] for every indexable word in `text`."""
+    out = []
+    for m in WORD_RE.finditer(text):
+        term = normalize_term(m.group())
+        if term:
+            out.append((m.start(), m.end(), term))
+    return out
+
+
+def terms(text):
+    return [t for _, _, t in tokenize(text)]
+
+
+def shard_name(term):
+    return "_".join(f"{ord(c):x}" for c in term[:2])
+
+
+# ── Sources ──────────────────────────────────────────────────────────────────
+
+def practitioner_docs():
+    """[(key, title, video_id, text, time_at)] from the per-lesson store."""
+    docs = []
+    for module_id, lesson_num, _ in store.list_lessons():
+        lesson = store.read_lesson(module_id, lesson_num)
+        if not lesson["transcript"]:
+            continue
+        segments = store.load_segments(module_id, lesson_num)
+        docs.append((store.lesson_key(module_id, lesson_num),
+                     f"מודול {module_id} · שיעור {lesson_num}: {lesson['title']}",
+                     lesson["id"], lesson["transcript"],
+                     segments.time_at if segments is not None else None))
+    return docs
+
+
+TIMESTAMP_RE = re.compile(r"\((?:(\d+):)?(\d{1,2}):(\d{2})\)\s*")
+LESSON_NUM_RE = re.compile(r"שיעור\s+(\d+)")
+VIDEO_RE = re.compile(r"[?&]v=([\w-]{11})")
+
+
+def parse_master_file(raw):
+    """(video_id, text, time_at) from a master-course export: a title line, the
+    watch URL, "Transcript:", then text with inline (MM:SS) markers. The markers
+    are removed from the text and kept as an offset → seconds table."""
+    video = VIDEO_RE.search(raw[:500])
+    body = raw.split("Transcript:", 1)[-1].strip()
+    pieces, marks, offsets, pos, last = [], [], [], 0, 0
+    for m in TIMESTAMP_RE.finditer(body):
+        chunk = body[last:m.start()]
+        pieces.append(chunk)
+        pos += len(chunk)
+        h, mm, ss = m.groups()
+        offsets.append(pos)
+        marks.append(int(h or 0) * 3600 + int(mm) * 60 + int(ss))
+        last = m.end()
+    pieces.append(body[last:])
+    text = "".join(pieces)
+
+    def time_at(offset):
+        i = bisect_right(offsets, offset) - 1
+        return marks[i] if i >= 0 else None
+    return (video.group(1) if video else ""), text, (time_at if marks else None)
+
+
+def master_docs():
+    docs = []
+    for path in MASTER_DIR.glob("*.txt"):
+        m = LESSON_NUM_RE.search(path.stem)
+        if not m:
+            continue
+        video_id, text, time_at = parse_master_file(path.read_text(encoding="utf-8"))
+        n = int(m.group(1))
+        docs.append((f"master_lesson{n}", f"קורס מאסטר · שיעור {n}", video_id, text, time_at))
+    return sorted(docs, key=lambda d: int(d[0].rsplit("lesson", 1)[1]))
+
+
+SOURCES = {"practitioner": practitioner_docs, "master": master_docs}
+
+
+# ── Build ────────────────────────────────────────────────────────────────────
+
+def split_passages(tokens, size=PASSAGE_WORDS):
+    """Group a doc's tokens into runs of `size` → [(start, end, [terms])]."""
+    return [(tokens[i][0], tokens[min(i + size, len(tokens)) - 1][1],
+             [t for _, _, t in tokens[i:i + size]])
+            for i in range(0, len(tokens), size)]
+
+
+def bm25_postings(bags):
+    """{term: [passage_id, weight, ...]} from one Counter of terms per passage.
+    Weights are full BM25 (idf × saturated tf × length norm) × 100, rounded, so a
+    query only has to add them up."""
+    n = len(bags)
+    avgdl = sum(sum(b.values()) for b in bags) / n if n else 0.0
+    df = Counter(term for bag in bags for term in bag)
+    postings = defaultdict(list)
+    for pid, bag in enumerate(bags):
+        norm = K1 * (1 - B + B * sum(bag.values()) / avgdl)
+        for term, tf in bag.items():
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            postings[term] += [pid, max(1, round(100 * idf * tf * (K1 + 1) / (tf + norm)))]
+    return postings
+
+
+def build(corpus, out_dir=None):
+    out_dir = Path(out_dir or INDEX_DIRS[corpus])
+    docs = SOURCES[corpus]()
+    passages, bags = [], []
+    for doc_idx, (_, _, _, text, time_at) in enumerate(docs):
+        for offset, _, words in split_passages(tokenize(text)):
+            t = time_at(offset) if time_at else None
+            snippet = " ".join(text[offset:offset + SNIPPET_CHARS].split())
+            passages.append([doc_idx, offset, None if t is None else int(t), snippet])
+            bags.append(bag(words))
+
+    n = len(passages)
+    postings = bm25_postings(bags)
+
+    shards = defaultdict(dict)
+    for term in sorted(postings):
+        shards[shard_name(term)][term] = postings[term]
+
+    # clean rebuild — a shard that no longer has terms must not linger
+    for sub in ("t", "p"):
+        shutil.rmtree(out_dir / sub, ignore_errors=True)
+        (out_dir / sub).mkdir(parents=True)
+    dump = lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    for name, body in shards.items():
+        store.atomic_write_text(out_dir / "t" / f"{name}.json", dump(body))
+    for i in range(0, n, PASSAGE_BLOCK):
+        store.atomic_write_text(out_dir / "p" / f"{i // PASSAGE_BLOCK}.json",
+                                dump(passages[i:i + PASSAGE_BLOCK]))
+    meta = {
+        "v": FORMAT_VERSION,
+        "corpus": corpus,
+        "passages": n,
+        "passage_block": PASSAGE_BLOCK,
+        "docs": [[key, title, vid] for key, title, vid, _, _ in docs],
+        "shards": sorted(shards),
+    }
+    store.atomic_write_text(out_dir / "meta.json", dump(meta))
+    sizes = [len(dump(b).encode("utf-8")) for b in shards.values()]
+    return {"docs": len(docs), "passages": n, "terms": len(postings),
+            "shards": len(shards), "max_shard_kb": max(sizes, default=0) / 1024}
+
+
+# ── Query API ────────────────────────────────────────────────────────────────
+
+class SearchIndex:
+    """Reads a built index the way the portal does: meta.json up front, then only
+    the term shards and passage blocks a query touches (cached per instance)."""
+
+    def __init__(self, directory):
+        self.dir = Path(directory)
+        self.meta = json.loads((self.dir / "meta.json").read_text(encoding="utf-8"))
+        if self.meta.get("v") != FORMAT_VERSION:
+            raise ValueError(f"{self.dir}: index format {self.meta.get('v')}, expected {FORMAT_VERSION}")
+        self.shard_names = set(self.meta["shards"])
+        self._shards, self._blocks = {}, {}
+
+    def _shard(self, name):
+        if name not in self._shards:
+            path = self.dir / "t" / f"{name}.json"
+            self._shards[name] = (json.loads(path.read_text(encoding="utf-8"))
+                                  if name in self.shard_names else {})
+        return self._shards[name]
+
+    def passage(self, pid):
+        block = pid // self.meta["passage_block"]
+        if block not in self._blocks:
+            path = self.dir / "p" / f"{block}.json"
+            self._blocks[block] = json.loads(path.read_text(encoding="utf-8"))
+        return self._blocks[block][pid % self.meta["passage_block"]]
+
+    def search(self, query, k=10):
+        """Top-k passages for `query`, best first:
+        [{score, doc, title, offset, seconds, snippet, url}]
+        Each query word scores a passage by the best of its variants."""
+        scores = Counter()
+        for forms in query_terms(query):
+            best = {}
+            for term in forms:
+                flat = self._shard(shard_name(term)).get(term, [])
+                for i in range(0, len(flat), 2):
+                    best[flat[i]] = max(best.get(flat[i], 0), flat[i + 1])
+            scores.update(best)
+        hits = []
+        for pid, score in sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:k]:
+            doc_idx, offset, seconds, snippet = self.passage(pid)
+            key, title, vid = self.meta["docs"][doc_idx]
+            url = f"https://www.youtube.com/watch?v={vid}" if vid else ""
+            if url and seconds is not None:
+                url += f"&t={seconds}s"
+            hits.append({"score": score / 100, "doc": key, "title": title, "offset": offset,
+                         "seconds": seconds, "snippet": snippet, "url": url})
+        return hits
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--query")
+    ap.add_argument("--corpus", choices=sorted(INDEX_DIRS), default="practitioner")
+    ap.add_argument("-k", type=int, default=10)
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+
+    if args.query:
+        for hit in SearchIndex(INDEX_DIRS[args.corpus]).search(args.query, args.k):
+            print(f"{hit['score']:7.2f}  {hit['title']}  {hit['url']}\n         {hit['snippet']}")
+        return
+    for corpus in INDEX_DIRS:
+        stats = build(corpus)
+        print(f"{corpus}: {stats['docs']} docs, {stats['passages']} passages, "
+              f"{stats['terms']} terms in {stats['shards']} shards "
+              f"(largest {stats['max_shard_kb']:.1f}KB) → {INDEX_DIRS[corpus]}")
+
+
+if __name__ == "__main__":
+    main()
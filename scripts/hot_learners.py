@@ -7,19 +7,30 @@ time, game activity, questions to the AI mentor, notes taken, how recently), so
 Master pitch can be aimed at the people who already invested — instead of pushing
 the same generic popup at all 589 of them.
 
+The scoring itself is columnar (learner_scoring.py): weights and the hot/warm
+cut-offs live in learner_scoring.json (or the file given with --config), not in
+this file.
+
 Pulls Clarity alongside it (rage clicks, dead clicks, scroll depth) so the friction
 they hit is in the same picture.
 
   py scripts/hot_learners.py
+  py scripts/hot_learners.py --config weights-test.json   # try another weight set
 Writes: docs/hot-learners-<date>.md  (+ prints a WhatsApp-ready summary)
 """
+import argparse
 import json
 import re
 import pathlib
 import datetime
 import collections
+import numpy as np
 import requests
 
+import cohort_stats
+import learner_features
+import learner_scoring as scoring
+
 ROOT = pathlib.Path(__file__).resolve().parent.parent
 SECRETS = pathlib.Path(r"C:\Users\saraa\.secrets\onedrive\beit-vmetaplim_.env.local")
 CLARITY_SECRETS = pathlib.Path(r"C:\Users\saraa\.secrets\beit-vmetaplim.env")
@@ -27,6 +38,12 @@ CLARITY_DIR = ROOT / "scripts" / "clarity-data"
 
 TODAY = datetime.date.today()
 
+ap = argparse.ArgumentParser()
+ap.add_argument("--config", help="scoring config JSON (default: scripts/learner_scoring.json)")
+ARGS = ap.parse_args()
+if ARGS.config and not pathlib.Path(ARGS.config).is_file():
+    ap.error(f"--config: no such file {ARGS.config}")
+
 
 def env(path):
     d = {}
@@ -63,136 +80,87 @@ def fetch_all(table, select, extra=None):
 
 print("pulling live data...")
 # Column names verified against the live schema — do not guess them.
-profiles = fetch_all("profiles", "id,full_name,email,phone,role,created_at")
-progress = fetch_all("course_progress", "user_id,video_id,course_type,completed,watched_seconds,updated_at")
 quest = fetch_all("portal_questionnaires", "user_id,why_nlp,main_challenge,how_found,study_time,occupation,created_at")
-notes = fetch_all("user_notes", "user_id,updated_at")
-game = fetch_all("nlp_game_players", "user_id,xp,streak,completed_lessons,updated_at")
-chat = fetch_all("ai_chat_usage", "user_id,message_count,date")
-
-print(f"  profiles={len(profiles)} progress={len(progress)} questionnaires={len(quest)} "
-      f"notes={len(notes)} game={len(game)} chat={len(chat)}")
+# Everything else comes from today's learner feature table (learner_features.py):
+# one row per PERSON, built at most once a day and shared with the email jobs.
+feats = learner_features.load(BASE, KEY)
+total_accounts = feats.meta["accounts"]
 
-paid = {p["id"] for p in profiles if p.get("role") == "paid_customer"}
-staff = {p["id"] for p in profiles if p.get("role") == "admin"}
+print(f"  accounts={total_accounts} people={len(feats)} questionnaires={len(quest)} "
+      f"(features built {feats.meta['built']})")
 
 # ---- build the score -------------------------------------------------------
-lessons = collections.Counter()
-watch = collections.Counter()
-last_seen = {}
-for r in progress:
-    u = r.get("user_id")
-    if not u:
-        continue
-    if r.get("completed"):
-        lessons[u] += 1
-    watch[u] += (r.get("watched_seconds") or 0)
-    ts = r.get("updated_at")
-    if ts and (u not in last_seen or ts > last_seen[u]):
-        last_seen[u] = ts
-
-notes_n = collections.Counter(r["user_id"] for r in notes if r.get("user_id"))
-# ai_chat_usage is one row per user per day, with a message count on it.
-chat_n = collections.Counter()
-for r in chat:
-    if r.get("user_id"):
-        chat_n[r["user_id"]] += (r.get("message_count") or 0)
-game_by = {r["user_id"]: r for r in game if r.get("user_id")}
 quest_by = {r["user_id"]: r for r in quest if r.get("user_id")}
 
 
-def days_since(ts):
-    if not ts:
-        return 999
-    try:
-        d = datetime.datetime.fromisoformat(str(ts).replace("Z", "+00:00")).date()
-        return (TODAY - d).days
-    except Exception:
-        return 999
-
-
-# Merge duplicate accounts before scoring.
+# Duplicate accounts are already merged in the feature table.
 # 21 real people hold two accounts, almost always an email typo at signup
 # (".con" for ".com", "walla.com.com"). Their progress is SPLIT across both, so
 # scoring per-account understates exactly the people we care about most: one
 # learner shows up twice with 44 and 28 lessons when he really has 72.
-PLACEHOLDER_PHONE = "0500000000"
-
-
-def person_key(p):
-    ph = re.sub(r"\D", "", p.get("phone") or "")
-    if ph and ph != PLACEHOLDER_PHONE:
-        return "p:" + ph[-9:]
-    return "id:" + p["id"]
-
-
-people = collections.defaultdict(list)
-for p in profiles:
-    if p["id"] in paid or p["id"] in staff:
-        continue
-    people[person_key(p)].append(p)
-
-merged_count = sum(1 for v in people.values() if len(v) > 1)
-
-scored = []
-for key, accounts in people.items():
-    ids = [a["id"] for a in accounts]
-    n_les = sum(lessons[i] for i in ids)
-    n_chat = sum(chat_n[i] for i in ids)
-    n_notes = sum(notes_n[i] for i in ids)
-    games = [game_by[i] for i in ids if i in game_by]
-    if n_les == 0 and not games and n_chat == 0:
-        continue  # never engaged at all — do not inflate the list
-
-    xp = max([g.get("xp") or 0 for g in games] or [0])
-    streak = max([g.get("streak") or 0 for g in games] or [0])
-    stamps = [last_seen.get(i) for i in ids if last_seen.get(i)] + \
-             [g.get("updated_at") for g in games if g.get("updated_at")]
-    recency = min([days_since(s) for s in stamps] or [999])
-
-    # Watch time is deliberately NOT scored: only 110 of 2,396 progress rows carry
-    # any watched_seconds at all and the maximum is 6 seconds, so the column is not
-    # actually being written. Scoring it would just add noise.
-    # Finishing lessons is the strongest signal of intent; mentor questions and notes
-    # mean he is working rather than watching; recency decides if he is reachable now.
-    score = (
-        n_les * 6
-        + n_chat * 4
-        + n_notes * 5
-        + min(xp / 100, 20)
-        + streak * 2
-        + (25 if recency <= 7 else 12 if recency <= 30 else 0)
-    )
-    best = max(accounts, key=lambda a: lessons[a["id"]])
-    scored.append({
-        "id": best["id"],
+# identity_resolver links them by phone, corrected email and name+signup date.
+everyone = feats.people()
+paid_n = sum(1 for p in everyone if p["paid"])
+people = [p for p in everyone if not (p["paid"] or p["staff"])]  # one paid account = bought
+merged_count = sum(1 for p in people if len(p["accounts"]) > 1)
+
+# One slot per person, scored as whole arrays
+# (weights + tier cut-offs: --config / learner_scoring.json / DEFAULT_CONFIG).
+CFG = scoring.load_config(ARGS.config)
+cols = scoring.columns_from_features(people)
+score = scoring.score(cols, CFG)
+mask = scoring.engaged(cols)  # never engaged at all — do not inflate the list
+tier = scoring.tiers(cols, CFG)
+
+# Lesson rank inside cohorts (everyone who started / same signup month / active
+# window): each cohort sorted once, every lookup a binary search (cohort_stats).
+lesson_stats = cohort_stats.CohortStats([p for p in people if p["lessons"]], value=lambda p: p["lessons"],
+                                        slices=cohort_stats.LEARNER_SLICES)
+
+
+def row(slot):
+    p = people[slot]
+    ids = p["accounts"]
+    signup = cohort_stats.by_signup_month(p)
+    return {
+        "id": p["primary"],
         "all_ids": ids,
         "accounts": len(ids),
-        "name": best.get("full_name") or "—",
-        "phone": best.get("phone") or "",
-        "email": best.get("email") or "",
-        "lessons": n_les,
-        "chat": n_chat,
-        "notes": n_notes,
-        "xp": xp,
-        "streak": streak,
-        "days_ago": recency,
-        "score": round(score, 1),
+        "name": p["full_name"] or "—",
+        "phone": p["phone"],
+        "email": p["email"],
+        "lessons": int(cols["lessons"][slot]),
+        "chat": int(cols["chat"][slot]),
+        "notes": int(cols["notes"][slot]),
+        "xp": int(cols["xp"][slot]),
+        "streak": int(cols["streak"][slot]),
+        "days_ago": int(cols["days_ago"][slot]),
+        "score": round(float(score[slot]), 1),
+        "top_pct": cohort_stats.rounded_top(lesson_stats.cohort().top_pct(p["lessons"])),
+        "signup_top_pct": cohort_stats.rounded_top(lesson_stats.cohort("signup", signup).top_pct(p["lessons"])),
         "q": next((quest_by[i] for i in ids if i in quest_by), {}),
-    })
+    }
+
 
-scored.sort(key=lambda x: -x["score"])
 print(f"  merged {merged_count} people who hold more than one account")
 
 # ---- pick the threshold from the data, not from a guess --------------------
-by_lessons = collections.Counter(s["lessons"] for s in scored)
-active_30d = [s for s in scored if s["days_ago"] <= 30]
-hot = [s for s in scored if s["lessons"] >= 5 and s["days_ago"] <= 45]
-warm = [s for s in scored if 1 <= s["lessons"] < 5]
-
-print(f"\nengaged at all: {len(scored)}  |  active last 30d: {len(active_30d)}")
-print(f"HOT (>=5 lessons, seen in 45d): {len(hot)}")
-print(f"warm (1-4 lessons): {len(warm)}")
+engaged_n = int(mask.sum())
+lesson_values, lesson_counts = np.unique(cols["lessons"][mask], return_counts=True)
+by_lessons = dict(zip(lesson_values.tolist(), lesson_counts.tolist()))
+active_30d = int((mask & (cols["days_ago"] <= CFG["active_days"])).sum())
+hot = [row(slot) for slot in scoring.ranking(score, mask & tier["hot"])]
+warm_n = int((mask & tier["warm"]).sum())
+
+hot_rule, warm_rule = CFG["tiers"]["hot"], CFG["tiers"]["warm"]
+print(f"\nengaged at all: {engaged_n}  |  active last {CFG['active_days']}d: {active_30d}")
+print(f"HOT ({scoring.describe(hot_rule)}): {len(hot)}")
+print(f"warm ({scoring.describe(warm_rule)}): {warm_n}")
+for window in cohort_stats.ACTIVITY_WINDOWS:
+    c = lesson_stats.cohort("active", window)
+    if len(c):
+        print(f"  active {window}d: {len(c)} learners, top 10% = {c.cutoff(10)}+ lessons, "
+              f"top 25% = {c.cutoff(25)}+")
 
 # ---- Clarity ---------------------------------------------------------------
 clarity_lines = []
@@ -218,20 +186,21 @@ out.parent.mkdir(exist_ok=True)
 
 L = []
 L.append(f"# מי הלומדים החמים · {TODAY}\n")
-L.append(f"נבדקו **{len(profiles)}** משתמשים. {len(paid)} כבר קנו. "
-         f"**{len(scored)}** עשו משהו בפועל בקורס.\n")
+L.append(f"נבדקו **{total_accounts}** משתמשים. {paid_n} כבר קנו. "
+         f"**{engaged_n}** עשו משהו בפועל בקורס.\n")
 L.append("## הקהל\n")
-L.append(f"- 🔥 **חמים ({len(hot)})** — סיימו 5+ שיעורים ונראו ב-45 הימים האחרונים.")
-L.append(f"- 🌡️ פושרים ({len(warm)}) — התחילו, 1-4 שיעורים.")
+L.append(f"- 🔥 **חמים ({len(hot)})** — {scoring.describe(hot_rule)}.")
+L.append(f"- 🌡️ פושרים ({warm_n}) — התחילו, {scoring.describe(warm_rule)}.")
 L.append(f"- 💤 שאר הנרשמים — נרשמו ולא נגעו בקורס.\n")
 
 L.append("## 20 השמות החמים ביותר\n")
-L.append("| # | שם | טלפון | שיעורים | שאלות למנטור | הערות | לפני (ימים) | חשבונות | ציון |")
-L.append("|---|-----|-------|---------|--------------|-------|-------------|---------|------|")
+L.append("| # | שם | טלפון | שיעורים | טופ % (מחזור הרשמה) | שאלות למנטור | הערות | לפני (ימים) | חשבונות | ציון |")
+L.append("|---|-----|-------|---------|---------------------|--------------|-------|-------------|---------|------|")
 for i, s in enumerate(hot[:20], 1):
     dup = "⚠️ 2" if s["accounts"] > 1 else "1"
     L.append(f"| {i} | {s['name']} | {s['phone']} | {s['lessons']} | "
-             f"{s['chat']} | {s['notes']} | {s['days_ago']} | {dup} | {s['score']} |")
+             f"{s['top_pct']}% ({s['signup_top_pct']}%) | "
+             f"{s['chat']} | {s['notes']} | {s['days_ago']} | {dup} | {s['score']:g} |")
 
 L.append("\n## ⚠️ שני באגים שהדוח חשף\n")
 L.append("- **זמן צפייה לא נרשם.** מתוך 2,396 רשומות התקדמות, רק 110 עם זמן צפייה כלשהו, "
@@ -239,7 +208,7 @@ L.append("- **זמן צפייה לא נרשם.** מתוך 2,396 רשומות ה
          "לכן המדד הזה לא נכלל בניקוד — הוא חסר ערך.")
 L.append(f"- **{merged_count} אנשים עם חשבון כפול.** בדרך כלל טעות הקלדה במייל בהרשמה "
          "(`.con` במקום `.com`). ההתקדמות מפוצלת בין החשבונות, ולכן הם נראו פחות חמים ממה שהם. "
-         "הדוח הזה מאחד אותם לפי טלפון.")
+         "הדוח הזה מאחד אותם לפי טלפון, מייל מתוקן ושם + תאריך הרשמה.")
 
 L.append("\n## מה מאפיין אותם (מתוך השאלון שלהם)\n")
 for field, title in (("why_nlp", "למה NLP"), ("main_challenge", "האתגר המרכזי"),
@@ -267,15 +236,15 @@ print("\n" + "=" * 60)
 print("WHATSAPP SUMMARY")
 print("=" * 60)
 top5 = hot[:5]
-print(f"🔥 {len(hot)} לומדים חמים (5+ שיעורים, פעילים)")
-print(f"🌡️ {len(warm)} פושרים (1-4 שיעורים)")
-print(f"💤 {len(profiles) - len(scored) - len(paid)} נרשמו ולא פתחו את הקורס")
+print(f"🔥 {len(hot)} לומדים חמים ({scoring.describe(hot_rule)})")
+print(f"🌡️ {warm_n} פושרים ({scoring.describe(warm_rule)})")
+print(f"💤 {len(people) - engaged_n} נרשמו ולא פתחו את הקורס")
 print("\nהחמישייה הפותחת:")
 for s in top5:
     print(f"  {s['name']} — {s['lessons']} שיעורים, לפני {s['days_ago']} ימים")
 
 json_out = ROOT / "docs" / f"hot-learners-{TODAY}.json"
-json_out.write_text(json.dumps({"hot": hot, "warm_count": len(warm),
-                                "engaged": len(scored), "total": len(profiles)},
+json_out.write_text(json.dumps({"hot": hot, "warm_count": warm_n,
+                                "engaged": engaged_n, "total": total_accounts},
                                ensure_ascii=False, indent=2), encoding="utf-8")
 print(f"\nfull data: {json_out}")
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Who is the same person? — one person id per human, however many accounts he opened.
+
+Duplicate accounts are almost always a typo at signup: ".con" for ".com",
+"walla.com.com", a gmail address typed once with a dot and once without. The person
+then has half his progress on each account, and every report undercounts exactly the
+learners who invested most (hot_learners), or mails them twice with two different
+numbers (monthly_journey_email, study_buddy_seed_invite).
+
+Resolution is union-find over blocking keys — never a pairwise comparison, so it
+stays near-linear as signups grow:
+
+  phone   last 9 digits (the 0500000000 placeholder and junk numbers excluded)
+  email   lower-cased, known domain typos corrected, gmail dots / +tags removed
+  name    same full name (2+ words) AND signed up within NAME_WINDOW_DAYS of each
+          other — sorted by created_at inside the name block, neighbours only
+
+Every account lands in a hash bucket per key; all accounts in a bucket are unioned
+with the first one. Person ids are stable across runs: a component keeps the id it
+had in the previous map, otherwise it takes the id of its oldest account.
+
+Writes scripts/journey_state/person_ids.json — {account_id: person_id} plus the key
+that merged each multi-account person. learner_features.py refreshes it with every
+daily build, and the learner jobs get their people from that table; accounts
+missing from the map are their own person.
+
+  py scripts/identity_resolver.py             # fetch profiles, rebuild the map
+  py scripts/identity_resolver.py --dry-run   # print the merges, write nothing
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import unicodedata
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STATE_DIR = Path(__file__).resolve().parent / "journey_state"
+MAP_FILE = STATE_DIR / "person_ids.json"
+
+PLACEHOLDER_PHONE = "0500000000"
+NAME_WINDOW_DAYS = 3  # two signups under the same full name this close = one person retrying
+
+# Domain typos seen in the profiles table, plus the usual suspects. Applied to the
+# part after "@" only.
+DOMAIN_FIXES = {
+    "gmail.con": "gmail.com", "gmail.co": "gmail.com", "gmail.cm": "gmail.com",
+    "gmial.com": "gmail.com", "gmai.com": "gmail.com", "gamil.com": "gmail.com",
+    "gmail.com.com": "gmail.com", "gmaill.com": "gmail.com", "g.mail.com": "gmail.com",
+    "walla.con": "walla.com", "walla.com.com": "walla.com", "wala.com": "walla.com",
+    "hotmail.con": "hotmail.com", "hotmial.com": "hotmail.com", "hotmail.co": "hotmail.com",
+    "yahoo.con": "yahoo.com", "yaho.com": "yahoo.com",
+    "outlook.con": "outlook.com", "outlok.com": "outlook.com",
+}
+GMAIL_DOMAINS = {"gmail.com", "googlemail.com"}
+
+
+# ── Blocking keys ────────────────────────────────────────────────────────────
+
+def phone_key(raw):
+    d = re.sub(r"\D", "", str(raw or ""))
+    if len(d) < 9 or d == PLACEHOLDER_PHONE or len(set(d[-9:])) == 1:
+        return None
+    return d[-9:]
+
+
+def email_key(raw):
+    e = (raw or "").strip().lower()
+    if e.count("@") != 1:
+        return None
+    local, domain = e.split("@")
+    domain = domain.strip(".")
+    domain = re.sub(r"\.con$", ".com", domain)
+    domain = re.sub(r"(\.com)+$", ".com", domain)
+    domain = re.sub(r"(\.co\.il)+$", ".co.il", domain)
+    domain = DOMAIN_FIXES.get(domain, domain)
+    if domain in GMAIL_DOMAINS:
+        local = local.split("+", 1)[0].replace(".", "")
+        domain = "gmail.com"
+    if not local or "." not in domain:
+        return None
+    return f"{local}@{domain}"
+
+
+def name_key(raw):
+    n = unicodedata.normalize("NFC", raw or "")
+    n = " ".join(re.sub(r"[^\w\s]", " ", n).lower().split())
+    return n if len(n.split()) >= 2 else None
+
+
+def signup_day(p):
+    s = (p.get("created_at") or "")[:10]
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").toordinal()
+    except ValueError:
+        return None
+
+
+# ── Union-find ───────────────────────────────────────────────────────────────
+
+class DisjointSet:
+    """Union by size + path halving — effectively O(1) per operation."""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+def resolve(profiles, previous=None):
+    """profiles: rows with id, full_name, email, phone, created_at.
+    previous: {account_id: person_id} from the last map (keeps ids stable).
+
+    → ({account_id: person_id}, {person_id: sorted merge keys}) — the second dict
+    only lists people with more than one account."""
+    previous = previous or {}
+    ds = DisjointSet(len(profiles))
+    why = defaultdict(set)  # account index → keys that linked it to someone
+
+    def link(i, j, key):
+        if ds.union(i, j):
+            why[i].add(key)
+            why[j].add(key)
+
+    for key, fn in (("phone", lambda p: phone_key(p.get("phone"))),
+                    ("email", lambda p: email_key(p.get("email")))):
+        first = {}
+        for i, p in enumerate(profiles):
+            k = fn(p)
+            if k is None:
+                continue
+            if k in first:
+                link(first[k], i, key)
+            else:
+                first[k] = i
+
+    by_name = defaultdict(list)
+    for i, p in enumerate(profiles):
+        k, day = name_key(p.get("full_name")), signup_day(p)
+        if k and day is not None:
+            by_name[k].append((day, i))
+    for block in by_name.values():
+        block.sort()
+        for (d1, i), (d2, j) in zip(block, block[1:]):
+            if d2 - d1 <= NAME_WINDOW_DAYS:
+                link(i, j, "name")
+
+    members = defaultdict(list)
+    for i in range(len(profiles)):
+        members[ds.find(i)].append(i)
+
+    # Oldest account first inside each person, and people in order of their oldest
+    # account. A person keeps a carried (previous) id unless another person in this
+    # pass already took it, or it is the account id of someone else now — that
+    # account's own person will claim it. Otherwise the id is the person's oldest
+    # account id. So when a merged person splits, the part holding the oldest
+    # account keeps the old id, the other parts get their own, and two people
+    # never share an id.
+    age = lambda i: (profiles[i].get("created_at") or "9999", profiles[i]["id"])
+    for idx in members.values():
+        idx.sort(key=age)
+    owner = {profiles[i]["id"]: root for root, idx in members.items() for i in idx}
+    person_of, reasons, assigned = {}, {}, set()
+    for root, idx in sorted(members.items(), key=lambda m: age(m[1][0])):
+        ids = [profiles[i]["id"] for i in idx]
+        carried = [previous[a] for a in ids if a in previous]
+        pid = next((c for c in carried + ids
+                    if c not in assigned and owner.get(c, root) == root), None)
+        if pid is None:
+            raise ValueError(f"no free person id for accounts {ids}: all already assigned")
+        assigned.add(pid)
+        for i in idx:
+            person_of[profiles[i]["id"]] = pid
+        if len(idx) > 1:
+            reasons[pid] = sorted(set().union(*(why[i] for i in idx)))
+    return person_of, reasons
+
+
+def group(person_of, account_ids):
+    """{person_id: [account_id, ...]} for the given accounts (unmapped → own person)."""
+    out = defaultdict(list)
+    for a in account_ids:
+        out[person_of.get(a, a)].append(a)
+    return out
+
+
+# ── Persisted map ────────────────────────────────────────────────────────────
+
+def load_person_ids():
+    """{account_id: person_id} from the last build ({} if it was never built)."""
+    try:
+        return json.loads(MAP_FILE.read_text(encoding="utf-8"))["accounts"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_person_ids(person_of, reasons):
+    """Every learner job reads this map: write a temp file and swap it in, so a
+    reader never sees half of it."""
+    STATE_DIR.mkdir(exist_ok=True)
+    tmp = MAP_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "accounts": person_of,
+        "merged": reasons,
+    }, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, MAP_FILE)
+
+
+def refresh(profiles):
+    """Resolve `profiles` against the previous map, persist, return the new map."""
+    person_of, reasons = resolve(profiles, load_person_ids())
+    save_person_ids(person_of, reasons)
+    return person_of, reasons
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+
+def fetch_profiles():
+    env = {}
+    for line in (ROOT / ".env.local").read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#") and "=" in line:
+            k, v = line.split("=", 1)
+            env[k.strip()] = v.strip().strip('"').strip("'")
+    base = os.environ.get("SUPABASE_URL", env.get("SUPABASE_URL", "")).rstrip("/")
+    key = os.environ.get("SUPABASE_SERVICE_KEY", env.get("SUPABASE_SERVICE_KEY", ""))
+    headers = {"apikey": key, "Authorization": f"Bearer {key}", "Accept-Profile": "public"}
+    rows, offset = [], 0
+    while True:
+        q = urllib.parse.urlencode({"select": "id,full_name,email,phone,created_at",
+                                    "order": "created_at", "limit": "1000", "offset": str(offset)})
+        req = urllib.request.Request(f"{base}/rest/v1/profiles?{q}", headers=headers)
+        with urllib.request.urlopen(req, timeout=60) as r:
+            batch = json.loads(r.read().decode())
+        rows += batch
+        if len(batch) < 1000:
+            return rows
+        offset += 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+
+    profiles = fetch_profiles()
+    by_id = {p["id"]: p for p in profiles}
+    person_of, reasons = resolve(profiles, load_person_ids())
+    people = group(person_of, by_id)
+    print(f"{len(profiles)} accounts → {len(people)} people "
+          f"({len(reasons)} people hold more than one account)")
+    counts = defaultdict(int)
+    for keys in reasons.values():
+        for k in keys:
+            counts[k] += 1
+    print("  merged by: " + ", ".join(f"{k} {n}" for k, n in sorted(counts.items())))
+    for pid, keys in sorted(reasons.items(), key=lambda kv: -len(people[kv[0]]))[:15]:
+        emails = " | ".join(by_id[a].get("email") or "—" for a in people[pid])
+        print(f"  {'+'.join(keys):<12} {emails}")
+    if not args.dry_run:
+        save_person_ids(person_of, reasons)
+        print(f"wrote {MAP_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+The daily learner feature table — one row per PERSON, read by every learner job.
+
+hot_learners, monthly_journey_email and study_buddy_seed_invite each used to derive
+"how many lessons", "last active", "streak", "next lesson" on their own, each with
+its own small twist (completed rows vs distinct lessons, completed_at vs updated_at,
+practitioner-only or not). This builds those features once a day, with one
+definition each, and the scripts read the result:
+
+  lessons            distinct completed videos, all courses, pooled across the
+                     person's accounts (identity_resolver)
+  practitioner       of those, lessons of the free practitioner course
+  courses            {course_type: distinct lessons} — the course cohorts (cohort_stats)
+  month_lessons      distinct lessons completed in `month` (the last full month)
+  last_active        latest course_progress / game update (YYYY-MM-DD), days_ago
+  xp, streak, longest_streak, games, notes, chat
+  next_lesson        first practitioner lesson (course order, course_catalog) not done yet
+  rank               1 + number of people with more lessons (ties share a rank)
+
+Inputs are already small: the learner_activity_rollup RPC (learner_rollup.py), the
+profiles table and the person-id map. The file is rebuilt at most once a day —
+load() reuses today's table, so the three jobs running the same morning share one
+build.
+
+On disk (scripts/journey_state/learner_features.json) the rows are arrays under a
+single column list, plus {account_id: row}; FeatureTable.get(account_id) is a dict
+lookup.
+
+  py scripts/learner_features.py           # build (if not built today) + summary
+  py scripts/learner_features.py --force   # rebuild now
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+
+import cohort_stats
+import course_catalog
+import identity_resolver as identity
+import learner_rollup
+
+ROOT = Path(__file__).resolve().parent.parent
+STATE_DIR = Path(__file__).resolve().parent / "journey_state"
+FEATURES_FILE = STATE_DIR / "learner_features.json"
+FORMAT_VERSION = 2
+
+COLUMNS = ["person_id", "accounts", "primary", "email", "full_name", "first_name", "phone",
+           "created_at", "paid", "staff", "opt_out",
+           "lessons", "practitioner", "courses", "month_lessons", "last_active", "days_ago",
+           "xp", "streak", "longest_streak", "games", "notes", "chat",
+           "next_lesson", "rank"]
+
+
+def last_month(today):
+    first = today.replace(day=1)
+    prev = date.fromordinal(first.toordinal() - 1)
+    return f"{prev.year:04d}-{prev.month:02d}"
+
+
+# ── Table ────────────────────────────────────────────────────────────────────
+
+class FeatureTable:
+    def __init__(self, meta, rows, index):
+        self.meta = meta
+        self.rows = rows
+        self.index = index
+        self._col = {c: i for i, c in enumerate(COLUMNS)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _row(self, i):
+        return dict(zip(COLUMNS, self.rows[i]))
+
+    def get(self, account_id):
+        """Features of the person who owns `account_id` (None if he has none)."""
+        i = self.index.get(account_id)
+        return None if i is None else self._row(i)
+
+    def people(self):
+        return [self._row(i) for i in range(len(self.rows))]
+
+    def column(self, name):
+        c = self._col[name]
+        return [r[c] for r in self.rows]
+
+    def to_json(self):
+        return {"version": FORMAT_VERSION, **self.meta, "columns": COLUMNS,
+                "rows": self.rows, "index": self.index}
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get("version") != FORMAT_VERSION or data.get("columns") != COLUMNS:
+            raise ValueError("feature table written by a different version")
+        meta = {k: v for k, v in data.items() if k not in ("version", "columns", "rows", "index")}
+        return cls(meta, data["rows"], data["index"])
+
+
+# ── Build ────────────────────────────────────────────────────────────────────
+
+def _clean_email(email):
+    """True when the address needed no domain typo fix (".con", "walla.com.com")."""
+    e = (email or "").strip().lower()
+    key = identity.email_key(e)
+    return key is not None and key.split("@")[1] == e.split("@")[1]
+
+def compute(profiles, acts, person_of, catalog, month, today):
+    """Pure part of the build: rows from profiles + rollup records + person map."""
+    practitioner_ids = set(catalog.ids)
+    people = identity.group(person_of, [p["id"] for p in profiles])
+    by_id = {p["id"]: p for p in profiles}
+    rows, index = [], {}
+    for pid, accs in people.items():
+        recs = [acts.get(a) or {} for a in accs]
+        vids = set().union(*(r.get("video_ids") or set() for r in recs))
+        vids = {v for v in vids if not str(v).startswith("last_watched")}
+        done = {a: len(r.get("video_ids") or ()) for a, r in zip(accs, recs)}
+        # the account he learns on; on a tie, the one whose email needed no typo fix
+        accs = sorted(accs, key=lambda a: (-done[a], not _clean_email(by_id[a].get("email")),
+                                           by_id[a].get("created_at") or ""))
+        primary = next((a for a in accs if "@" in (by_id[a].get("email") or "")), accs[0])
+        p = by_id[primary]
+        stamps = [s[:10] for r in recs for s in (r.get("last_progress_at"), r.get("last_game_at")) if s]
+        last = max(stamps) if stamps else None
+        try:
+            days_ago = (today - date.fromisoformat(last)).days if last else None
+        except ValueError:
+            days_ago = None
+        name = (p.get("full_name") or "").strip()
+        nxt = catalog.next_unwatched(vids)
+        rows.append([
+            pid, accs, primary, (p.get("email") or "").strip(), name, name.split()[0] if name else "",
+            p.get("phone") or "",
+            min((by_id[a].get("created_at") or "") for a in accs) or None,
+            any(by_id[a].get("role") == "paid_customer" for a in accs),
+            any(by_id[a].get("role") == "admin" for a in accs),
+            any(by_id[a].get("whatsapp_opt_out") is True for a in accs),
+            len(vids),
+            len(vids & practitioner_ids),
+            dict(Counter(k.split(":", 1)[0] or "?" for k in
+                         set().union(*(r.get("lesson_keys") or set() for r in recs)))),
+            len(set().union(*(r.get("month_keys") or set() for r in recs))),
+            last, days_ago,
+            max((r.get("xp") or 0 for r in recs), default=0),
+            max((r.get("streak") or 0 for r in recs), default=0),
+            max((r.get("longest_streak") or 0 for r in recs), default=0),
+            sum(r.get("game_rows") or 0 for r in recs),
+            sum(r.get("notes") or 0 for r in recs),
+            sum(r.get("chat_messages") or 0 for r in recs),
+            nxt.title if nxt else "",
+            None,
+        ])
+        for a in accs:
+            index[a] = len(rows) - 1
+
+    # rank among everyone who finished at least one lesson: 1 + how many did more
+    li, ri = COLUMNS.index("lessons"), COLUMNS.index("rank")
+    learners = cohort_stats.Cohort(r[li] for r in rows if r[li] > 0)
+    for r in rows:
+        if r[li] > 0:
+            r[ri] = learners.rank(r[li])
+    meta = {"built": today.isoformat(), "month": month, "accounts": len(profiles),
+            "learners": len(learners)}
+    return FeatureTable(meta, rows, index)
+
+
+def build(base, key, today=None):
+    today = today or date.today()
+    month = last_month(today)
+    client = learner_rollup.Client(base, key)
+    profiles = client.fetch_all("profiles", {
+        "select": "id,full_name,email,phone,role,created_at,whatsapp_opt_out", "order": "created_at"})
+    person_of, _ = identity.refresh(profiles)
+    acts, _ = learner_rollup.rollup(base, key, month)
+    return compute(profiles, acts, person_of, course_catalog.load(), month, today)
+
+
+def save(table):
+    STATE_DIR.mkdir(exist_ok=True)
+    tmp = FEATURES_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(table.to_json(), ensure_ascii=False, separators=(",", ":")),
+                   encoding="utf-8")
+    os.replace(tmp, FEATURES_FILE)
+
+
+def load(base=None, key=None, month=None, force=False):
+    """Today's table — read from disk, or built (and saved) if it is missing, from an
+    earlier day, or for a different report month. base/key default to the env."""
+    today = date.today()
+    if not force:
+        try:
+            table = FeatureTable.from_json(json.loads(FEATURES_FILE.read_text(encoding="utf-8")))
+            if table.meta["built"] == today.isoformat() and (month is None or table.meta["month"] == month):
+                return table
+        except (OSError, ValueError, KeyError):
+            pass
+    base = base or os.environ["SUPABASE_URL"]
+    key = key or os.environ["SUPABASE_SERVICE_KEY"]
+    table = build(base, key, today)
+    if month and table.meta["month"] != month:
+        raise SystemExit(f"feature table covers {table.meta['month']}, not {month}")
+    save(table)
+    return table
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    for line in (ROOT / ".env.local").read_text(encoding="utf-8").splitlines():
+        if "=" in line and not line.strip().startswith("#"):
+            k, v = line.split("=", 1)
+            os.environ.setdefault(k.strip(), v.strip())
+    t0 = datetime.now()
+    table = load(force=args.force)
+    print(f"{table.meta['accounts']} accounts → {len(table)} people, "
+          f"{table.meta['learners']} with a lesson (built {table.meta['built']}, "
+          f"month {table.meta['month']}) in {(datetime.now() - t0).total_seconds():.1f}s")
+    print(f"  {FEATURES_FILE} ({FEATURES_FILE.stat().st_size / 1024:.0f}KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Per-learner activity, aggregated where the data lives.
+
+The learner reports only ever need a handful of numbers per user — lessons done,
+notes, mentor messages, game xp/streak, when he was last seen — yet they used to
+page through four whole tables to count them client-side. rollup() asks the
+database instead: one call to the learner_activity_rollup() RPC
+(supabase/migrations/20261019120000_learner_activity_rollup.sql) returns one small
+record per active user.
+
+If the RPC is not deployed (PostgREST PGRST202 / 404) it falls back to fetching only
+the columns it needs and aggregating here, producing the exact same records — so the
+reports never depend on the migration having been applied.
+
+Record per user_id:
+  completed          completed course_progress rows
+  lesson_keys        {"<course_type>:<lesson_number>"} completed — a set, so duplicate
+  month_keys         accounts can be unioned; month_keys = completed in the given month
+  video_ids          completed video ids
+  last_progress_at   latest course_progress.updated_at (ISO string or None)
+  notes, chat_messages, game_rows, xp, streak, longest_streak, last_game_at
+
+  py scripts/learner_rollup.py [--month 2026-09]   # print the path taken + payload size
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RPC = "learner_activity_rollup"
+PAGE = 1000
+
+EMPTY = {"completed": 0, "lesson_keys": set(), "month_keys": set(), "video_ids": set(),
+         "last_progress_at": None, "notes": 0, "chat_messages": 0, "game_rows": 0,
+         "xp": 0, "streak": 0, "longest_streak": 0, "last_game_at": None}
+
+
+class Client:
+    """Minimal PostgREST client (service key); counts the bytes it pulls."""
+
+    def __init__(self, base, key):
+        self.base = base.rstrip("/")
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}",
+                        "Accept-Profile": "public", "Content-Profile": "public",
+                        "Content-Type": "application/json"}
+        self.bytes = 0
+
+    def _open(self, req):
+        with urllib.request.urlopen(req, timeout=90) as r:
+            raw = r.read()
+        self.bytes += len(raw)
+        return json.loads(raw.decode("utf-8")) if raw.strip() else []
+
+    def get(self, table, params):
+        q = urllib.parse.urlencode(params)
+        return self._open(urllib.request.Request(f"{self.base}/rest/v1/{table}?{q}", headers=self.headers))
+
+    def rpc(self, name, args, order):
+        """Set-returning RPC, paged like a table (the API caps responses at 1000 rows)."""
+        body = json.dumps(args).encode("utf-8")
+        rows, offset = [], 0
+        while True:
+            q = urllib.parse.urlencode({"order": order, "limit": str(PAGE), "offset": str(offset)})
+            batch = self._open(urllib.request.Request(f"{self.base}/rest/v1/rpc/{name}?{q}", data=body,
+                                                      headers=self.headers, method="POST"))
+            rows += batch
+            if len(batch) < PAGE:
+                return rows
+            offset += PAGE
+
+    def insert(self, table, rows, on_conflict=None, chunk=PAGE):
+        """Bulk insert: one POST per `chunk` rows, not one per row. With `on_conflict`
+        (a unique key) rows that already exist are updated instead."""
+        q = "?" + urllib.parse.urlencode({"on_conflict": on_conflict}) if on_conflict else ""
+        prefer = "resolution=merge-duplicates,return=minimal" if on_conflict else "return=minimal"
+        headers = {**self.headers, "Prefer": prefer}
+        for i in range(0, len(rows), chunk):
+            body = json.dumps(rows[i:i + chunk]).encode("utf-8")
+            self._open(urllib.request.Request(f"{self.base}/rest/v1/{table}{q}", data=body,
+                                              headers=headers, method="POST"))
+
+    def fetch_all(self, table, params):
+        rows, offset = [], 0
+        while True:
+            batch = self.get(table, dict(params, limit=str(PAGE), offset=str(offset)))
+            rows += batch
+            if len(batch) < PAGE:
+                return rows
+            offset += PAGE
+
+
+def lesson_key(row):
+    course, num = row.get("course_type"), row.get("lesson_number")
+    return f"{course or ''}:{'' if num is None else num}"
+
+
+def _record():
+    return {k: (set() if isinstance(v, set) else v) for k, v in EMPTY.items()}
+
+
+def _later(a, b):
+    return b if a is None or (b is not None and b > a) else a
+
+
+# ── Client-side fallback ─────────────────────────────────────────────────────
+
+def aggregate_rows(progress=(), notes=(), chat=(), game=(), month=None):
+    """Same records the RPC returns, computed from raw rows. month = "YYYY-MM"."""
+    out = defaultdict(_record)
+    for r in progress:
+        if not r.get("user_id"):
+            continue
+        rec = out[r["user_id"]]
+        rec["last_progress_at"] = _later(rec["last_progress_at"], r.get("updated_at"))
+        if not r.get("completed"):
+            continue
+        rec["completed"] += 1
+        key = lesson_key(r)
+        rec["lesson_keys"].add(key)
+        if month and (r.get("completed_at") or "").startswith(month):
+            rec["month_keys"].add(key)
+        if r.get("video_id"):
+            rec["video_ids"].add(r["video_id"])
+    for r in notes:
+        if r.get("user_id"):
+            out[r["user_id"]]["notes"] += 1
+    for r in chat:
+        if r.get("user_id"):
+            out[r["user_id"]]["chat_messages"] += r.get("message_count") or 0
+    for r in game:
+        if not r.get("user_id"):
+            continue
+        rec = out[r["user_id"]]
+        rec["game_rows"] += 1
+        for f in ("xp", "streak", "longest_streak"):
+            rec[f] = max(rec[f], r.get(f) or 0)
+        rec["last_game_at"] = _later(rec["last_game_at"], r.get("updated_at"))
+    return dict(out)
+
+
+def _from_rows(client, month):
+    # limit/offset paging needs a unique order, or rows shift between pages
+    progress = client.fetch_all("course_progress", {
+        "select": "user_id,course_type,lesson_number,video_id,completed,completed_at,updated_at",
+        "order": "user_id,video_id"})
+    notes = client.fetch_all("user_notes", {"select": "user_id", "order": "id"})
+    chat = client.fetch_all("ai_chat_usage", {"select": "user_id,message_count", "order": "id"})
+    game = client.fetch_all("nlp_game_players", {"select": "user_id,xp,streak,longest_streak,updated_at",
+                                                 "order": "user_id,course_id"})
+    return aggregate_rows(progress, notes, chat, game, month)
+
+
+# ── Entry point ──────────────────────────────────────────────────────────────
+
+def rollup(base, key, month=None):
+    """({user_id: record}, how) — how is "rpc" or "rows", plus the bytes moved."""
+    client = Client(base, key)
+    try:
+        rows = client.rpc(RPC, {"p_month": f"{month}-01" if month else None}, order="user_id")
+    except urllib.error.HTTPError as e:
+        if e.code != 404:  # PGRST202 = function not deployed; anything else is a real error
+            raise
+        return _from_rows(client, month), f"rows ({client.bytes / 1024:.0f}KB)"
+    out = {}
+    for r in rows:
+        rec = dict(r)
+        for f in ("lesson_keys", "month_keys", "video_ids"):
+            rec[f] = set(r.get(f) or ())
+        out[rec.pop("user_id")] = rec
+    return out, f"rpc ({client.bytes / 1024:.0f}KB)"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--month", help="YYYY-MM for month_keys")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    env = {}
+    for line in (ROOT / ".env.local").read_text(encoding="utf-8").splitlines():
+        if "=" in line and not line.strip().startswith("#"):
+            k, v = line.split("=", 1)
+            env[k.strip()] = v.strip()
+    acts, how = rollup(os.environ.get("SUPABASE_URL", env.get("SUPABASE_URL", "")),
+                       os.environ.get("SUPABASE_SERVICE_KEY", env.get("SUPABASE_SERVICE_KEY", "")),
+                       args.month)
+    print(f"{len(acts)} learners via {how}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar learner scoring — one NumPy array per signal, one slot per person.
+
+hot_learners.py used to score with a Python loop per merged person: sum a Counter
+over each account, max() over list comprehensions of game rows, a min() over
+timestamps. Fine at 600 learners, minutes at 100k, and trying a different weight
+set meant editing the formula in the middle of the script.
+
+Here every raw table is folded into per-person columns in one pass each
+(np.bincount / np.maximum.at / np.minimum.at), and the score, ranks, percentiles
+and tier masks are whole-array expressions. Weights and cut-offs come from config:
+DEFAULT_CONFIG below, overridden by scripts/learner_scoring.json if present (or any
+file passed with --config), so a new weight set is a JSON edit, not a code change.
+
+  py scripts/learner_scoring.py --bench 100000      # synthetic timing run
+  py scripts/learner_scoring.py --show-config
+"""
+import argparse
+import copy
+import datetime
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import cohort_stats
+
+CONFIG_FILE = Path(__file__).resolve().parent / "learner_scoring.json"
+NEVER = 999  # days_ago for "no timestamp at all" — same sentinel the report prints
+
+# Finishing lessons is the strongest signal of intent; mentor questions and notes
+# mean he is working rather than watching; recency decides if he is reachable now.
+# Watch time is deliberately absent: the column is not actually being written.
+DEFAULT_CONFIG = {
+    "weights": {"lessons": 6, "chat": 4, "notes": 5, "streak": 2},
+    "xp": {"divisor": 100, "cap": 20},
+    "recency_bonus": [[7, 25], [30, 12]],   # [max days_ago, bonus], first match wins
+    "tiers": {   # min_lessons / max_lessons / top_pct (of starters) / max_days
+        "hot": {"min_lessons": 5, "max_days": 45},
+        "warm": {"min_lessons": 1, "max_lessons": 4},
+    },
+    "active_days": 30,
+}
+
+
+def load_config(path=None):
+    """DEFAULT_CONFIG deep-merged with the JSON at `path` (or CONFIG_FILE if it exists)."""
+    cfg = copy.deepcopy(DEFAULT_CONFIG)
+    path = Path(path) if path else CONFIG_FILE
+    if path.exists():
+        def merge(dst, src):
+            for k, v in src.items():
+                if isinstance(v, dict) and isinstance(dst.get(k), dict):
+                    merge(dst[k], v)
+                else:
+                    dst[k] = v
+        merge(cfg, json.loads(path.read_text(encoding="utf-8")))
+    return cfg
+
+
+# ── Columns ──────────────────────────────────────────────────────────────────
+
+def _index(rows, person_of, field="user_id"):
+    """Person slot for every row (-1 for rows whose account is not scored)."""
+    return np.fromiter((person_of.get(r.get(field), -1) for r in rows), dtype=np.int64, count=len(rows))
+
+
+def _days_ago(stamps, today):
+    """ISO timestamps → whole days before `today` (NEVER for missing/garbled ones)."""
+    out = np.full(len(stamps), NEVER, dtype=np.int64)
+    ok = np.fromiter((bool(s) and len(str(s)) >= 10 for s in stamps), dtype=bool, count=len(stamps))
+    if ok.any():
+        try:
+            days = np.array([str(s)[:10] for s, good in zip(stamps, ok) if good], dtype="datetime64[D]")
+        except ValueError:  # one garbled stamp — fall back to per-item parsing
+            days = np.array([_parse_day(str(s)[:10]) for s, good in zip(stamps, ok) if good],
+                            dtype="datetime64[D]")
+        delta = (np.datetime64(today, "D") - days).astype("timedelta64[D]").astype(np.int64)
+        out[ok] = np.where(np.isnat(days), NEVER, delta)
+    return out
+
+
+def _parse_day(s):
+    try:
+        return np.datetime64(s, "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def build_columns(n, person_of, progress=(), notes=(), chat=(), game=(), today=None):
+    """Fold raw rows into per-person columns.
+
+    n          number of people (slots 0..n-1)
+    person_of  {account_id: slot}; rows of accounts not in it are ignored
+    progress   course_progress rows (user_id, completed, updated_at)
+    notes      user_notes rows (user_id)
+    chat       ai_chat_usage rows (user_id, message_count) — one per user per day
+    game       nlp_game_players rows (user_id, xp, streak, updated_at)
+    """
+    today = today or datetime.date.today()
+    cols = {}
+
+    idx = _index(progress, person_of)
+    done = np.fromiter((bool(r.get("completed")) for r in progress), dtype=bool, count=len(progress))
+    keep = idx >= 0
+    cols["lessons"] = np.bincount(idx[keep & done], minlength=n)
+    seen = np.full(n, NEVER, dtype=np.int64)
+    np.minimum.at(seen, idx[keep], _days_ago([r.get("updated_at") for r in progress], today)[keep])
+
+    idx = _index(notes, person_of)
+    cols["notes"] = np.bincount(idx[idx >= 0], minlength=n)
+
+    idx = _index(chat, person_of)
+    msgs = np.fromiter((r.get("message_count") or 0 for r in chat), dtype=np.float64, count=len(chat))
+    cols["chat"] = np.bincount(idx[idx >= 0], weights=msgs[idx >= 0], minlength=n).astype(np.int64)
+
+    idx = _index(game, person_of)
+    keep = idx >= 0
+    cols["games"] = np.bincount(idx[keep], minlength=n)
+    for name in ("xp", "streak"):
+        vals = np.fromiter((r.get(name) or 0 for r in game), dtype=np.float64, count=len(game))
+        col = np.zeros(n, dtype=np.float64)
+        np.maximum.at(col, idx[keep], vals[keep])
+        cols[name] = col
+    np.minimum.at(seen, idx[keep], _days_ago([r.get("updated_at") for r in game], today)[keep])
+    cols["days_ago"] = seen
+    return cols
+
+
+def columns_from_features(people):
+    """Same columns as build_columns, from learner_features rows (one per person,
+    duplicate accounts already pooled) — no raw rows needed."""
+    def col(name, dtype=np.int64):
+        return np.fromiter((p[name] or 0 for p in people), dtype=dtype, count=len(people))
+
+    cols = {name: col(name) for name in ("lessons", "notes", "chat", "games")}
+    cols["xp"] = col("xp", dtype=np.float64)
+    cols["streak"] = col("streak", dtype=np.float64)
+    cols["days_ago"] = np.fromiter((NEVER if p["days_ago"] is None else p["days_ago"] for p in people),
+                                   dtype=np.int64, count=len(people))
+    return cols
+
+
+# ── Vector scoring ───────────────────────────────────────────────────────────
+
+def engaged(cols):
+    """Did anything at all in the course — the only people worth listing."""
+    return (cols["lessons"] > 0) | (cols["games"] > 0) | (cols["chat"] > 0)
+
+
+def score(cols, cfg):
+    w = cfg["weights"]
+    s = (cols["lessons"] * w["lessons"] + cols["chat"] * w["chat"] + cols["notes"] * w["notes"]
+         + np.minimum(cols["xp"] / cfg["xp"]["divisor"], cfg["xp"]["cap"])
+         + cols["streak"] * w["streak"])
+    bonus = np.zeros(len(s))
+    for max_days, pts in reversed(cfg["recency_bonus"]):  # earlier rules overwrite later ones
+        bonus = np.where(cols["days_ago"] <= max_days, pts, bonus)
+    return s + bonus
+
+
+def ranking(scores, mask=None):
+    """Slots ordered best-first (stable: ties keep slot order)."""
+    slots = np.arange(len(scores)) if mask is None else np.flatnonzero(mask)
+    return slots[np.argsort(-scores[slots], kind="stable")]
+
+
+def percentiles(scores, mask=None):
+    """Per-slot share (0-100) of the cohort scoring strictly below — NaN outside the mask."""
+    mask = np.ones(len(scores), dtype=bool) if mask is None else mask
+    pool = np.sort(scores[mask])
+    out = np.full(len(scores), np.nan)
+    if len(pool):
+        out[mask] = np.searchsorted(pool, scores[mask], side="left") / len(pool) * 100
+    return out
+
+
+def tiers(cols, cfg):
+    """{tier name: boolean mask} from the configured cut-offs.
+
+    Lesson cut-offs are absolute (min_lessons / max_lessons) or relative: top_pct
+    puts the tier floor at the cohort_stats cut-off for the top N% of everyone who
+    finished a lesson, so the tier keeps its size as the course grows."""
+    out = {}
+    started = cohort_stats.Cohort(cols["lessons"][cols["lessons"] > 0].tolist())
+    for name, rule in cfg["tiers"].items():
+        m = np.ones(len(cols["lessons"]), dtype=bool)
+        if "min_lessons" in rule:
+            m &= cols["lessons"] >= rule["min_lessons"]
+        if "top_pct" in rule and len(started):
+            m &= cols["lessons"] >= started.cutoff(rule["top_pct"])
+        if "max_lessons" in rule:
+            m &= cols["lessons"] <= rule["max_lessons"]
+        if "max_days" in rule:
+            m &= cols["days_ago"] <= rule["max_days"]
+        out[name] = m
+    return out
+
+
+def describe(rule):
+    """A tier rule in report Hebrew: "5+ שיעורים, נראו ב-45 הימים האחרונים"."""
+    parts = []
+    lo, hi = rule.get("min_lessons"), rule.get("max_lessons")
+    if lo is not None and hi is not None:
+        parts.append(f"{lo}-{hi} שיעורים")
+    elif lo is not None:
+        parts.append(f"{lo}+ שיעורים")
+    elif hi is not None:
+        parts.append(f"עד {hi} שיעורים")
+    if "top_pct" in rule:
+        parts.append(f"ב-{rule['top_pct']}% העליונים בשיעורים")
+    if "max_days" in rule:
+        parts.append(f"נראו ב-{rule['max_days']} הימים האחרונים")
+    return ", ".join(parts)
+
+
+# ── Bench ────────────────────────────────────────────────────────────────────
+
+def bench(n, cfg):
+    rng = np.random.default_rng(7)
+    today = datetime.date.today()
+    ids = [f"u{i}" for i in range(n)]
+    person_of = {u: i for i, u in enumerate(ids)}
+    days = rng.integers(0, 400, size=n * 6)
+    stamp = [(today - datetime.timedelta(days=int(d))).isoformat() + "T10:00:00+00:00" for d in days]
+    progress = [{"user_id": ids[i % n], "completed": bool(i % 3), "updated_at": stamp[i]}
+                for i in range(n * 6)]
+    notes = [{"user_id": ids[i]} for i in rng.integers(0, n, size=n)]
+    chat = [{"user_id": ids[i], "message_count": int(c)}
+            for i, c in zip(rng.integers(0, n, size=n), rng.integers(1, 9, size=n))]
+    game = [{"user_id": ids[i], "xp": int(x), "streak": int(x) % 9, "updated_at": stamp[i]}
+            for i, x in zip(rng.integers(0, n, size=n // 2), rng.integers(0, 5000, size=n // 2))]
+
+    t0 = time.perf_counter()
+    cols = build_columns(n, person_of, progress, notes, chat, game, today)
+    t1 = time.perf_counter()
+    s = score(cols, cfg)
+    mask = engaged(cols)
+    order = ranking(s, mask)
+    pct = percentiles(s, mask)
+    tier = tiers(cols, cfg)
+    t2 = time.perf_counter()
+    print(f"{n} learners, {len(progress) + len(notes) + len(chat) + len(game)} rows")
+    print(f"  columns: {t1 - t0:.3f}s   score+rank+percentile+tiers: {t2 - t1:.3f}s")
+    print(f"  engaged={int(mask.sum())} hot={int(tier['hot'].sum())} top score={s[order[0]]} "
+          f"median pct={np.nanmedian(pct):.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bench", type=int, default=0)
+    ap.add_argument("--config")
+    ap.add_argument("--show-config", action="store_true")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    cfg = load_config(args.config)
+    if args.show_config:
+        print(json.dumps(cfg, ensure_ascii=False, indent=2))
+    if args.bench:
+        bench(args.bench, cfg)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,19 @@ Sends each learner (>=1 completed lesson) a branded RTL email with their persona
 numbers for the previous calendar month + a CTA back to the portal (UTM-tagged).
 Two variants: active (celebrate) / dormant (protect-your-investment).
 
-Delivery: Gmail Apps Script web app (GET, action=send + html param — POST breaks
-on Google's redirect, documented project lesson). Quota ~100 recipients/day,
-~10 sends/min → max BATCH_PER_RUN per run + SEND_INTERVAL_SEC sleep between sends.
+Delivery: Gmail Apps Script web app via gmail_transport — mail-merge batches: one
+POST carries MERGE_TEMPLATE's id + the variables of as many learners as the send
+bucket grants (send_scheduler.BURST at most), the script fills and sends each and
+answers per learner (scripts/gmail_mailer.gs). The full email goes
+out, quotes and all; email_values(fit=True) only kicks in for a GET-only
+deployment. Quota ~100 recipients/day, ~10 sends/min, shared with the other
+mailing jobs — pacing and the daily cap come from send_scheduler (campaign class),
+so a run sends as fast as the quota allows.
 
 Scheduling model: a DAILY scheduled task runs this script; it only acts on days
-1-ACTIVE_THROUGH_DAY of the month, draining the send list ~85/day until done
-(state file per month prevents duplicates). Any other day → instant exit.
+1-ACTIVE_THROUGH_DAY of the month, draining the send list (campaign share of the
+day's quota) until done (a send_journal per month prevents duplicates). Any other
+day → instant exit.
 If the month's list is not fully drained by the last active day → WhatsApp alert.
 
 Run modes:
@@ -21,17 +27,20 @@ Run modes:
   py scripts/monthly_journey_email.py --force     # real send, ignore day gate (manual drain)
 """
 import json
-import math
 import os
 import sys
-import time
-import urllib.error
-import urllib.parse
 import urllib.request
-from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import cohort_stats
+import course_catalog
+import email_template
+import gmail_transport
+import learner_features
+import send_journal
+import send_scheduler
+
 sys.stdout.reconfigure(encoding="utf-8")
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -40,12 +49,10 @@ STATE_DIR.mkdir(exist_ok=True)
 OPTOUT_FILE = STATE_DIR / "optout.json"
 LOG_FILE = STATE_DIR / "log.txt"
 
-BATCH_PER_RUN = 85          # stay under Gmail's ~100/day (backup reports share the quota)
-SEND_INTERVAL_SEC = 7       # ~8-9/min, under the ~10/min Apps Script send limit
 ACTIVE_THROUGH_DAY = 6      # drain window: days 1-6 of each month
 PORTAL_URL = ("https://www.therapist-home.com/pages/course-library.html"
               "?utm_source=email&utm_medium=email&utm_campaign=monthly_journey")
-COURSE_TOTAL_LESSONS = 51   # free practitioner course size (course-library)
+COURSE_TOTAL_LESSONS = len(course_catalog.load())   # free practitioner course size
 
 HEB_MONTHS = {1: "ינואר", 2: "פברואר", 3: "מרץ", 4: "אפריל", 5: "מאי", 6: "יוני",
               7: "יולי", 8: "אוגוסט", 9: "ספטמבר", 10: "אוקטובר", 11: "נובמבר", 12: "דצמבר"}
@@ -103,56 +110,13 @@ def fetch_all(path_base):
 
 # ── Data assembly ────────────────────────────────────────────────────────────
 
-def load_course_order():
-    """Ordered [(video_id, title)] for the free practitioner course, parsed live from
-    the portal page itself (course-library-v2.html) so lesson names never drift."""
-    import re
-    src = (PROJECT_ROOT / "pages" / "course-library-v2.html").read_text(encoding="utf-8")
-    start = src.index("PRACTITIONER_MODULES = [")
-    end = src.index("\n  ];", start)
-    block = src[start:end]
-    return re.findall(r"id:\s*'([^']+)',\s*title:\s*'((?:[^'\\]|\\.)*)'", block)
-
-
 def build_learners(report_year, report_month):
     """Return (learners, facts) — personal numbers per learner + true population facts."""
-    progress = fetch_all("/rest/v1/course_progress"
-                         "?select=user_id,lesson_number,course_type,completed_at,video_id,completed"
-                         "&completed=is.true")
-
-    by_user = defaultdict(set)      # all-time distinct lessons
-    month_by_user = defaultdict(set)  # distinct lessons completed in report month
-    vids_by_user = defaultdict(set)   # completed video ids (for "next lesson" lookup)
-    prefix = f"{report_year:04d}-{report_month:02d}"
-    for r in progress:
-        uid = r.get("user_id")
-        if not uid:
-            continue
-        key = (r.get("course_type"), r.get("lesson_number"))
-        by_user[uid].add(key)
-        if r.get("video_id"):
-            vids_by_user[uid].add(r["video_id"])
-        if (r.get("completed_at") or "").startswith(prefix):
-            month_by_user[uid].add(key)
-
-    course_order = load_course_order()
-
-    uids = list(by_user.keys())
-
-    profiles = {}
-    for i in range(0, len(uids), 50):
-        chunk = ",".join(f'"{u}"' for u in uids[i:i + 50])
-        for p in sb_get(f"/rest/v1/profiles?id=in.({chunk})&select=id,email,full_name,role"):
-            profiles[p["id"]] = p
-
-    game = defaultdict(lambda: {"longest_streak": 0, "xp": 0})
-    for i in range(0, len(uids), 50):
-        chunk = ",".join(f'"{u}"' for u in uids[i:i + 50])
-        for g in sb_get(f"/rest/v1/nlp_game_players?user_id=in.({chunk})"
-                        "&select=user_id,longest_streak,xp"):
-            cur = game[g["user_id"]]
-            cur["longest_streak"] = max(cur["longest_streak"], g.get("longest_streak") or 0)
-            cur["xp"] += g.get("xp") or 0
+    # one row per PERSON from today's feature table (learner_features.py): lessons,
+    # streak, next lesson and rank already computed, duplicate accounts already
+    # merged, so nobody gets two summaries with two different lesson counts
+    feats = learner_features.load(month=f"{report_year:04d}-{report_month:02d}")
+    log(f"features built {feats.meta['built']}: {len(feats)} people, {feats.meta['learners']} learners")
 
     # the learner's own words from the signup questionnaire (595/595 filled — verified live)
     quests = {}
@@ -163,42 +127,36 @@ def build_learners(report_year, report_month):
         if q.get("user_id"):
             quests[q["user_id"]] = q
 
-    # rank by all-time lessons for the percentile line
-    totals_sorted = sorted((len(v) for v in by_user.values()), reverse=True)
-
     def clean_quote(text):
-        """Their own words, safe for inline quoting: single line, sane length.
-        Capped at 80 chars — Hebrew inflates ~9x when percent-encoded and the whole
-        email travels in a GET URL (~8K hard limit at Apps Script)."""
+        """Their own words, safe for inline quoting: single line, whole. (The email
+        goes in a POST body; only a GET-only mailer shortens it — email_values.)"""
         t = " ".join((text or "").split())
         # junk filter: one-word / very short answers are usually keyboard mash
         # ("צגלל", "כק׳כק׳כק׳") — quoting those back looks broken, skip them
         if len(t) < 8 or len(t.split()) < 2:
             return ""
-        if len(t) > 60:
-            cut = t[:60]
-            t = cut[:cut.rfind(" ")] + "..." if " " in cut else cut + "..."
         return t
 
+    # rank by all-time lessons for the percentile line: one sorted cohort, then a
+    # binary search per learner (cohort_stats) instead of a list scan per learner
+    started = [f for f in feats.people() if f["lessons"] >= 1]
+    everyone = cohort_stats.CohortStats(started, value=lambda f: f["lessons"]).cohort()
+
     learners = []
-    for uid in uids:
-        p = profiles.get(uid) or {}
-        email = (p.get("email") or "").strip()
-        if not email or "@" not in email:
+    for f in started:
+        if "@" not in f["email"]:
             continue
-        total = len(by_user[uid])
-        rank = totals_sorted.index(total) + 1  # best rank for that total
-        top_pct = max(5, math.ceil(rank / len(totals_sorted) * 100 / 5) * 5)
-        q = quests.get(uid) or {}
-        next_lesson = next((t for vid, t in course_order if vid not in vids_by_user[uid]), "")
+        top_pct = cohort_stats.rounded_top(everyone.top_pct(f["lessons"]))
+        q = next((quests[u] for u in f["accounts"] if u in quests), {})
         learners.append({
-            "next_lesson": next_lesson.replace("\\'", "'"),
-            "user_id": uid,
-            "email": email,
-            "first_name": (p.get("full_name") or "").split()[0] if p.get("full_name") else "",
-            "total_lessons": total,
-            "month_lessons": len(month_by_user.get(uid, set())),
-            "longest_streak": game[uid]["longest_streak"],
+            "next_lesson": f["next_lesson"],
+            "user_id": f["primary"],
+            "all_ids": f["accounts"],
+            "email": f["email"],
+            "first_name": f["first_name"],
+            "total_lessons": f["lessons"],
+            "month_lessons": f["month_lessons"],
+            "longest_streak": f["longest_streak"],
             "top_pct": top_pct,
             "vision": clean_quote(q.get("vision_one_year")),
             "challenge": clean_quote(q.get("main_challenge")),
@@ -228,8 +186,17 @@ def stat_row(value, label):
             f'<div style="font-size:13px;color:#5b7177;margin-top:5px">{label}</div></td>')
 
 
-def build_email(learner, month_name, facts, test_marker=""):
-    """Return (subject, plain_text, html). Kept compact — HTML travels in a GET URL.
+def shorten(quote, chars):
+    """`quote` cut at a word boundary to at most `chars` + "..."."""
+    if len(quote) <= chars:
+        return quote
+    cut = quote[:chars]
+    return cut[:cut.rfind(" ")] + "..." if " " in cut else cut + "..."
+
+
+def email_parts(learner, month_name, facts, test_marker="", quote_chars=None):
+    """Return (subject, plain_text, html slot values, optional slots) for EMAIL_HTML.
+    The learner's quotes go in whole unless `quote_chars` caps them (GET-only fit).
 
     Copy rules (Hillel, 2026-07-19): no em-dashes in learner-facing text; quote the
     learner's OWN questionnaire words back to them; every comparison number must be
@@ -237,8 +204,8 @@ def build_email(learner, month_name, facts, test_marker=""):
     """
     name = learner["first_name"] or ("לומדת יקרה" if learner.get("is_f") else "לומד יקר")
     active = learner["month_lessons"] > 0
-    vision = escapeq(learner["vision"])
-    challenge = escapeq(learner["challenge"])
+    vision = escapeq(shorten(learner["vision"], quote_chars) if quote_chars else learner["vision"])
+    challenge = escapeq(shorten(learner["challenge"], quote_chars) if quote_chars else learner["challenge"])
     f = learner.get("is_f", False)
 
     # gendered fragments (everything else is spelled identically for both)
@@ -265,6 +232,7 @@ def build_email(learner, month_name, facts, test_marker=""):
 
     # opener: their join month + their own vision quoted back (the most personal line)
     joined = f"ב{learner['join_month']} הצטרפת למסע" if learner["join_month"] else "הצטרפת למסע"
+    no_vision_line = f"{joined}, ומאז הצטברו דברים ששווה לעצור ולראות:"
     if vision and active:
         vision_line = (f'{joined}, וכתבת לנו מה {ata} רוצה שיקרה בעוד שנה: '
                        f'<span style="color:#00606B;font-weight:700;">"{vision}"</span>. '
@@ -274,7 +242,7 @@ def build_email(learner, month_name, facts, test_marker=""):
                        f'<span style="color:#00606B;font-weight:700;">"{vision}"</span>. '
                        f'החלום הזה לא הלך לשום מקום. וגם מה שכבר בנית בדרך אליו, לא:')
     else:
-        vision_line = f"{joined}, ומאז הצטברו דברים ששווה לעצור ולראות:"
+        vision_line = no_vision_line
 
     # Wrapped-style personal title — rule-based from REAL data only, gendered
     badge = ""
@@ -291,6 +259,7 @@ def build_email(learner, month_name, facts, test_marker=""):
     # the next lesson, by name — the most concrete comeback trigger there is
     nt = escapeq(learner["next_lesson"])
     next_line = f'השיעור הבא שמחכה לך: "{nt}".' if nt else "השיעור הבא כבר מחכה."
+    badge_block = BADGE_HTML.format(badge=badge) if badge else ""
 
     # NOTE: no emojis in subjects — the Gmail Apps Script GET channel mangles
     # astral-plane chars (arrive as ������). Hebrew itself is fine.
@@ -301,7 +270,8 @@ def build_email(learner, month_name, facts, test_marker=""):
                       f"לפורטל, {facts['learners']} התחילו ללמוד בפועל, וב{month_name} רק "
                       f"{facts['month_active']} מהם נכנסו ולמדו באמת. {ata} {echad_mehem}. "
                       f"זו לא סטטיסטיקה, זו זהות: {identity}.")
-        cta_line = f"{bo} נמשיך מאיפה שעצרת. {next_line}" if not challenge else \
+        no_challenge_line = f"{bo} נמשיך מאיפה שעצרת. {next_line}"
+        cta_line = no_challenge_line if not challenge else \
             (f'ואם נחזור לאתגר שכתבת אז, "{challenge}", '
              f"כל שיעור {mesayem} הוא צעד אמיתי בדיוק לשם. {next_line}")
     else:
@@ -310,7 +280,8 @@ def build_email(learner, month_name, facts, test_marker=""):
                       f"אבל רק {facts['learners']} התחילו ללמוד בפועל. {ata} כבר בפנים, "
                       f"עם {total} שיעורים ו-{course_pct}% מהקורס מאחוריך. "
                       f"את זה אף אחד לא לוקח ממך.")
-        cta_line = (f"מספיק שיעור אחד קטן כדי לחזור לתנועה. {next_line}"
+        no_challenge_line = f"מספיק שיעור אחד קטן כדי לחזור לתנועה. {next_line}"
+        cta_line = (no_challenge_line
                     if not challenge else
                     (f'האתגר שכתבת כשנרשמת, "{challenge}", לא נפתר מעצמו. '
                      f"אפשר לחזור בקטן, עוד היום: {next_line}"))
@@ -318,91 +289,89 @@ def build_email(learner, month_name, facts, test_marker=""):
     if test_marker:
         subject = f"{test_marker} {subject}"
 
-    html = f"""<div dir="rtl" style="background:#E8F1F2;padding:20px 10px;font-family:Arial,sans-serif">
+    values = {"name": name, "stats": "".join(stats), "proud_line": proud_line}
+    # optional pieces, most worth keeping first: (slot, full, what it shrinks to)
+    optional = [("badge_block", badge_block, ""),
+                ("vision_line", vision_line, no_vision_line),
+                ("cta_line", cta_line, no_challenge_line)]
+
+    # plain body kept MINIMAL on purpose — it only shows in text-only clients (rare).
+    # The HTML is the real email.
+    plain_lines = [f"שלום {name},",
+                   f"סיימת {learner['total_lessons']} שיעורים במסע שלך בבית המטפלים.",
+                   f"חזרה למסע שלך: {PORTAL_URL}",
+                   'להסרה: השב למייל זה עם המילה "הסר".']
+    return subject, "\n".join(plain_lines), values, optional
+
+
+BADGE_HTML = ('<div style="text-align:center;margin:0 0 12px"><span style="display:inline-block;'
+              'background:#fdf6e3;border:1px solid #D4AF37;color:#8a6d1a;font-weight:700;font-size:14px;'
+              'padding:6px 16px;border-radius:20px">התואר שלך החודש: {badge}</span></div>')
+
+# Compiled once: static HTML + its URL-encoded size are fixed, only the slots vary.
+EMAIL_HTML = email_template.Template("""<div dir="rtl" style="background:#E8F1F2;padding:20px 10px;font-family:Arial,sans-serif">
 <div style="max-width:560px;margin:0 auto;background:#fff;border-radius:12px;overflow:hidden">
 <div style="background:#003B46;padding:16px 22px;border-bottom:3px solid #D4AF37">
 <span style="color:#E8F1F2;font-size:20px;font-weight:700">בית המטפלים</span></div>
 <div style="padding:22px;color:#1f2d30;font-size:16px;line-height:1.7">
 <p style="margin:0 0 6px;font-size:20px;font-weight:700;color:#003B46">שלום {name},</p>
 <p style="margin:0 0 16px">{vision_line}</p>
-{f'<div style="text-align:center;margin:0 0 12px"><span style="display:inline-block;background:#fdf6e3;border:1px solid #D4AF37;color:#8a6d1a;font-weight:700;font-size:14px;padding:6px 16px;border-radius:20px">התואר שלך החודש: {badge}</span></div>' if badge else ''}
-<table width="100%" style="background:#f4f8f9;border-radius:10px"><tr>{''.join(stats)}</tr></table>
+{badge_block}
+<table width="100%" style="background:#f4f8f9;border-radius:10px"><tr>{stats}</tr></table>
 <p style="margin:16px 0 0">{proud_line}</p>
 <p style="margin:12px 0 20px">{cta_line}</p>
 <div style="text-align:center">
-<a href="{PORTAL_URL}" style="display:inline-block;background:#D4AF37;color:#003B46;font-weight:700;font-size:16px;padding:12px 32px;border-radius:8px;text-decoration:none">חזרה למסע שלי ←</a>
+<a href="{portal}" style="display:inline-block;background:#D4AF37;color:#003B46;font-weight:700;font-size:16px;padding:12px 32px;border-radius:8px;text-decoration:none">חזרה למסע שלי ←</a>
 </div></div>
 <div style="padding:12px 22px;background:#f4f8f9;color:#5b7177;font-size:12px">
 נשלח מצוות בית המטפלים · <a href="https://www.therapist-home.com" style="color:#00606B">therapist-home.com</a><br>
 לא רוצה לקבל את הסיכום החודשי? השב למייל זה עם המילה "הסר".
-</div></div></div>"""
+</div></div></div>""", portal=PORTAL_URL)
 
-    # plain body kept MINIMAL on purpose — it rides in the same GET URL as the HTML
-    # and only shows in text-only clients (rare). The HTML is the real email.
-    plain_lines = [f"שלום {name},",
-                   f"סיימת {learner['total_lessons']} שיעורים במסע שלך בבית המטפלים.",
-                   f"חזרה למסע שלך: {PORTAL_URL}",
-                   'להסרה: השב למייל זה עם המילה "הסר".']
-    return subject, "\n".join(plain_lines), html
-
-
-URL_BUDGET = 7300  # empirically: 7,622-char URLs got HTTP 400 from Apps Script; headroom under that
-
-
-def encoded_len(to, subject, plain, html):
-    """Full final URL length, with the real base URL and token."""
-    params = urllib.parse.urlencode({
-        "token": os.environ.get("GMAIL_API_TOKEN", "X" * 32), "action": "send",
-        "to": to, "subject": subject, "body": plain, "html": html, "name": "בית המטפלים"})
-    return len(os.environ.get("GMAIL_API_URL", "")) + 1 + len(params)
-
-
-def build_email_safe(learner, month_name, facts, test_marker=""):
-    """Build the email; if the encoded GET URL would overflow, degrade gracefully:
-    first drop the challenge quote, then the vision quote too."""
-    for strip in ({}, {"challenge": ""}, {"challenge": "", "vision": ""}):
-        candidate = dict(learner, **strip)
-        subject, plain, html = build_email(candidate, month_name, facts, test_marker)
-        if encoded_len(learner["email"], subject, plain, html) <= URL_BUDGET:
-            if strip:
-                log(f"size fallback for {learner['email']}: stripped {list(strip)}")
-            break
-    return subject, plain, html
-
-
-def send_gmail(to, subject, plain, html):
-    params = urllib.parse.urlencode({
-        "token": os.environ["GMAIL_API_TOKEN"],
-        "action": "send",
-        "to": to,
-        "subject": subject,
-        "body": plain,
-        "html": html,
-        "name": "בית המטפלים",
-    })
-    url = f"{os.environ['GMAIL_API_URL']}?{params}"
-    # Google's front-end 400s long URLs SPORADICALLY (probed live 2026-07-19: the
-    # same 7K URL fails then passes) — so transient HTTP errors get retried.
-    last_err = None
-    for attempt in range(4):
-        if attempt:
-            time.sleep(4)
-        try:
-            with urllib.request.urlopen(url, timeout=45) as resp:
-                raw = resp.read().decode()
-            break
-        except urllib.error.HTTPError as e:
-            last_err = f"HTTP {e.code}"
-        except (urllib.error.URLError, TimeoutError) as e:
-            last_err = str(e)
-    else:
-        raise RuntimeError(f"Apps Script unreachable after 4 attempts: {last_err}")
-    try:
-        result = json.loads(raw)
-    except Exception:
-        raise RuntimeError(f"Apps Script returned non-JSON: {raw[:200]}")
-    if not result.get("success"):
-        raise RuntimeError(f"Apps Script error: {result.get('error') or raw[:200]}")
+
+URL_BUDGET = gmail_transport.GET_URL_LIMIT  # only binds when the mailer takes no POST body
+# GET-only fit: quotes first shrink to this (Hebrew inflates ~9x percent-encoded)
+GET_QUOTE_CHARS = 60
+
+
+def send_params(to, subject, plain):
+    """Every GET parameter except html, in send order (see gmail_transport.send)."""
+    return {"token": os.environ.get("GMAIL_API_TOKEN", "X" * 32), "action": "send",
+            "to": to, "subject": subject, "body": plain, "name": gmail_transport.SENDER_NAME}
+
+
+def email_values(learner, month_name, facts, test_marker="", fit=False):
+    """(subject, plain_text, EMAIL_HTML slot values) with every optional piece in —
+    or, with fit=True, only as many as keep the encoded GET URL under URL_BUDGET, in
+    one pass (the template's static size is precomputed, only the slot values are
+    measured): the quotes are cut to GET_QUOTE_CHARS, then the challenge quote goes
+    first, then the vision quote, then the badge. fit is only needed for a GET-only
+    mailer deployment."""
+    subject, plain, values, optional = email_parts(learner, month_name, facts, test_marker,
+                                                   quote_chars=GET_QUOTE_CHARS if fit else None)
+    if not fit:
+        values.update({slot: full for slot, full, _ in optional})
+        return subject, plain, values
+    overhead = (len(os.environ.get("GMAIL_API_URL", "")) + 1
+                + email_template.query_cost(send_params(learner["email"], subject, plain), {"html": 0}))
+    values, dropped = EMAIL_HTML.fit(values, optional, URL_BUDGET, overhead)
+    if dropped:
+        log(f"size fallback for {learner['email']}: stripped {dropped}")
+    return subject, plain, values
+
+
+# One mail-merge template for the whole month: the script fills it per learner.
+MERGE_TEMPLATE = {"subject": "{subject}", "body": "{body}", "html": EMAIL_HTML.source,
+                  "name": gmail_transport.SENDER_NAME}
+
+
+def merge_recipient(learner, month_name, facts, to=None, test_marker=""):
+    """A gmail_transport.send_merge recipient for MERGE_TEMPLATE."""
+    def merge_vars(fit=False):
+        subject, plain, values = email_values(learner, month_name, facts, test_marker, fit)
+        return dict(values, subject=subject, body=plain)
+    return {"to": to or learner["email"], "vars": merge_vars(),
+            "shrink": lambda: merge_vars(fit=True), "learner": learner}
 
 
 # ── Main flow ────────────────────────────────────────────────────────────────
@@ -421,7 +390,7 @@ def main():
     first_of_month = today.replace(day=1)
     prev = first_of_month - timedelta(days=1)
     month_name = HEB_MONTHS[prev.month]
-    state_file = STATE_DIR / f"{prev.year:04d}-{prev.month:02d}.json"
+    period = f"{prev.year:04d}-{prev.month:02d}"
 
     try:
         learners, facts = build_learners(prev.year, prev.month)
@@ -445,40 +414,52 @@ def main():
             sample = max(males, key=lambda x: x["month_lessons"])          # active, male copy
             dormant = next((l for l in sorted(females, key=lambda x: -x["total_lessons"])
                             if l["month_lessons"] == 0), None)             # dormant, female copy
-            for variant, l in [("פעיל-זכר", sample), ("רדומה-נקבה", dormant)]:
-                if not l:
-                    continue
-                subject, plain, html = build_email_safe(l, month_name, facts,
-                                                        test_marker=f"[בדיקה, גרסת {variant}]")
-                send_gmail(notify, subject, plain, html)
-                log(f"TEST sent to {notify} (variant={variant}, sample={l['email']})")
-                time.sleep(SEND_INTERVAL_SEC)
+            sched_test = send_scheduler.Scheduler("monthly_journey_test", send_scheduler.REPORT)
+            tests = [dict(merge_recipient(l, month_name, facts, to=notify,
+                                          test_marker=f"[בדיקה, גרסת {variant}]"), variant=variant)
+                     for variant, l in [("פעיל-זכר", sample), ("רדומה-נקבה", dormant)] if l]
+            done = 0
+            for r, result in gmail_transport.send_merge(sched_test, MERGE_TEMPLATE, tests):
+                if result is not True:
+                    raise RuntimeError(f"test send failed: {result}")
+                done += 1
+                log(f"TEST sent to {notify} (variant={r['variant']}, sample={r['learner']['email']})")
+            if done < len(tests):
+                raise RuntimeError("test send failed: no send slot left today")
             return 0
 
         # real batched send
-        sent = set(json.loads(state_file.read_text(encoding="utf-8"))) if state_file.exists() else set()
+        sent = send_journal.SendJournal(f"monthly_journey-{period}", legacy=STATE_DIR / f"{period}.json")
         pending = [l for l in learners if l["email"].lower() not in sent]
         if not pending:
             log("month fully drained — nothing to send")
             return 0
 
-        batch = pending[:BATCH_PER_RUN]
-        failures = 0
-        for l in batch:
-            try:
-                subject, plain, html = build_email_safe(l, month_name, facts)
-                send_gmail(l["email"], subject, plain, html)
-                sent.add(l["email"].lower())
-                state_file.write_text(json.dumps(sorted(sent), ensure_ascii=False), encoding="utf-8")
-            except Exception as e:
+        # mail-merge batches (as many learners per call as the send bucket grants), paced
+        # and capped by the shared send_scheduler; results come back per learner
+        sched = send_scheduler.Scheduler("monthly_journey", send_scheduler.CAMPAIGN)
+        recipients = [merge_recipient(l, month_name, facts) for l in pending]
+        attempted = failures = unknown = 0
+        for r, result in gmail_transport.send_merge(sched, MERGE_TEMPLATE, recipients,
+                                                    stop=lambda: failures >= 5):
+            attempted += 1
+            if result is True:
+                sent.record(r["to"].lower())
+            elif result == gmail_transport.UNKNOWN:
+                # the call died after it may have gone out — journal it so the next
+                # run does not mail them twice; check the mailer's Sent folder
+                sent.record(r["to"].lower(), status="unknown")
+                unknown += 1
+                log(f"send UNKNOWN for {r['to']}: the mailer call dropped, may have been sent")
+            else:
                 failures += 1
-                log(f"send FAILED for {l['email']}: {e}")
-                if failures >= 5:
-                    raise RuntimeError(f"aborting after {failures} consecutive-ish failures")
-            time.sleep(SEND_INTERVAL_SEC)
+                log(f"send FAILED for {r['to']}: {result}")
+        if failures >= 5:
+            raise RuntimeError(f"aborting after {failures} consecutive-ish failures")
 
-        remaining = len(pending) - len(batch)
-        log(f"batch done: sent={len(batch) - failures} failed={failures} remaining={remaining}")
+        remaining = len(pending) - attempted
+        log(f"batch done: sent={attempted - failures - unknown} failed={failures} "
+            f"unknown={unknown} remaining={remaining}")
 
         if remaining > 0 and today.day >= ACTIVE_THROUGH_DAY and not force:
             whatsapp_alert(f"⚠️ מייל המסע החודשי: נגמר חלון השליחה ונשארו {remaining} "
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Page-weight budgets: fail when a page gets heavier than it was allowed to be.
+
+optimize_images.py took the logos and heroes down from most of the page weight on a
+throttled phone, and make_video_poster.py fixed a 3s LCP caused by a third-party
+thumbnail. Neither stops the next commit from adding a 400KB PNG or a blocking
+<script> in <head>. This parses every HTML page in the repo and measures:
+
+  bytes             the page plus everything it pulls in on load: <link rel=stylesheet>,
+                    <script src>, <img>/<source>/poster, preloads, icons, url() in inline
+                    and local CSS (images, fonts, @import) — each file once. Local files
+                    are their size on disk; CDN URLs come from the `cdn` table in
+                    page_budgets.json (fonts.googleapis.com css2 counts `per_weight` per
+                    requested weight). Lazy images are still counted.
+  blocking_scripts  <script src> in <head> without async/defer/type=module (the
+                    supabase-js CDN tag is the usual one).
+  blocking_css      <link rel=stylesheet> in <head> not deferred with media="print".
+  lcp_bytes         the LCP candidate: a preload-as-image / fetchpriority=high image if
+                    the page has one, else the largest image that loads eagerly.
+
+and compares each page with its entry in scripts/page_budgets.json. Any page over
+budget — or with no budget — exits 1 (the page-budget workflow runs this on every
+push). After an intended change, --update rewrites the budgets at the current numbers
+plus `headroom`.
+
+  py scripts/page_budget.py                  # check, print the table
+  py scripts/page_budget.py --update         # accept the current weights
+  py scripts/page_budget.py --measure-cdn    # re-measure the cdn table (network)
+"""
+import argparse
+import json
+import math
+import re
+import sys
+import urllib.request
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGETS = Path(__file__).resolve().parent / "page_budgets.json"
+SITE_HOSTS = {"www.therapist-home.com", "therapist-home.com"}
+SKIP_DIRS = {"content-private", "node_modules", "_original"}
+
+URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+IMPORT_RE = re.compile(r"""@import\s+(?:url\()?\s*['"]([^'"]+)['"]""")
+WEIGHT_RE = re.compile(r"wght@([\d;]+)")
+
+
+def pages():
+    return sorted(p for p in ROOT.rglob("*.html")
+                  if not any(part.startswith(".") or part in SKIP_DIRS
+                             for part in p.relative_to(ROOT).parts))
+
+
+def rel(path):
+    return path.relative_to(ROOT).as_posix() if path.is_relative_to(ROOT) else path.as_posix()
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────────
+
+class PageParser(HTMLParser):
+    """Collects every load-time reference with where it came from."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.in_head = True
+        self.in_style = False
+        self.in_noscript = False
+        self.refs = []          # (kind, url, eager)
+        self.styles = []        # inline CSS text
+        self.blocking_scripts = []
+        self.blocking_css = []
+        self.lcp_hint = None
+
+    def handle_starttag(self, tag, attrs):
+        a = {k: (v or "") for k, v in attrs}
+        if tag == "body":
+            self.in_head = False
+        elif tag == "style":
+            self.in_style = True
+        elif tag == "noscript":
+            self.in_noscript = True
+        if self.in_noscript:
+            return                # not fetched when JS is on
+        if a.get("style"):
+            self.styles.append(a["style"])
+        if tag == "script" and a.get("src"):
+            self.refs.append(("js", a["src"], True))
+            if (self.in_head and "async" not in a and "defer" not in a
+                    and a.get("type") != "module"):
+                self.blocking_scripts.append(a["src"])
+        elif tag == "link":
+            rels = set(a.get("rel", "").lower().split())
+            href = a.get("href")
+            if not href:
+                return
+            if "stylesheet" in rels:
+                self.refs.append(("css", href, True))
+                if self.in_head and a.get("media") != "print":
+                    self.blocking_css.append(href)
+            elif "preload" in rels:
+                kind = {"image": "img", "style": "css", "script": "js", "font": "font"}.get(a.get("as"))
+                if kind:
+                    self.refs.append((kind, href, True))
+                if kind == "img" and not self.lcp_hint:
+                    self.lcp_hint = href
+            elif rels & {"icon", "apple-touch-icon"}:
+                self.refs.append(("img", href, False))
+        elif tag in ("img", "source", "video"):
+            eager = a.get("loading") != "lazy"
+            srcs = [a.get("src"), a.get("poster")]
+            srcs += [c.strip().split()[0] for c in a.get("srcset", "").split(",") if c.strip()]
+            for src in filter(None, srcs):
+                if tag == "video" and src == a.get("src"):
+                    continue      # video bytes stream on play, not on load
+                self.refs.append(("img", src, eager))
+                if a.get("fetchpriority") == "high" and not self.lcp_hint:
+                    self.lcp_hint = src
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.in_head = False
+        elif tag == "style":
+            self.in_style = False
+        elif tag == "noscript":
+            self.in_noscript = False
+
+    def handle_data(self, data):
+        if self.in_style:
+            self.styles.append(data)
+
+
+def css_refs(text):
+    """[(kind, url)] referenced from CSS text."""
+    out = [("css", u) for u in IMPORT_RE.findall(text)]
+    for _, u in URL_RE.findall(text):
+        ext = Path(urlsplit(u).path).suffix.lower()
+        out.append(("font" if ext in (".woff", ".woff2", ".ttf", ".otf", ".eot") else "img", u))
+    return out
+
+
+# ── Resolving ────────────────────────────────────────────────────────────────
+
+def resolve(url, base):
+    """A Path under ROOT, an absolute external URL, or None (data:, anchors, dynamic)."""
+    url = url.strip()
+    if not url or url.startswith(("data:", "#", "%23", "javascript:", "mailto:", "tel:", "blob:", "${")):
+        return None
+    u = urlsplit(url if not url.startswith("//") else "https:" + url)
+    if u.scheme in ("http", "https"):
+        if u.netloc not in SITE_HOSTS:
+            return u.geturl()
+        return ROOT / unquote(u.path).lstrip("/")
+    if u.scheme:
+        return None
+    path = unquote(u.path)
+    target = ROOT / path.lstrip("/") if path.startswith("/") else base.parent / path
+    return target.resolve()
+
+
+def cdn_bytes(url, cdn):
+    for entry in cdn:
+        if url.startswith(entry["prefix"]):
+            if entry.get("per_weight"):
+                weights = sum(len(w.split(";")) for w in WEIGHT_RE.findall(url)) or 1
+                return entry["bytes"] + entry["per_weight"] * weights
+            return entry["bytes"]
+    return None
+
+
+# ── Measuring ────────────────────────────────────────────────────────────────
+
+def measure(page, cdn):
+    html = page.read_text(encoding="utf-8", errors="replace")
+    p = PageParser()
+    p.feed(html)
+    sizes, missing, unknown = {}, [], []
+    eager_images = []
+
+    def add(kind, url, base, eager):
+        target = resolve(url, base)
+        if target is None or str(target) in sizes:
+            return
+        if isinstance(target, str):
+            n = cdn_bytes(target, cdn)
+            if n is None:
+                unknown.append(target)
+                return
+            sizes[target] = n
+            return
+        if not target.is_file():
+            missing.append(url)
+            return
+        sizes[str(target)] = target.stat().st_size
+        if kind == "img" and eager:
+            eager_images.append((sizes[str(target)], rel(target)))
+        if kind == "css":
+            for k, u in css_refs(target.read_text(encoding="utf-8", errors="replace")):
+                add(k, u, target, True)
+
+    for kind, url, eager in p.refs:
+        add(kind, url, page, eager)
+    for text in p.styles:
+        for kind, url in css_refs(text):
+            add(kind, url, page, True)
+
+    lcp = None
+    if p.lcp_hint:
+        target = resolve(p.lcp_hint, page)
+        if isinstance(target, Path) and target.is_file():
+            lcp = (target.stat().st_size, rel(target))
+    if lcp is None and eager_images:
+        lcp = max(eager_images)
+    return {
+        "bytes": len(html.encode("utf-8")) + sum(sizes.values()),
+        "blocking_scripts": len(p.blocking_scripts),
+        "blocking_css": len(p.blocking_css),
+        "lcp_bytes": lcp[0] if lcp else 0,
+        "lcp": lcp[1] if lcp else None,
+        "files": len(sizes),
+        "missing": missing,
+        "unknown": sorted(set(unknown)),
+    }
+
+
+def over_budget(m, budget):
+    """[(metric, value, limit)] for every metric above its budget."""
+    return [(k, m[k], budget[k]) for k in ("bytes", "blocking_scripts", "blocking_css", "lcp_bytes")
+            if m[k] > budget.get(k, math.inf)]
+
+
+def budget_for(m, headroom):
+    kb = lambda n: math.ceil(n * (1 + headroom) / 1024) * 1024
+    return {"bytes": kb(m["bytes"]), "blocking_scripts": m["blocking_scripts"],
+            "blocking_css": m["blocking_css"], "lcp_bytes": kb(m["lcp_bytes"])}
+
+
+def measure_cdn(cdn):
+    for entry in cdn:
+        req = urllib.request.Request(entry.get("sample", entry["prefix"]),
+                                     headers={"User-Agent": "Mozilla/5.0 page-budget"})
+        with urllib.request.urlopen(req, timeout=30) as r:
+            n = len(r.read())
+        print(f"  {n / 1024:8.1f}KB  {entry['prefix']}")
+        if not entry.get("per_weight"):
+            entry["bytes"] = n
+
+
+# ── Entry point ──────────────────────────────────────────────────────────────
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--update", action="store_true", help="rewrite budgets at the current weights")
+    ap.add_argument("--measure-cdn", action="store_true", help="re-measure the cdn table sizes")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    conf = json.loads(BUDGETS.read_text(encoding="utf-8"))
+    if args.measure_cdn:
+        measure_cdn(conf["cdn"])
+
+    results = {rel(p): measure(p, conf["cdn"]) for p in pages()}
+    failures = []
+    print(f"{'page':<52}{'KB':>8}{'js':>4}{'css':>4}{'LCP KB':>8}  LCP")
+    for name, m in results.items():
+        budget = conf["pages"].get(name)
+        over = over_budget(m, budget) if budget else [("budget", "none", "-")]
+        failures += [(name, *o) for o in over]
+        print(f"{name[:51]:<52}{m['bytes'] / 1024:8.0f}{m['blocking_scripts']:>4}"
+              f"{m['blocking_css']:>4}{m['lcp_bytes'] / 1024:8.0f}  {m['lcp'] or '-'}"
+              f"{'   <-- OVER' if over else ''}")
+    for name, m in results.items():
+        for u in m["missing"]:
+            print(f"  missing file   {name}: {u}")
+    unknown = sorted({u for m in results.values() for u in m["unknown"]})
+    if unknown:
+        print(f"  {len(unknown)} external URLs not in the cdn table (not counted), e.g. {unknown[0]}")
+
+    if args.update or args.measure_cdn:
+        if args.update:
+            conf["pages"] = {name: budget_for(m, conf["headroom"]) for name, m in results.items()}
+        BUDGETS.write_text(json.dumps(conf, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"wrote {BUDGETS.relative_to(ROOT)}")
+        return
+    if failures:
+        print("\nOVER BUDGET:")
+        for name, metric, value, limit in failures:
+            print(f"  {name}: {metric} {value} > {limit}")
+        print("If the increase is intended: py scripts/page_budget.py --update")
+        sys.exit(1)
+    print(f"\nOK — {len(results)} pages within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,584 @@
+# -*- coding: utf-8 -*-
+"""
+The retention run as a scheduled job — WhatsApp drafts for the whole inactive cohort
+in one run.
+
+The retention-run Edge Function (supabase/functions/retention-run/index.ts) stops at
+30 students a call: the 150-second function limit, with three model calls in flight,
+so the admin clicks "run" again and again. This does the same work without the cap:
+
+  select    one call to retention_inactive_learners() (migration 20261019140000)
+            returns every inactive learner with their last MVP lesson, completion
+            history, profile and latest questionnaire; phones in retention_optouts
+            are left out
+  dedupe    one query for the drafts of the last DEDUP_WINDOW_DAYS (any status but
+            'rejected'); a learner who already has one for the same next lesson is
+            skipped
+  generate  up to CONCURRENCY model calls in flight. The two system blocks (prompt +
+            lessons map) are the same for every learner and carry cache_control, so
+            the first call goes alone to write the prompt cache and the rest read it.
+            429/5xx answers are retried after their retry-after
+  insert    drafts are bulk-inserted INSERT_CHUNK at a time as status='draft', after
+            re-running the dedupe query for just those learners. A chunk the API
+            refuses is kept and retried once at the end of the run; drafts that still
+            do not go in are saved to scripts/journey_state/retention_unsaved.json and
+            inserted first by the next --write run — a generated (paid) draft is
+            never thrown away
+
+The system prompt and the lessons map are read out of index.ts, so the two runners
+cannot drift apart, and the system text is byte-identical to the function's (same
+JSON layout), so both share one prompt cache.
+
+  py scripts/retention_run.py               # dry run: the cohort, nothing generated
+  py scripts/retention_run.py --write       # generate + insert the drafts
+  py scripts/retention_run.py --self-test   # generation against a local stand-in API
+
+Needs ANTHROPIC_API_KEY in .env.local next to the Supabase keys.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import learner_rollup
+
+ROOT = Path(__file__).resolve().parent.parent
+EDGE_SOURCE = ROOT / "supabase" / "functions" / "retention-run" / "index.ts"
+RPC = "retention_inactive_learners"
+
+INACTIVITY_DAYS = 3
+DEDUP_WINDOW_DAYS = 14
+MODEL = "claude-sonnet-4-6"
+MAX_TOKENS = 600
+SEND_WINDOW_START, SEND_WINDOW_END = 9, 20
+DEFAULT_SEND_HOUR = 19
+ISRAEL = timezone(timedelta(hours=3))  # as the Edge Function: the DST offset, approximated
+
+API_URL = "https://api.anthropic.com/v1/messages"
+API_VERSION = "2023-06-01"
+TIMEOUT = 90
+CONCURRENCY = 6      # model calls in flight
+RETRIES = 4          # per call, for 429 / 5xx / network errors
+RETRY_STATUS = {429, 500, 502, 503, 504, 529}
+INSERT_CHUNK = 25
+UNSAVED_FILE = Path(__file__).resolve().parent / "journey_state" / "retention_unsaved.json"
+
+# Mirror of classifyWhy() in index.ts (and personalize.classify_why before it).
+WHY_TO_CATEGORY = {"התפתחות אישית": "confidence", "שילוב בעסק": "career", "קליניקה": "career"}
+RELATIONSHIP_KEYWORDS = ["נשוא", "זוגיות", "בן זוג", "בת זוג", "אהבה", "אהוב", "מערכת יחסים",
+                         "ילדים שלי", "משפחה שלי", "להתחתן"]
+
+
+class ModelError(RuntimeError):
+    pass
+
+
+# ── The Edge Function's prompt and lessons map ───────────────────────────────
+
+_JS_TOKEN = re.compile(r"""'((?:[^'\\]|\\.)*)'|("(?:[^"\\]|\\.)*")|([A-Za-z_]\w*)(?=\s*:)|,(?=\s*[}\]])""")
+
+
+def _js_literal(src):
+    """A JS object literal of strings, numbers and arrays → Python (via JSON):
+    'single' quotes become "double", bare keys get quoted, trailing commas go."""
+    def sub(m):
+        if m.group(1) is not None:
+            return json.dumps(m.group(1).replace("\\'", "'"), ensure_ascii=False)
+        if m.group(2) is not None:
+            return m.group(2)
+        if m.group(3) is not None:
+            return f'"{m.group(3)}"'
+        return ""
+    return json.loads(_JS_TOKEN.sub(sub, src))
+
+
+def load_edge_source(path=EDGE_SOURCE):
+    """(LESSONS_MAP, SYSTEM_PROMPT) as embedded in retention-run/index.ts."""
+    src = Path(path).read_text(encoding="utf-8").replace("\r\n", "\n")
+    start = src.index("=", src.index("const LESSONS_MAP")) + 1
+    end = src.index("\n}\n", start) + 2
+    prompt = re.search(r"const SYSTEM_PROMPT = `(.*?)`", src, re.S).group(1)
+    return _js_literal(src[start:end]), prompt
+
+
+def system_blocks(lessons, prompt):
+    """The two cached system blocks, exactly as generateMessage() sends them."""
+    return [
+        {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "מפת השיעורים המלאה ל-MVP:\n"
+                                 + json.dumps(lessons, ensure_ascii=False, indent=2),
+         "cache_control": {"type": "ephemeral"}},
+    ]
+
+
+# ── Students (ports of the Edge Function's helpers) ──────────────────────────
+
+def classify_why(why_nlp, vision_one_year):
+    if vision_one_year and any(k in vision_one_year.strip() for k in RELATIONSHIP_KEYWORDS):
+        return "relationships"
+    return WHY_TO_CATEGORY.get((why_nlp or "").strip(), "confidence")
+
+
+def normalize_phone(phone):
+    digits = re.sub(r"\D", "", phone or "")
+    if not digits:
+        return None
+    if digits.startswith("972"):
+        return digits
+    if digits.startswith("0"):
+        return "972" + digits[1:]
+    if len(digits) == 9:
+        return "972" + digits
+    return digits
+
+
+def _ts(s):
+    try:
+        return datetime.fromisoformat(s.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def preferred_hour(completed_ats):
+    """(hour, samples): the most common Israel-time hour of their completions, clipped
+    to the send window; DEFAULT_SEND_HOUR under 3 samples."""
+    hours = [t.astimezone(ISRAEL).hour for t in map(_ts, completed_ats or ()) if t]
+    if len(hours) < 3:
+        return DEFAULT_SEND_HOUR, len(hours)
+    h = Counter(hours).most_common(1)[0][0]
+    return min(max(h, SEND_WINDOW_START), SEND_WINDOW_END), len(hours)
+
+
+def students_from_rows(rows, now):
+    """RPC rows → student records (findInactiveStudents() step 5), most inactive first."""
+    students = []
+    for r in rows:
+        completed = _ts(r.get("last_completed_at"))
+        phone = normalize_phone(r.get("phone") or r.get("q_phone"))
+        if not completed or not phone or not (r.get("why_nlp") or "").strip():
+            continue
+        hour, samples = preferred_hour(r.get("completed_ats"))
+        students.append({
+            "user_id": r["user_id"],
+            "full_name": (r.get("full_name") or "").strip() or "תלמיד",
+            "phone": phone,
+            "why_nlp": r["why_nlp"],
+            "gender": r.get("gender"),
+            "motivation_tip": r.get("motivation_tip"),
+            "vision_one_year": r.get("vision_one_year"),
+            "last_completed_video_id": r["last_video_id"],
+            "last_lesson_index": r["last_index"],
+            "next_lesson_index": r["last_index"] + 1,
+            "days_inactive": int((now - completed).total_seconds() // 86400),
+            "recommended_send_hour": hour,
+            "activity_samples": samples,
+        })
+    students.sort(key=lambda s: -s["days_inactive"])
+    return students
+
+
+# ── Model API ────────────────────────────────────────────────────────────────
+
+class ModelAPI:
+    """Messages API over urllib; thread-safe, sums the token usage of every call."""
+
+    def __init__(self, key, url=API_URL):
+        self.key, self.url = key, url
+        self.usage = Counter()
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def create(self, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        headers = {"x-api-key": self.key, "anthropic-version": API_VERSION,
+                   "content-type": "application/json"}
+        for attempt in range(RETRIES + 1):
+            req = urllib.request.Request(self.url, data=data, headers=headers, method="POST")
+            try:
+                with urllib.request.urlopen(req, timeout=TIMEOUT) as r:
+                    resp = json.loads(r.read().decode("utf-8"))
+                break
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRY_STATUS or attempt == RETRIES:
+                    raise ModelError(f"HTTP {e.code}: {e.read().decode('utf-8', 'replace')[:200]}")
+                wait = float(e.headers.get("retry-after") or 2 ** attempt)
+            except (urllib.error.URLError, TimeoutError) as e:
+                if attempt == RETRIES:
+                    raise ModelError(str(e))
+                wait = 2 ** attempt
+            with self._lock:
+                self.retries += 1
+            time.sleep(min(wait, 60))
+        with self._lock:
+            for k, v in (resp.get("usage") or {}).items():
+                if isinstance(v, int):
+                    self.usage[k] += v
+        return resp
+
+
+def strip_code_fences(text):
+    t = text.strip()
+    if t.startswith("```"):
+        t = re.sub(r"^```(?:json)?\s*", "", t)
+        t = re.sub(r"\s*```$", "", t)
+    return t
+
+
+def generate_message(api, system, student, lesson, category):
+    payload = {
+        "student": {
+            "first_name": student["full_name"].split(" ")[0] or "תלמיד",
+            "gender": student["gender"],
+            "why_nlp_dropdown": student["why_nlp"],
+            "vision_one_year": student["vision_one_year"],
+            "motivation_tip": student["motivation_tip"],
+            "days_inactive": student["days_inactive"],
+            "last_lesson_completed": student["last_lesson_index"],
+        },
+        "next_lesson": {
+            "title": lesson["title"],
+            "insight": lesson["insight_oneline"],
+            "what_student_learns": lesson["what_student_learns"],
+            "framing_for_this_student": lesson["why_for"][category],
+        },
+        "lesson_link": lesson["lesson_url"],
+    }
+    resp = api.create({
+        "model": MODEL, "max_tokens": MAX_TOKENS, "system": system,
+        "messages": [{"role": "user",
+                      "content": json.dumps(payload, ensure_ascii=False, separators=(",", ":"))}],
+    })
+    raw = strip_code_fences(((resp.get("content") or [{}])[0].get("text") or ""))
+    try:
+        message = json.loads(raw).get("message") or ""
+    except (ValueError, AttributeError):
+        message = raw
+    return message.strip()
+
+
+def draft_row(student, lesson, category, message):
+    return {
+        "user_id": student["user_id"],
+        "phone": student["phone"],
+        "full_name": student["full_name"],
+        "why_category": category,
+        "next_lesson_index": student["next_lesson_index"],
+        "next_lesson_video_id": lesson["youtube_id"],
+        "next_lesson_title": lesson["title"],
+        "message_text": message,
+        "recommended_send_hour": student["recommended_send_hour"],
+        "activity_samples": student["activity_samples"],
+        "status": "draft",
+        "why_nlp": student["why_nlp"],
+        "vision_one_year": student["vision_one_year"],
+        "days_inactive_at_send": student["days_inactive"],
+    }
+
+
+def generate_all(api, system, todo, workers=CONCURRENCY):
+    """Yield (student, row, error) for every (student, lesson) in `todo`, as they
+    finish. The first call runs alone so the rest find the prompt cache written."""
+    def one(student, lesson):
+        try:
+            category = classify_why(student["why_nlp"], student["vision_one_year"])
+            message = generate_message(api, system, student, lesson, category)
+            if not message:
+                return student, None, "empty message"
+            return student, draft_row(student, lesson, category, message), None
+        except Exception as e:  # one learner's failure must not stop the cohort
+            return student, None, str(e)
+
+    if not todo:
+        return
+    yield one(*todo[0])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(one, s, l) for s, l in todo[1:]]
+        for f in as_completed(futures):
+            yield f.result()
+
+
+# ── Run ──────────────────────────────────────────────────────────────────────
+
+def recent_drafts(client, now, user_ids=None):
+    """{(user_id, next_lesson_video_id)} with a non-rejected draft in the dedupe window."""
+    cutoff = (now - timedelta(days=DEDUP_WINDOW_DAYS)).isoformat()
+    params = {"select": "user_id,next_lesson_video_id", "status": "neq.rejected",
+              "generated_at": f"gte.{cutoff}", "order": "id"}
+    if user_ids:
+        params["user_id"] = "in.(" + ",".join(user_ids) + ")"
+    return {(r["user_id"], r["next_lesson_video_id"])
+            for r in client.fetch_all("retention_messages", params)}
+
+
+def run(base, key, api_key=None, api_url=API_URL, write=False):
+    client = learner_rollup.Client(base, key)
+    lessons, prompt = load_edge_source()
+    by_index = {l["lesson_index"]: l for l in lessons.values()}
+    video_ids = [by_index[i]["youtube_id"] for i in sorted(by_index)]
+    now = datetime.now(timezone.utc)
+    try:
+        rows = client.rpc(RPC, {"p_video_ids": video_ids, "p_inactive_days": INACTIVITY_DAYS},
+                          order="user_id")
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            raise SystemExit(f"{RPC}() is not deployed — apply "
+                             "supabase/migrations/20261019140000_retention_inactive_learners.sql")
+        raise
+    students = students_from_rows(rows, now)
+    optouts = {r["phone"] for r in client.fetch_all("retention_optouts",
+                                                      {"select": "phone", "order": "phone"})}
+    recent = recent_drafts(client, now)
+    try:
+        unsaved = json.loads(UNSAVED_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        unsaved = []
+    recent |= {(r["user_id"], r["next_lesson_video_id"]) for r in unsaved}
+
+    todo, stats = [], Counter(scanned=len(students))
+    for s in students:
+        lesson = by_index.get(s["next_lesson_index"])
+        if lesson is None:
+            stats["outside_mvp"] += 1
+        elif s["phone"] in optouts:
+            stats["opted_out"] += 1
+        elif (s["user_id"], lesson["youtube_id"]) in recent:
+            stats["skipped"] += 1
+        else:
+            todo.append((s, lesson))
+    stats["todo"] = len(todo)
+    stats["carried"] = len(unsaved)
+    if not write or not (todo or unsaved):
+        return stats, todo, []
+
+    errors, held = [], []
+
+    def flush(rows):
+        """Dedupe + insert `rows`; a refused chunk is kept in `held`, not lost."""
+        try:
+            again = recent_drafts(client, now, [r["user_id"] for r in rows])
+            fresh = [r for r in rows if (r["user_id"], r["next_lesson_video_id"]) not in again]
+            if fresh:
+                client.insert("retention_messages", fresh)
+        except (urllib.error.URLError, OSError) as e:   # HTTPError is a URLError
+            detail = f"HTTP {e.code}: {e.read().decode('utf-8', 'replace')[:200]}" \
+                if isinstance(e, urllib.error.HTTPError) else str(e)
+            errors.append(f"insert of {len(rows)} drafts failed: {detail}")
+            held.extend(rows)
+            return
+        stats["inserted"] += len(fresh)
+        stats["skipped"] += len(rows) - len(fresh)
+
+    for i in range(0, len(unsaved), INSERT_CHUNK):
+        flush(unsaved[i:i + INSERT_CHUNK])       # last run's drafts first
+    pending = []
+    if todo:
+        api = ModelAPI(api_key, api_url)
+        for student, row, error in generate_all(api, system_blocks(lessons, prompt), todo):
+            if error:
+                stats["failed"] += 1
+                errors.append(f"{student['user_id']}: {error}")
+                continue
+            pending.append(row)
+            if len(pending) >= INSERT_CHUNK:
+                flush(pending)
+                pending = []
+        if pending:
+            flush(pending)
+        stats.update({f"tokens_{k}": v for k, v in api.usage.items()})
+        stats["retries"] = api.retries
+
+    retry, held[:] = list(held), []
+    for i in range(0, len(retry), INSERT_CHUNK):
+        flush(retry[i:i + INSERT_CHUNK])
+    stats["unsaved"] = len(held)
+    if held:
+        UNSAVED_FILE.parent.mkdir(exist_ok=True)
+        tmp = UNSAVED_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(held, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, UNSAVED_FILE)
+        errors.append(f"{len(held)} drafts not inserted — kept in {UNSAVED_FILE.name}, "
+                      "the next --write run inserts them first")
+    else:
+        UNSAVED_FILE.unlink(missing_ok=True)
+    return stats, todo, errors
+
+
+# ── Local stand-in for the model API (self-test) ─────────────────────────────
+
+class StandIn:
+    """The Messages API on localhost. Answers {"message": ...} JSON (every third one
+    inside a code fence), reports a prompt-cache write the first time it sees a system
+    prefix and a read after that, and answers the first `overloaded` calls with 429.
+    .peak is the most calls it had in flight at once."""
+
+    def __init__(self, key="K", overloaded=0, delay=0.05):
+        self.key, self.overloaded, self.delay = key, overloaded, delay
+        self.calls, self.inflight, self.peak = 0, 0, 0
+        self.cached = set()
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, obj, headers=()):
+                raw = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                if self.headers.get("x-api-key") != stand_in.key:
+                    return self._reply(401, {"type": "error", "error": {"type": "authentication_error"}})
+                with stand_in._lock:
+                    stand_in.calls += 1
+                    if stand_in.overloaded > 0:
+                        stand_in.overloaded -= 1
+                        return self._reply(429, {"type": "error", "error": {"type": "rate_limit_error"}},
+                                           [("retry-after", "0")])
+                    stand_in.inflight += 1
+                    stand_in.peak = max(stand_in.peak, stand_in.inflight)
+                    n = stand_in.calls
+                    prefix = hashlib.sha1(json.dumps(body["system"]).encode("utf-8")).hexdigest()
+                    hit = prefix in stand_in.cached
+                    stand_in.cached.add(prefix)
+                time.sleep(stand_in.delay)
+                user = json.loads(body["messages"][0]["content"])
+                text = json.dumps({"message": f"{user['student']['first_name']}, "
+                                              f"{user['next_lesson']['title']}\n\n{user['lesson_link']}"},
+                                  ensure_ascii=False)
+                if n % 3 == 0:
+                    text = f"```json\n{text}\n```"
+                size = len(json.dumps(body["system"]))
+                usage = {"input_tokens": 200, "output_tokens": 120,
+                         "cache_read_input_tokens": size if hit else 0,
+                         "cache_creation_input_tokens": 0 if hit else size}
+                with stand_in._lock:
+                    stand_in.inflight -= 1
+                self._reply(200, {"content": [{"type": "text", "text": text}], "usage": usage})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/messages"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def self_test():
+    ok = True
+
+    def check(name, cond):
+        nonlocal ok
+        ok &= bool(cond)
+        print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+
+    lessons, prompt = load_edge_source()
+    by_index = {l["lesson_index"]: l for l in lessons.values()}
+    check("lessons map read from index.ts", sorted(by_index) == [1, 2, 3, 4, 5]
+          and by_index[3]["title"] == "מה זה (תכל'ס) NLP?"
+          and set(by_index[1]["why_for"]) == {"career", "relationships", "confidence"})
+    check("system prompt read from index.ts", prompt.startswith("אתה רם ענבי")
+          and prompt.endswith('{"message": "..."}'))
+    check("phone normalisation", [normalize_phone(p) for p in ("050-123 4567", "+972 50 1234567",
+                                                               "501234567", "", None)]
+          == ["972501234567", "972501234567", "972501234567", None, None])
+    check("why classification", (classify_why("קליניקה", None), classify_why("קליניקה", "זוגיות טובה"),
+                                 classify_why("", None)) == ("career", "relationships", "confidence"))
+    # 06:xx UTC = 09:xx Israel; 19:xx UTC = 22:xx → clipped to 20
+    check("send hour", (preferred_hour(["2026-10-01T06:10:00Z"] * 2), preferred_hour(
+        ["2026-10-01T19:00:00Z", "2026-10-02T19:30:00+00:00", "2026-10-03T06:00:00Z"]))
+          == ((DEFAULT_SEND_HOUR, 2), (20, 3)))
+
+    now = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+    rows = [{"user_id": f"u{i}", "last_index": 1 + i % 4, "last_video_id": "v",
+             "last_completed_at": f"2026-10-{1 + i % 15:02d}T10:00:00Z", "completed_ats": [],
+             "full_name": f"לומד{i} כהן", "phone": "" if i % 5 else "0501234567",
+             "q_phone": "052-7654321", "why_nlp": "" if i == 7 else "קליניקה",
+             "gender": "גבר", "motivation_tip": None, "vision_one_year": None} for i in range(41)]
+    students = students_from_rows(rows, now)
+    check("rows → students (no why_nlp dropped, questionnaire phone used)",
+          len(students) == 40 and all(s["phone"].startswith("972") for s in students)
+          and students[0]["days_inactive"] >= students[-1]["days_inactive"])
+
+    s = StandIn(overloaded=2)
+    api = ModelAPI("K", s.url)
+    todo = [(st, by_index[st["next_lesson_index"]]) for st in students]
+    results = list(generate_all(api, system_blocks(lessons, prompt), todo))
+    drafts = [r for _, r, e in results if r]
+    check("every learner drafted in one run", len(drafts) == 40 and not [e for *_, e in results if e])
+    check(f"concurrency bounded (peak {s.peak} <= {CONCURRENCY})", 1 < s.peak <= CONCURRENCY)
+    check("prompt cache written once, read by the rest",
+          api.usage["cache_creation_input_tokens"] > 0
+          and api.usage["cache_read_input_tokens"] == 39 * api.usage["cache_creation_input_tokens"])
+    check("429 retried", api.retries == 2)
+    check("code fences stripped, draft rows complete",
+          all("```" not in d["message_text"] and d["status"] == "draft"
+              and d["next_lesson_video_id"] == by_index[d["next_lesson_index"]]["youtube_id"]
+              for d in drafts))
+    s.close()
+    s = StandIn()
+    try:
+        ModelAPI("wrong", s.url).create({"system": [], "messages": []})
+        check("auth error surfaces", False)
+    except ModelError as e:
+        check("auth error surfaces", "401" in str(e))
+    s.close()
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--write", action="store_true", help="generate and insert drafts (default: dry run)")
+    ap.add_argument("--self-test", action="store_true", help="run against a local stand-in model API")
+    ap.add_argument("--api-url", default=None, help=f"Messages API endpoint (default {API_URL})")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    for line in (ROOT / ".env.local").read_text(encoding="utf-8").splitlines():
+        if "=" in line and not line.strip().startswith("#"):
+            k, v = line.split("=", 1)
+            os.environ.setdefault(k.strip(), v.strip())
+    t0 = datetime.now()
+    stats, todo, errors = run(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_KEY"],
+                              os.environ.get("ANTHROPIC_API_KEY"),
+                              args.api_url or os.environ.get("ANTHROPIC_API_URL") or API_URL,
+                              write=args.write)
+    print(f"{stats['scanned']} inactive → {stats['todo']} to draft "
+          f"({stats['skipped']} already drafted, {stats['opted_out']} opted out, "
+          f"{stats['outside_mvp']} past the MVP) in {(datetime.now() - t0).total_seconds():.1f}s")
+    if not args.write:
+        for s, lesson in todo[:10]:
+            print(f"  {s['full_name']:<24} {s['days_inactive']:>3}d  → {lesson['title']}")
+        print("  dry run — nothing generated (--write to draft)")
+        return
+    print(f"  inserted {stats['inserted']}, failed {stats['failed']}, unsaved {stats['unsaved']}, "
+          f"retries {stats['retries']}; "
+          f"tokens: cache read {stats['tokens_cache_read_input_tokens']}, "
+          f"cache write {stats['tokens_cache_creation_input_tokens']}, "
+          f"input {stats['tokens_input_tokens']}, output {stats['tokens_output_tokens']}")
+    for e in errors[:5]:
+        print(f"  ! {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only "who already got this campaign" journal — the dedupe source for every
+email campaign.
+
+monthly_journey_email rewrote the whole sorted `sent` list to the month's state file
+after every email, and study_buddy_seed_invite rewrote all of buddy_seed_sent.json:
+n sends → n full rewrites (quadratic bytes), and a crash during a rewrite could leave
+a truncated file — i.e. forget everyone and message them all again.
+
+Here each send is ONE line appended to scripts/journey_state/<campaign>.journal.jsonl
+and fsync'd before the next send:
+
+    journal = SendJournal("buddy_seed")
+    if user_id in journal: ...                  # set lookup, built once at open
+    journal.record(user_id, email=email)        # one fsync'd line
+
+A crash can at worst leave a torn last line; it is dropped on the next open. The file
+is compacted (rewritten atomically, one line per key) on open when it carries more
+than COMPACT_SLACK dead lines (torn tail, repeated keys), or explicitly:
+
+  py scripts/send_journal.py                    # every journal: keys / lines / size
+  py scripts/send_journal.py --compact          # compact them all now
+
+A journal that does not exist yet is seeded from the campaign's old JSON state file
+(`legacy=`), so switching over never re-sends to anyone.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+STATE_DIR = Path(__file__).resolve().parent / "journey_state"
+SUFFIX = ".journal.jsonl"
+COMPACT_SLACK = 50
+
+
+def _legacy_records(path):
+    """Old state files: a list of keys (monthly) or {key: {fields}} (buddy seed)."""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if isinstance(data, dict):
+        return {k: (v if isinstance(v, dict) else {}) for k, v in data.items()}
+    return {k: {} for k in data}
+
+
+class SendJournal:
+    def __init__(self, campaign, legacy=None):
+        self.path = STATE_DIR / f"{campaign}{SUFFIX}"
+        self.records = {}
+        self.lines = 0
+        torn = False
+        if self.path.exists():
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            torn = bool(raw) and not raw.endswith(b"\n")
+            for line in raw.splitlines():
+                try:
+                    rec = json.loads(line)
+                    key = rec.pop("k")
+                except (ValueError, KeyError, AttributeError):
+                    torn = True  # half-written line from a crash
+                    continue
+                self.records[key] = rec
+                self.lines += 1
+        elif legacy:
+            self.records = _legacy_records(legacy)
+            if self.records:
+                self.compact()
+        if torn or self.lines - len(self.records) > COMPACT_SLACK:
+            self.compact()
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(self, key, **fields):
+        """Append one send and fsync it — durable before the caller moves on."""
+        rec = {"at": datetime.now(timezone.utc).isoformat(timespec="seconds"), **fields}
+        line = json.dumps({"k": key, **rec}, ensure_ascii=False) + "\n"
+        STATE_DIR.mkdir(exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[key] = rec
+        self.lines += 1
+
+    def compact(self):
+        """Rewrite as one line per key, atomically (tmp + fsync + replace)."""
+        STATE_DIR.mkdir(exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for key, rec in self.records.items():
+                f.write(json.dumps({"k": key, **rec}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.lines = len(self.records)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--compact", action="store_true")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    for path in sorted(STATE_DIR.glob(f"*{SUFFIX}")):
+        j = SendJournal(path.name[:-len(SUFFIX)])
+        if args.compact:
+            j.compact()
+        print(f"{path.name:<40} {len(j):>6} keys {j.lines:>6} lines {path.stat().st_size / 1024:>7.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+One send budget for every job that mails through the Gmail Apps Script web app.
+
+The Apps Script mailer allows ~100 recipients a day and ~10 sends a minute, and four
+jobs draw on it: monthly_journey_email (slept a fixed 7s, capped itself at 85 a run),
+study_buddy_seed_invite (slept 9s, waited 70s on "rate limit"), the backup report and
+the Green API canary — with no idea of each other. A campaign could eat the whole
+day's quota an hour before the canary needed to say Green API is down.
+
+Here every send goes through a Scheduler, and all processes share one state file
+(scripts/journey_state/send_quota.json) guarded by a file lock:
+
+  per-minute token bucket   `rate` tokens a minute, up to BURST saved up — no fixed
+                            sleeps, a campaign sends as fast as the bucket refills.
+                            A token is one recipient, not one HTTP call: Apps Script
+                            counts every message a merge call sends, so a batch takes
+                            as many tokens as it has recipients (at most BURST)
+  daily ledger              sends per day and per job; campaigns stop at
+                            DAILY_LIMIT - RESERVE[CAMPAIGN], reports a little later,
+                            alerts may use the whole day
+  priorities                ALERT < REPORT < CAMPAIGN; while a higher class is waiting
+                            for a token, lower classes do not take one
+  adaptive rate             a "rate limit" response halves the rate and pauses the
+                            bucket for COOLDOWN_SEC; every clean send adds RATE_STEP
+                            back, up to MAX_RATE (AIMD)
+
+    sched = Scheduler("monthly_journey", CAMPAIGN)
+    for learner in pending:
+        if not sched.acquire():          # today's campaign share is spent
+            break
+        ok, info = send(...)
+        sched.release(ok, info)          # refunds the slot if it did not go out
+
+    n = sched.acquire(len(chunk))        # batched mail-merge call: n tokens, n slots
+    sched.settle(n, sent, errors)        # n <= BURST — send only the first n
+
+  py scripts/send_scheduler.py           # today's ledger, rate and bucket
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+STATE_DIR = Path(__file__).resolve().parent / "journey_state"
+STATE_FILE = STATE_DIR / "send_quota.json"
+LOCK_FILE = STATE_DIR / "send_quota.lock"
+
+ALERT, REPORT, CAMPAIGN = 0, 1, 2
+CLASS_NAMES = {ALERT: "alert", REPORT: "report", CAMPAIGN: "campaign"}
+
+DAILY_LIMIT = 100                              # Apps Script consumer quota, recipients/day
+RESERVE = {ALERT: 0, REPORT: 5, CAMPAIGN: 15}  # slots of the day a class may NOT touch
+MAX_RATE = 9.0       # sends/minute; Apps Script starts refusing at ~10
+MIN_RATE = 2.0
+RATE_STEP = 0.5      # additive recovery per clean send
+BURST = 3            # tokens the bucket can save up while idle
+COOLDOWN_SEC = 65    # "rate limit" is per minute — sit the rest of it out
+WAITER_TTL_SEC = 30  # a waiter that stopped polling (crashed) stops blocking others
+KEEP_DAYS = 14
+
+
+# ── State (always read/written under the lock) ───────────────────────────────
+
+@contextlib.contextmanager
+def _locked():
+    """Exclusive cross-process lock on LOCK_FILE (msvcrt on Windows, flock elsewhere)."""
+    STATE_DIR.mkdir(exist_ok=True)
+    with open(LOCK_FILE, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # gives up after ~10s
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _fresh(now):
+    return {"rate": MAX_RATE, "tokens": float(BURST), "refilled_at": now,
+            "cooldown_until": 0, "waiting": {}, "days": {}}
+
+
+def _load(now):
+    try:
+        state = json.loads(STATE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return _fresh(now)
+    return {**_fresh(now), **state}
+
+
+def _save(state):
+    tmp = STATE_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, STATE_FILE)
+
+
+def _today(state, today=None):
+    day = (today or date.today()).isoformat()
+    cutoff = ((today or date.today()) - timedelta(days=KEEP_DAYS)).isoformat()
+    state["days"] = {d: v for d, v in state["days"].items() if d > cutoff}
+    return state["days"].setdefault(day, {"sent": 0, "by_job": {}, "full": False})
+
+
+def _refill(state, now):
+    if now < state["cooldown_until"]:
+        state["refilled_at"] = max(now, state["refilled_at"])
+        return
+    start = max(state["refilled_at"], state["cooldown_until"])
+    state["tokens"] = min(float(BURST), state["tokens"] + (now - start) * state["rate"] / 60)
+    state["refilled_at"] = now
+
+
+def day_allowance(priority):
+    return DAILY_LIMIT - RESERVE[priority]
+
+
+# ── Scheduler ────────────────────────────────────────────────────────────────
+
+class Scheduler:
+    def __init__(self, job, priority=CAMPAIGN):
+        self.job = job
+        self.priority = priority
+        self.me = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    def acquire(self, n=1, timeout=None):
+        """Block until this job may make one mailer call carrying up to `n` messages.
+        Returns how many it may send (0 when the day's allowance for its class is spent,
+        the quota was hit, or `timeout` seconds passed). Both the bucket and the daily
+        ledger count recipients, so a call never carries more than BURST."""
+        deadline = None if timeout is None else time.time() + timeout
+        try:
+            while True:
+                with _locked():
+                    now = time.time()
+                    state = _load(now)
+                    day = _today(state)
+                    left = day_allowance(self.priority) - day["sent"]
+                    if day["full"] or left <= 0:
+                        return 0
+                    _refill(state, now)
+                    state["waiting"] = {k: v for k, v in state["waiting"].items()
+                                        if now - v[1] < WAITER_TTL_SEC and k != self.me}
+                    ahead = any(p < self.priority for p, _ in state["waiting"].values())
+                    want = min(n, left, BURST)
+                    if state["tokens"] >= want and not ahead:
+                        granted = want
+                        state["tokens"] -= granted
+                        day["sent"] += granted
+                        day["by_job"][self.job] = day["by_job"].get(self.job, 0) + granted
+                        _save(state)
+                        return granted
+                    state["waiting"][self.me] = [self.priority, now]
+                    wait = max(state["cooldown_until"] - now,
+                               (want - state["tokens"]) * 60 / state["rate"], 0.2)
+                    _save(state)
+                if deadline is not None and time.time() + wait > deadline:
+                    return 0
+                time.sleep(min(wait, WAITER_TTL_SEC / 3))
+        finally:
+            self._forget()
+
+    def release(self, ok, info=""):
+        """Report how a single send went (see settle)."""
+        self.settle(1, 1 if ok else 0, info)
+
+    def settle(self, granted, sent, info=""):
+        """Report how a call with `granted` messages went: `sent` went out, the rest
+        give their daily slots back. `info` is the error text, if any — "rate limit"
+        slows the bucket down, a daily-quota error closes the day."""
+        text = str(info).lower()
+        with _locked():
+            now = time.time()
+            state = _load(now)
+            day = _today(state)
+            unused = granted - sent
+            if unused:
+                day["sent"] = max(0, day["sent"] - unused)
+                day["by_job"][self.job] = max(0, day["by_job"].get(self.job, 0) - unused)
+            if "rate limit" in text:
+                state["rate"] = max(MIN_RATE, state["rate"] / 2)
+                state["tokens"] = 0.0
+                state["cooldown_until"] = now + COOLDOWN_SEC
+            elif unused and ("quota" in text or "daily" in text):
+                day["full"] = True
+            elif sent:
+                state["rate"] = min(MAX_RATE, state["rate"] + RATE_STEP)
+            _save(state)
+
+    def _forget(self):
+        with _locked():
+            state = _load(time.time())
+            if state["waiting"].pop(self.me, None) is not None:
+                _save(state)
+
+
+def status():
+    with _locked():
+        now = time.time()
+        state = _load(now)
+        day = dict(_today(state))
+        _refill(state, now)
+    return {"rate": state["rate"], "tokens": state["tokens"],
+            "cooldown": max(0, state["cooldown_until"] - now), "today": day,
+            "allowance": {CLASS_NAMES[p]: day_allowance(p) for p in RESERVE}}
+
+
+def main():
+    argparse.ArgumentParser().parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    s = status()
+    t = s["today"]
+    print(f"today: {t['sent']}/{DAILY_LIMIT} sent{' (quota hit)' if t['full'] else ''}  "
+          + "  ".join(f"{job}={n}" for job, n in sorted(t["by_job"].items())))
+    print("allowance: " + "  ".join(f"{c}≤{n}" for c, n in s["allowance"].items()))
+    print(f"rate {s['rate']:.1f}/min, {s['tokens']:.1f} tokens"
+          + (f", cooling down {s['cooldown']:.0f}s" if s["cooldown"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,25 @@
 SEO Batch Update Script
 Adds canonical tags, Twitter meta tags, JSON-LD schemas, and missing meta descriptions
 to all public HTML pages. Only modifies <head> section — zero changes to <body>.
+
+Each page's <head> is tokenized once (index_head) into an index of the meta tags it
+already has plus the offsets of </title> and </head>; every insertion is then spliced
+in one pass. Pages run on a thread pool, and a page whose bytes (and definition) are
+unchanged since the last run is skipped by hash — scripts/journey_state/seo_manifest.json.
 """
 
+import hashlib
 import os
 import re
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "https://www.therapist-home.com"
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST = os.path.join(PROJECT_DIR, "scripts", "journey_state", "seo_manifest.json")
+SEO_MARKER = "<!-- === SEO Tags (auto-generated) === -->"
+WORKERS = 8
 
 # ============================================================
 # PAGE DEFINITIONS — canonical URL, meta desc, OG, schema type
@@ -548,124 +559,192 @@ def build_seo_block(page_key, page_info):
 
 def has_existing_seo(content):
     """Check if SEO tags were already injected"""
-    return "<!-- === SEO Tags (auto-generated) === -->" in content
-
-
-def has_existing_tag(content, tag_pattern):
-    """Check if a specific tag already exists"""
-    return bool(re.search(tag_pattern, content, re.IGNORECASE))
-
-
-def add_missing_meta(content, page_info):
+    return SEO_MARKER in content
+
+
+# One token per match: a comment or a start/end tag (quoted attribute values may hold ">")
+TOKEN_RE = re.compile(r"""<!--.*?-->|<(/?)([a-zA-Z][^\s/>]*)((?:[^>"']|"[^"]*"|'[^']*')*)>""", re.DOTALL)
+ATTR_RE = re.compile(r"""([^\s=/>"']+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?""")
+RAW_TEXT = {"script", "style", "title", "textarea", "noscript"}
+RAW_END = {name: re.compile(rf"</{name}\s*>", re.IGNORECASE) for name in RAW_TEXT}
+
+
+def index_head(content):
+    """Tokenize <head> once. Returns {"head": bool, "title_end": offset after </title>,
+    "head_close": offset of </head>, "tags": {("name"|"property", value)}} — offsets
+    are None when the tag is missing. Stops at </head> (or <body>)."""
+    head = {"head": False, "title_end": None, "head_close": None, "tags": set()}
+    pos = 0
+    while True:
+        m = TOKEN_RE.search(content, pos)
+        if not m:
+            return head
+        pos = m.end()
+        if m.group(2) is None:          # comment
+            continue
+        closing, name = m.group(1), m.group(2).lower()
+        if closing:
+            if name == "head":
+                head["head_close"] = m.start()
+                return head
+            continue
+        if name == "body":
+            return head
+        if name == "head":
+            head["head"] = True
+        elif name == "meta":
+            attrs = {k.lower(): (v or "").strip("\"'") for k, v in ATTR_RE.findall(m.group(3))}
+            for key in ("name", "property"):
+                if key in attrs:
+                    head["tags"].add((key, attrs[key].lower()))
+        if name in RAW_TEXT and not m.group(3).rstrip().endswith("/"):
+            end = RAW_END[name].search(content, pos)
+            if not end:
+                return head
+            pos = end.end()
+            if name == "title" and head["title_end"] is None:
+                head["title_end"] = pos
+
+
+def missing_meta(head, page_info):
+    """The meta description / OG lines the page does not have yet, in insertion order."""
+    if not head["head"]:
+        return []
+    wanted = [
+        ("name", "description", page_info["desc"]),
+        ("property", "og:title", page_info["og_title"]),
+        ("property", "og:description", page_info["og_desc"]),
+        ("property", "og:type", "website"),
+        ("property", "og:url", BASE_URL + page_info["canonical"]),
+        ("property", "og:image", f"{BASE_URL}/assets/logo.png"),
+        ("property", "og:locale", "he_IL"),
+    ]
+    return [f'    <meta {key}="{value}" content="{content}">'
+            for key, value, content in wanted if (key, value) not in head["tags"]]
+
+
+def add_missing_meta(content, page_info, head=None):
     """Add missing meta description and OG tags if not present (in <head> only)"""
-    head_match = re.search(r'(<head[^>]*>)(.*?)(</head>)', content, re.DOTALL | re.IGNORECASE)
-    if not head_match:
-        return content
-
-    head_content = head_match.group(2)
-    insertions = []
-
-    # Add meta description if missing
-    if not re.search(r'<meta\s+name=["\']description["\']', head_content, re.IGNORECASE):
-        insertions.append(f'    <meta name="description" content="{page_info["desc"]}">')
-
-    # Add OG tags if missing
-    if not re.search(r'<meta\s+property=["\']og:title["\']', head_content, re.IGNORECASE):
-        insertions.append(f'    <meta property="og:title" content="{page_info["og_title"]}">')
-    if not re.search(r'<meta\s+property=["\']og:description["\']', head_content, re.IGNORECASE):
-        insertions.append(f'    <meta property="og:description" content="{page_info["og_desc"]}">')
-    if not re.search(r'<meta\s+property=["\']og:type["\']', head_content, re.IGNORECASE):
-        insertions.append(f'    <meta property="og:type" content="website">')
-    if not re.search(r'<meta\s+property=["\']og:url["\']', head_content, re.IGNORECASE):
-        canonical_url = BASE_URL + page_info["canonical"]
-        insertions.append(f'    <meta property="og:url" content="{canonical_url}">')
-    if not re.search(r'<meta\s+property=["\']og:image["\']', head_content, re.IGNORECASE):
-        insertions.append(f'    <meta property="og:image" content="{BASE_URL}/assets/logo.png">')
-    if not re.search(r'<meta\s+property=["\']og:locale["\']', head_content, re.IGNORECASE):
-        insertions.append(f'    <meta property="og:locale" content="he_IL">')
-
-    if insertions:
+    head = head or index_head(content)
+    insertions = missing_meta(head, page_info)
+    if insertions and head["title_end"] is not None:
         # Insert after the <title> tag
-        title_match = re.search(r'(</title>)', content, re.IGNORECASE)
-        if title_match:
-            insert_pos = title_match.end()
-            insertion_text = "\n" + "\n".join(insertions)
-            content = content[:insert_pos] + insertion_text + content[insert_pos:]
-
+        pos = head["title_end"]
+        content = content[:pos] + "\n" + "\n".join(insertions) + content[pos:]
     return content
 
 
-def process_file(page_key, page_info):
-    """Process a single HTML file"""
-    filepath = os.path.join(PROJECT_DIR, page_key)
-
-    if not os.path.exists(filepath):
-        print(f"  SKIP (not found): {page_key}")
-        return False
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        content = f.read()
-
+def rewrite(page_key, page_info, content):
+    """(new content, None) or (None, reason) — one tokenizer pass, one splice."""
     # Skip redirects (meta refresh or JS redirect only pages)
-    if '<meta http-equiv="refresh"' in content and len(content) < 500:
-        print(f"  SKIP (redirect): {page_key}")
-        return False
-    if 'window.location.href' in content and len(content) < 500:
-        print(f"  SKIP (redirect): {page_key}")
-        return False
+    if len(content) < 500 and ('<meta http-equiv="refresh"' in content
+                               or 'window.location.href' in content):
+        return None, "redirect"
 
     # Skip if already processed
     if has_existing_seo(content):
-        print(f"  SKIP (already done): {page_key}")
-        return False
-
-    # Step 1: Add missing meta/OG tags
-    content = add_missing_meta(content, page_info)
+        return None, "already done"
+
+    head = index_head(content)
+    if head["head_close"] is None:
+        return None, "no </head>"
+
+    # Missing meta/OG tags go after </title>; the SEO block (canonical + twitter +
+    # schemas) before </head>
+    meta = missing_meta(head, page_info)
+    title_end = head["title_end"] if meta and head["title_end"] is not None else None
+    close = head["head_close"]
+    parts = []
+    if title_end is not None:
+        parts += [content[:title_end], "\n" + "\n".join(meta), content[title_end:close]]
+    else:
+        parts.append(content[:close])
+    parts += [build_seo_block(page_key, page_info), "\n", content[close:]]
+    return "".join(parts), None
+
+
+def page_hash(raw, page_info):
+    h = hashlib.sha1(raw)
+    h.update(json.dumps(page_info, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def process_file(page_key, page_info, manifest):
+    """Process a single HTML file. Returns (status, message, hash for the manifest)."""
+    filepath = os.path.join(PROJECT_DIR, page_key)
 
-    # Step 2: Build SEO block (canonical + twitter + schemas)
-    seo_block = build_seo_block(page_key, page_info)
+    if not os.path.exists(filepath):
+        return "skip", "not found", None
 
-    # Step 3: Insert before </head>
-    head_close = content.find("</head>")
-    if head_close == -1:
-        print(f"  ERROR (no </head>): {page_key}")
-        return False
+    with open(filepath, "rb") as f:
+        raw = f.read()
+    digest = page_hash(raw, page_info)
+    if manifest.get(page_key) == digest:
+        return "skip", "unchanged", digest
 
-    content = content[:head_close] + seo_block + "\n" + content[head_close:]
+    content, reason = rewrite(page_key, page_info, raw.decode("utf-8"))
+    if content is None:
+        return ("error" if reason == "no </head>" else "skip"), reason, digest
 
     # Write back
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(content)
-
-    print(f"  OK: {page_key}")
-    return True
+    out = content.encode("utf-8")
+    with open(filepath, "wb") as f:
+        f.write(out)
+    return "ok", None, page_hash(out, page_info)
 
 
 # ============================================================
 # MAIN
 # ============================================================
 
+def load_manifest():
+    try:
+        with open(MANIFEST, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
 def main():
     print(f"SEO Batch Update — {len(PAGES)} pages")
     print(f"Project: {PROJECT_DIR}")
     print("=" * 50)
 
-    updated = 0
-    skipped = 0
-    errors = 0
+    t0 = time.perf_counter()
+    manifest = load_manifest()
+    keys = sorted(PAGES)
 
-    for page_key, page_info in sorted(PAGES.items()):
+    def run(page_key):
         try:
-            if process_file(page_key, page_info):
-                updated += 1
-            else:
-                skipped += 1
+            return process_file(page_key, PAGES[page_key], manifest)
         except Exception as e:
-            print(f"  ERROR: {page_key} — {e}")
-            errors += 1
-
+            return "error", str(e), None
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        results = list(ex.map(run, keys))
+
+    counts = {"ok": 0, "skip": 0, "error": 0}
+    for page_key, (status, message, digest) in zip(keys, results):
+        counts[status] += 1
+        if status == "ok":
+            print(f"  OK: {page_key}")
+        elif status == "skip":
+            print(f"  SKIP ({message}): {page_key}")
+        else:
+            print(f"  ERROR ({message}): {page_key}")
+        if digest and status != "error":
+            manifest[page_key] = digest
+        else:
+            manifest.pop(page_key, None)
+
+    os.makedirs(os.path.dirname(MANIFEST), exist_ok=True)
+    with open(MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    elapsed = (time.perf_counter() - t0) * 1000
     print("=" * 50)
-    print(f"Done: {updated} updated, {skipped} skipped, {errors} errors")
+    print(f"Done: {counts['ok']} updated, {counts['skip']} skipped, {counts['error']} errors "
+          f"in {elapsed:.0f}ms ({elapsed / max(len(keys), 1):.1f}ms/page)")
 
 
 if __name__ == "__main__":
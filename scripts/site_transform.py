@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+One read, one write: every HTML mutation script as a stage of a single pipeline.
+
+add-site-credit.py, seo-batch-update.py, fix_practice_clips.py and
+gate_master_summaries.py each open, regex-edit and rewrite the same pages on their
+own, and the order they run in matters — run the SEO or credit script after gating
+and the paid shells grow OG tags and a footer. Here they are registered stages, in
+the one order that is right:
+
+  clip_quarantine  pages/master-practice.html, course-library-v2.html
+                   fix_practice_clips.quarantine_practice / quarantine_portal
+  paid_shell       pages/summaries-master/*.html -> empty shell; the body goes to the
+                   private bucket first (gate_master_summaries.make_shell / upload)
+  seo_head         seo-batch-update PAGES — seo.rewrite(); never on a paid shell
+  credit_footer    add-site-credit PAGES — add_credit(); never on a paid shell
+
+Each page is read once, every stage that applies runs on the text in memory, and the
+file is written once, only if the text changed. Side effects a stage needs before
+the write (paid_shell's backup + upload) run first; if one fails the page is not
+written. Every stage is idempotent, so re-running is a no-op.
+
+Incremental: scripts/journey_state/site_transform.json records, per page, the sha1 it
+was last built to and the stage versions it was built with. A page whose bytes and
+stage versions both match is not even decoded. Bump a stage's version when its
+output changes and every page it covers is rebuilt on the next run.
+
+  py scripts/site_transform.py              # build
+  py scripts/site_transform.py --dry-run    # which pages would change, by which stages
+  py scripts/site_transform.py --force      # ignore the cache
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import fix_practice_clips
+
+SCRIPTS = Path(__file__).resolve().parent
+ROOT = SCRIPTS.parent
+CACHE = SCRIPTS / "journey_state" / "site_transform.json"
+WORKERS = 8
+SHELL_MARK = "paid-content.js"      # gate_master_summaries.SHELL_MARK
+
+
+def _load(filename):
+    """Import one of the hyphen-named scripts as a module."""
+    spec = importlib.util.spec_from_file_location(filename[:-3].replace("-", "_"), SCRIPTS / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+seo = _load("seo-batch-update.py")
+credit = _load("add-site-credit.py")
+
+
+class Build:
+    """What the stages of one page leave behind besides the text."""
+
+    def __init__(self, rel):
+        self.rel = rel
+        self.effects = []   # callables to run before the write; raise = don't write
+        self.notes = []
+
+
+# ── Stages ───────────────────────────────────────────────────────────────────
+
+def clip_quarantine(rel, html, build):
+    if rel == "pages/master-practice.html":
+        out, hits = fix_practice_clips.quarantine_practice(html)
+        build.notes.append(f"kept {hits['kept']}, quarantined {hits['quarantined']}")
+    else:
+        out, kept, removed = fix_practice_clips.quarantine_portal(html)
+        build.notes.append(f"kept {kept}, removed {removed}")
+    return out
+
+
+def paid_shell(rel, html, build):
+    if SHELL_MARK in html:
+        return html
+    import gate_master_summaries as gate     # needs `requests`; only when gating
+    gated = gate.make_shell(html)
+    if not gated:
+        build.notes.append("no <body> — left untouched")
+        return html
+    shell, fragment = gated
+    name = Path(rel).name
+
+    def store():
+        gate.BACKUP.mkdir(parents=True, exist_ok=True)
+        (gate.BACKUP / name).write_text(html, encoding="utf-8")
+        base, key = gate.load_env()
+        up = gate.upload(base, key, name, fragment)
+        if up.status_code not in (200, 201):
+            raise RuntimeError(f"upload {up.status_code}: {up.text[:200]}")
+
+    build.effects.append(store)
+    build.notes.append(f"{len(fragment):,} chars -> {gate.BUCKET}/{gate.PREFIX}{name}")
+    return shell
+
+
+def seo_head(rel, html, build):
+    if SHELL_MARK in html:      # paid shells stay noindex: no canonical/OG/JSON-LD
+        return html
+    out, reason = seo.rewrite(rel, seo.PAGES[rel], html)
+    if reason == "no </head>":
+        build.notes.append("seo: no </head>")
+    return html if out is None else out
+
+
+def credit_footer(rel, html, build):
+    if SHELL_MARK in html:
+        return html
+    out, reason = credit.add_credit(html)
+    if reason == "no </body>":
+        build.notes.append("credit: no </body>")
+    return html if out is None else out
+
+
+Stage = namedtuple("Stage", "name version pages run")
+
+STAGES = [
+    Stage("clip_quarantine", 1, {"pages/master-practice.html", "pages/course-library-v2.html"},
+          clip_quarantine),
+    Stage("paid_shell", 1, {p.relative_to(ROOT).as_posix()
+                            for p in (ROOT / "pages" / "summaries-master").glob("*.html")},
+          paid_shell),
+    Stage("seo_head", 1, set(seo.PAGES), seo_head),
+    Stage("credit_footer", 1, set(credit.PAGES), credit_footer),
+]
+
+
+# ── Pipeline ─────────────────────────────────────────────────────────────────
+
+def build_page(rel, cached, dry_run=False, force=False):
+    """(status, stages that changed the page, notes, cache entry or None).
+    status: cached | unchanged | written | would write | error"""
+    stages = [s for s in STAGES if rel in s.pages]
+    versions = {s.name: s.version for s in stages}
+    raw = (ROOT / rel).read_bytes()
+    digest = hashlib.sha1(raw).hexdigest()
+    if not force and cached == {"sha1": digest, "stages": versions}:
+        return "cached", [], [], cached
+
+    build = Build(rel)
+    html = raw.decode("utf-8")
+    changed = []
+    for stage in stages:
+        try:
+            out = stage.run(rel, html, build)
+        except Exception as e:
+            return "error", changed, build.notes + [f"{stage.name}: {type(e).__name__}: {e}"], None
+        if out != html:
+            changed.append(stage.name)
+            html = out
+    if not changed:
+        return "unchanged", [], build.notes, {"sha1": digest, "stages": versions}
+    if dry_run:
+        return "would write", changed, build.notes, None
+
+    try:
+        for effect in build.effects:
+            effect()
+    except Exception as e:
+        return "error", changed, build.notes + [f"{type(e).__name__}: {e}"], None
+    out = html.encode("utf-8")
+    (ROOT / rel).write_bytes(out)
+    return "written", changed, build.notes, {"sha1": hashlib.sha1(out).hexdigest(), "stages": versions}
+
+
+def run(dry_run=False, force=False):
+    try:
+        cache = json.loads(CACHE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cache = {}
+    pages = sorted(set().union(*(s.pages for s in STAGES)))
+    present = [rel for rel in pages if (ROOT / rel).is_file()]
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        results = list(ex.map(lambda rel: build_page(rel, cache.get(rel), dry_run, force), present))
+
+    for rel, (_, _, _, entry) in zip(present, results):
+        if entry:
+            cache[rel] = entry
+        elif not dry_run:
+            cache.pop(rel, None)
+    if not dry_run:
+        CACHE.parent.mkdir(exist_ok=True)
+        CACHE.write_text(json.dumps(cache, indent=1, sort_keys=True), encoding="utf-8")
+    return dict(zip(present, results)), [rel for rel in pages if rel not in present]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true", help="report, write nothing")
+    ap.add_argument("--force", action="store_true", help="ignore the incremental cache")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+
+    t0 = time.perf_counter()
+    results, missing = run(args.dry_run, args.force)
+    elapsed = (time.perf_counter() - t0) * 1000
+
+    counts = {}
+    for rel, (status, changed, notes, _) in results.items():
+        counts[status] = counts.get(status, 0) + 1
+        if status in ("written", "would write", "error"):
+            print(f"  {status.upper():<12} {rel}  [{', '.join(changed)}]"
+                  + (f"  {'; '.join(notes)}" if notes else ""))
+    print(f"{len(results)} pages ({len(missing)} listed but missing): "
+          + ", ".join(f"{n} {s}" for s, n in sorted(counts.items()))
+          + f" in {elapsed:.0f}ms")
+    if counts.get("error"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
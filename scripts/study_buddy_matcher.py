@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+The batch study-buddy matcher: pairs every opted-in learner with one buddy at about
+the same point in the course.
+
+buddy_matches() (20260802120000_study_buddy_matching.sql) ranks the pool for one
+caller at a time, so the same near neighbour is shown to everyone around them and
+people between two popular learners are shown to no one. This looks at the whole
+pool at once:
+
+  pool       study_buddy_prefs.opted_in, with the learner's features from today's
+             learner_features table: >= MIN_LESSONS practitioner lessons, active
+             within ACTIVE_DAYS, a first name and phone on file, not opted out of
+             WhatsApp. One entry per PERSON (identity_resolver), so two accounts of
+             one person are never paired with each other.
+  buckets    (recently active?, course stage) — the stage bounds are
+             buddy_stage_label()'s. Each bucket is sorted by (lessons, days_ago)
+             and swept once; what is left over is swept again per stage, then as
+             one pool.
+  sweep      walking up the sorted list, each learner pairs with the closest
+             still-unpaired learner behind them (at most MAX_GAP lessons back, within
+             the last WINDOW unpaired) unless the pair is blocked. Blocked = the two
+             already have a study_buddy_requests row in any status, or an earlier
+             batch suggested them. Sorting is O(n log n), each sweep O(n · WINDOW).
+             Same input, same pairs.
+
+Pairs are written in bulk to study_buddy_suggestions (one row per direction);
+buddy_matches() shows a learner their latest batch pair first. Nothing is sent to
+anyone.
+
+  py scripts/study_buddy_matcher.py            # dry run: pool, pairs, gaps
+  py scripts/study_buddy_matcher.py --write    # write this batch
+"""
+import argparse
+import bisect
+import os
+import sys
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+
+import learner_features
+import learner_rollup
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MIN_LESSONS = 3          # buddy_min_lessons()
+ACTIVE_DAYS = 90         # buddy_matches(): last_at > now() - 90 days
+FRESH_DAYS = 14          # buddy_matches(): `fresh`
+STAGE_BOUNDS = (10, 25, 40)   # buddy_stage_label(): <=10, <=25, <=40, rest
+MAX_GAP = 12             # lessons; a wider pair is left for tomorrow's pool
+WINDOW = 8               # unpaired learners a sweep keeps within reach
+
+
+def stage(lessons):
+    return bisect.bisect_left(STAGE_BOUNDS, lessons)
+
+
+# ── Pool ─────────────────────────────────────────────────────────────────────
+
+def build_pool(opted_in, feats):
+    """[{person, user_id, lessons, days_ago}] — matchable opted-in people, one each."""
+    by_person = {}
+    for uid in sorted(opted_in):
+        f = feats.get(uid)
+        if (f is None or f["opt_out"] or not f["first_name"] or not f["phone"]
+                or f["practitioner"] < MIN_LESSONS
+                or f["days_ago"] is None or f["days_ago"] > ACTIVE_DAYS):
+            continue
+        # the primary account if it opted in, else the first one that did
+        if f["person_id"] not in by_person or uid == f["primary"]:
+            by_person[f["person_id"]] = {"person": f["person_id"], "user_id": uid,
+                                         "lessons": f["practitioner"], "days_ago": f["days_ago"]}
+    return list(by_person.values())
+
+
+def blocked_pairs(pairs, feats):
+    """{frozenset({person, person})} for account pairs that must not be matched again."""
+    def person(uid):
+        f = feats.get(uid)
+        return f["person_id"] if f else uid
+    return {frozenset((person(a), person(b))) for a, b in pairs}
+
+
+# ── Matching ─────────────────────────────────────────────────────────────────
+
+def _sweep(group, blocked, pairs):
+    """Pair within one sorted group; returns the learners left unpaired."""
+    left, reach = [], []
+    for b in sorted(group, key=lambda l: (l["lessons"], l["days_ago"], l["person"])):
+        while reach and (b["lessons"] - reach[0]["lessons"] > MAX_GAP or len(reach) > WINDOW):
+            left.append(reach.pop(0))
+        for i in range(len(reach) - 1, -1, -1):      # closest first
+            a = reach[i]
+            if frozenset((a["person"], b["person"])) not in blocked:
+                pairs.append((a, b))
+                del reach[i]
+                break
+        else:
+            reach.append(b)
+    return left + reach
+
+
+def match(pool, blocked):
+    """[(a, b)] pairs and the learners left over, bucket by bucket (see the module
+    docstring)."""
+    pairs = []
+    passes = [lambda l: (l["days_ago"] <= FRESH_DAYS, stage(l["lessons"])),
+              lambda l: stage(l["lessons"]),
+              lambda l: None]
+    rest = pool
+    for bucket_of in passes:
+        buckets = {}
+        for l in rest:
+            buckets.setdefault(bucket_of(l), []).append(l)
+        rest = [l for k in sorted(buckets, key=str) for l in _sweep(buckets[k], blocked, pairs)]
+    return pairs, rest
+
+
+def suggestion_rows(pairs, batch):
+    rows = []
+    for a, b in pairs:
+        gap = abs(a["lessons"] - b["lessons"])
+        rows.append({"user_id": a["user_id"], "buddy_id": b["user_id"], "batch": batch, "gap": gap})
+        rows.append({"user_id": b["user_id"], "buddy_id": a["user_id"], "batch": batch, "gap": gap})
+    return rows
+
+
+# ── Run ──────────────────────────────────────────────────────────────────────
+
+def run(base, key, write=False, today=None):
+    today = today or date.today()
+    client = learner_rollup.Client(base, key)
+    feats = learner_features.load(base, key)
+    opted = [r["user_id"] for r in client.fetch_all(
+        "study_buddy_prefs", {"select": "user_id", "opted_in": "eq.true", "order": "user_id"})]
+    requests = client.fetch_all("study_buddy_requests",
+                                {"select": "requester_id,target_id", "order": "id"})
+    earlier = client.fetch_all("study_buddy_suggestions",
+                               {"select": "user_id,buddy_id", "order": "user_id,buddy_id"})
+    blocked = blocked_pairs([(r["requester_id"], r["target_id"]) for r in requests]
+                            + [(r["user_id"], r["buddy_id"]) for r in earlier], feats)
+    pool = build_pool(opted, feats)
+    pairs, unpaired = match(pool, blocked)
+    rows = suggestion_rows(pairs, today.isoformat())
+    if write and rows:
+        client.insert("study_buddy_suggestions", rows, on_conflict="user_id,buddy_id")
+    return {"opted_in": len(opted), "pool": len(pool), "pairs": pairs, "unpaired": unpaired,
+            "blocked": len(blocked), "rows": len(rows)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--write", action="store_true", help="write the pairs (default is dry run)")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    for line in (ROOT / ".env.local").read_text(encoding="utf-8").splitlines():
+        if "=" in line and not line.strip().startswith("#"):
+            k, v = line.split("=", 1)
+            os.environ.setdefault(k.strip(), v.strip())
+    t0 = datetime.now()
+    r = run(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_KEY"], write=args.write)
+    gaps = Counter(abs(a["lessons"] - b["lessons"]) for a, b in r["pairs"])
+    print(f"{r['opted_in']} opted in → {r['pool']} matchable → {len(r['pairs'])} pairs, "
+          f"{len(r['unpaired'])} unpaired ({r['blocked']} blocked pairs) "
+          f"in {(datetime.now() - t0).total_seconds():.1f}s")
+    if gaps:
+        print("  gap: " + "  ".join(f"{g}={n}" for g, n in sorted(gaps.items())))
+    print(f"  {'wrote' if args.write else 'dry run, would write'} {r['rows']} suggestion rows")
+
+
+if __name__ == "__main__":
+    main()
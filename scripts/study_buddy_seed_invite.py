@@ -18,8 +18,10 @@ WHO IT WRITES TO
 SAFETY
     --dry-run is the DEFAULT. It prints the audience and one sample message and sends
     nothing. Sending requires --send, and even then it refuses to run outside 09:00-20:00
-    Israel time, paces sends for the Apps Script rate limit, and writes every send to
-    scripts/journey_state/buddy_seed_sent.json so a re-run never messages anyone twice.
+    Israel time, paces sends through send_scheduler (shared with every other Gmail
+    job, so it never eats the quota the alerts need), and writes every send to
+    the send_journal scripts/journey_state/buddy_seed.journal.jsonl so a re-run never
+    messages anyone twice.
 
 USAGE
     py scripts/study_buddy_seed_invite.py                 # dry run, shows audience
@@ -31,21 +33,23 @@ import datetime
 import json
 import os
 import sys
-import time
 import urllib.parse
 import urllib.request
-import urllib.error
+
+import gmail_transport
+import learner_features
+import send_journal
+import send_scheduler
 
 BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ENV_PATH = os.path.join(BASE, '.env.local')
 STATE_DIR = os.path.join(BASE, 'scripts', 'journey_state')
-STATE_PATH = os.path.join(STATE_DIR, 'buddy_seed_sent.json')
+LEGACY_STATE_PATH = os.path.join(STATE_DIR, 'buddy_seed_sent.json')  # before send_journal
 
 PORTAL_LINK = 'https://www.therapist-home.com/pages/course-library-v2.html#buddy'
 MIN_LESSONS = 3
 ACTIVE_DAYS = 90
-# Apps Script tolerates roughly 10 sends/minute. 98 messages finish in ~11 minutes.
-SEND_DELAY_SEC = 9.0
+# Pacing (~10 sends/minute) and the shared ~100/day cap come from send_scheduler.
 SEND_HOUR_START, SEND_HOUR_END = 9, 20
 
 
@@ -100,103 +104,44 @@ def message_for(first_name, lessons):
             f'{PORTAL_LINK}')
 
 
-def load_state():
-    try:
-        with open(STATE_PATH, encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
-def save_state(state):
-    os.makedirs(STATE_DIR, exist_ok=True)
-    with open(STATE_PATH, 'w', encoding='utf-8') as f:
-        json.dump(state, f, ensure_ascii=False, indent=1)
-
-
 def build_audience():
     """Everyone matchable who has never answered the consent question."""
-    now = datetime.datetime.now(datetime.timezone.utc)
-    cutoff = now - datetime.timedelta(days=ACTIVE_DAYS)
-
-    # completed practitioner lessons per user (excluding last_watched bookkeeping rows)
-    per_user, last_at = {}, {}
-    offset, step = 0, 1000
-    while True:
-        page = rest('course_progress', {
-            'select': 'user_id,video_id,completed_at',
-            'completed': 'eq.true', 'course_type': 'eq.nlp-practitioner',
-            'limit': str(step), 'offset': str(offset)})
-        for row in page:
-            vid = str(row.get('video_id') or '')
-            if vid.startswith('last_watched'):
-                continue
-            per_user.setdefault(row['user_id'], set()).add(vid)
-            ts = row.get('completed_at')
-            if ts:
-                last_at[row['user_id']] = max(last_at.get(row['user_id'], ''), ts)
-        if len(page) < step:
-            break
-        offset += step
-
-    eligible = []
-    for uid, vids in per_user.items():
-        if len(vids) < MIN_LESSONS:
-            continue
-        ts = last_at.get(uid)
-        if not ts:
-            continue
-        try:
-            when = datetime.datetime.fromisoformat(ts.replace('Z', '+00:00'))
-        except Exception:
-            continue
-        if when < cutoff:
-            continue
-        eligible.append((uid, len(vids)))
-
-    # never invite someone who already answered the consent question
-    already = set()
-    ids = [u for u, _ in eligible]
-    for i in range(0, len(ids), 100):
-        chunk = ids[i:i + 100]
+    # one row per person from today's feature table (learner_features.py): practitioner
+    # lessons pooled across duplicate accounts, last activity, opt-out, primary email
+    feats = learner_features.load(SB_URL, SB_KEY)
+    eligible = [f for f in feats.people()
+                if f['practitioner'] >= MIN_LESSONS
+                and f['days_ago'] is not None and f['days_ago'] <= ACTIVE_DAYS]
+
+    # never invite someone who already answered the consent question (on any account)
+    answered = set()
+    every = [a for f in eligible for a in f['accounts']]
+    for i in range(0, len(every), 100):
+        chunk = every[i:i + 100]
         for row in rest('study_buddy_prefs',
                         {'select': 'user_id', 'user_id': 'in.(' + ','.join(chunk) + ')'}):
-            already.add(row['user_id'])
+            answered.add(row['user_id'])
 
     audience = []
-    for i in range(0, len(ids), 100):
-        chunk = ids[i:i + 100]
-        profiles = {p['id']: p for p in rest('profiles', {
-            'select': 'id,full_name,phone,email,whatsapp_opt_out',
-            'id': 'in.(' + ','.join(chunk) + ')'})}
-        for uid, n in eligible:
-            if uid not in profiles or uid in already:
-                continue
-            p = profiles[uid]
-            if p.get('whatsapp_opt_out') is True:
-                continue
-            email = (p.get('email') or '').strip()
-            name = (p.get('full_name') or '').strip().split(' ')[0]
-            if not name or '@' not in email:
-                continue
-            audience.append({'user_id': uid, 'name': name, 'email': email, 'lessons': n})
+    for f in eligible:
+        if answered & set(f['accounts']) or f['opt_out']:
+            continue
+        if not f['first_name'] or '@' not in f['email']:
+            continue
+        audience.append({'user_id': f['primary'], 'all_ids': f['accounts'],
+                         'name': f['first_name'], 'email': f['email'], 'lessons': f['practitioner']})
     audience.sort(key=lambda a: -a['lessons'])
     return audience
 
 
-MAX_URL_CHARS = 5000
-
-
 def build_html(name, lessons):
     """Small, inline-styled RTL body.
 
-    Length is a hard functional limit, not taste. The Apps Script mailer takes the whole
-    message as a GET query string, and Hebrew costs ~6 URL-encoded characters per letter.
-    Measured against the live endpoint on 2026-08-02: a 5,667-character URL returns 200,
-    a 7,467-character one returns 400. MAX_URL_CHARS keeps a margin under that.
-
-    This is also why the monthly journey email has been failing for every learner since
-    at least 2026-08-01 — its HTML builds a ~52,000-character URL.
+    Length used to be a hard functional limit: the Apps Script mailer took the whole
+    message as a GET query string, and Hebrew costs ~6 URL-encoded characters per
+    letter (measured 2026-08-02: a 5,667-character URL returns 200, a 7,467-character
+    one 400). gmail_transport now POSTs the body, so size only matters if the deployed
+    script has no doPost — then anything over GET_URL_LIMIT is refused, not sent.
     """
     return (
         '<div dir="rtl" style="text-align:right;font-family:Arial,sans-serif;'
@@ -212,26 +157,10 @@ def build_html(name, lessons):
         'לא רוצה הודעות כאלה? השב/י "הסר".</p></div>')
 
 
-def send_email(to, name, lessons, text):
-    """Apps Script mailer. GET, not POST — POSTing breaks on Google's redirect."""
-    params = urllib.parse.urlencode({
-        'token': CFG['GMAIL_API_TOKEN'], 'action': 'send', 'to': to,
-        'subject': 'מצאנו לך עם מי ללמוד בפורטל',
-        'body': text, 'html': build_html(name, lessons), 'name': 'בית המטפלים'})
-    url = CFG['GMAIL_API_URL'] + '?' + params
-    if len(url) > MAX_URL_CHARS:
-        return False, f'payload too large ({len(url)} chars) — Apps Script would 400'
-    try:
-        with urllib.request.urlopen(url, timeout=60) as r:
-            txt = r.read().decode('utf-8')
-            try:
-                return bool(json.loads(txt).get('success')), txt[:160]
-            except Exception:
-                return False, 'non-JSON response: ' + txt[:160]
-    except urllib.error.HTTPError as e:
-        return False, f'{e.code}: {e.read().decode("utf-8")[:160]}'
-    except Exception as e:
-        return False, str(e)[:160]
+SUBJECT = 'מצאנו לך עם מי ללמוד בפורטל'
+# {name} / {lessons} are filled per person by the mailer (gmail_transport.send_merge)
+MERGE_TEMPLATE = {'subject': SUBJECT, 'body': message_for('{name}', '{lessons}'),
+                  'html': build_html('{name}', '{lessons}'), 'name': gmail_transport.SENDER_NAME}
 
 
 def main():
@@ -241,8 +170,8 @@ def main():
     args = ap.parse_args()
 
     audience = build_audience()
-    state = load_state()
-    audience = [a for a in audience if a['user_id'] not in state]
+    state = send_journal.SendJournal('buddy_seed', legacy=LEGACY_STATE_PATH)
+    audience = [a for a in audience if not any(u in state for u in a['all_ids'])]
     if args.limit:
         audience = audience[:args.limit]
 
@@ -267,55 +196,53 @@ def main():
         print(f'refusing to send at {hour}:00 Israel time (window {SEND_HOUR_START}-{SEND_HOUR_END}).')
         return
 
-    sent = failed = 0
+    # Mail-merge batches: one call carries the template id + as many people as the
+    # send bucket grants (send_scheduler.BURST at most), each answered separately. "Rate limit
+    # exceeded" is PER MINUTE and transient — a pause, not a failure: send_merge
+    # requeues those people and send_scheduler halves the pace first. (Lumping it in
+    # with the daily cap, both contain the word "limit", aborted a healthy run on the
+    # first canary batch.)
+    sched = send_scheduler.Scheduler('study_buddy_seed', send_scheduler.CAMPAIGN)
+    recipients = [{'to': a['email'], 'vars': {'name': a['name'], 'lessons': a['lessons']}, 'who': a}
+                  for a in audience]
+    sent = failed = unknown = 0
     consecutive_failures = 0
-    for a in audience:
-        ok, info = send_email(a['email'], a['name'], a['lessons'],
-                              message_for(a['name'], a['lessons']))
-        if ok:
-            state[a['user_id']] = {'email': a['email'], 'at': datetime.datetime.now(
-                datetime.timezone.utc).isoformat()}
-            save_state(state)          # persist per message, so a crash cannot re-send
+    quota_hit = False
+    # Any run of failures means something systemic (auth, instance state, network).
+    # Better to stop and look than to spray the whole list.
+    for r, result in gmail_transport.send_merge(
+            sched, MERGE_TEMPLATE, recipients, url=CFG['GMAIL_API_URL'], token=CFG['GMAIL_API_TOKEN'],
+            stop=lambda: consecutive_failures >= 3 or quota_hit):
+        a = r['who']
+        if result is True:
+            state.record(a['user_id'], email=a['email'])   # fsync'd per message, so a crash cannot re-send
             sent += 1
             consecutive_failures = 0
-        else:
-            # "Rate limit exceeded" is PER MINUTE and transient — a pause, not a failure.
-            # Lumping it in with the daily cap (both contain the word "limit") would abort
-            # a healthy run, which is exactly what happened on the first canary batch.
-            if 'rate limit' in str(info).lower():
-                print(f"  rate limited on {a['name']} — waiting 70s, retrying once")
-                time.sleep(70)
-                ok, info = send_email(a['email'], a['name'], a['lessons'],
-                                      message_for(a['name'], a['lessons']))
-                if ok:
-                    state[a['user_id']] = {'email': a['email'], 'at': datetime.datetime.now(
-                        datetime.timezone.utc).isoformat()}
-                    save_state(state)
-                    sent += 1
-                    consecutive_failures = 0
-                    time.sleep(SEND_DELAY_SEC)
-                    continue
-
-            failed += 1
-            consecutive_failures += 1
-            print(f"  FAILED {a['name']} {a['email']}: {info}")
-
-            # The daily cap (~100 recipients) is the hard ceiling. Once it is hit every
-            # further send fails, so stop rather than marking the rest failed.
-            if 'quota' in str(info).lower() or 'daily' in str(info).lower():
-                print('\n⛔ Gmail daily quota reached. Stopping.')
-                print(f'   {sent} sent, {len(audience) - sent} not attempted.')
-                print('   Re-run tomorrow; already-sent people are skipped automatically.')
-                break
-
-            # Any other run of failures means something systemic (auth, instance state,
-            # network). Better to stop and look than to spray the whole list.
-            if consecutive_failures >= 3:
-                print('\n⛔ 3 failures in a row — stopping to avoid burning the list.')
-                print(f'   {sent} sent, {len(audience) - sent} not attempted.')
-                break
-        time.sleep(SEND_DELAY_SEC)
-    print(f'\ndone. sent={sent} failed={failed}')
+            continue
+        if result == gmail_transport.UNKNOWN:
+            # the call dropped after it may have gone out: journal it, never re-send
+            state.record(a['user_id'], email=a['email'], status='unknown')
+            unknown += 1
+            print(f"  UNKNOWN {a['name']} {a['email']}: mailer call dropped, may have been sent")
+            continue
+        failed += 1
+        consecutive_failures += 1
+        print(f"  FAILED {a['name']} {a['email']}: {result}")
+        # The daily cap (~100 recipients) is the hard ceiling. Once it is hit every
+        # further send fails, so stop rather than marking the rest failed.
+        quota_hit = quota_hit or 'quota' in result.lower() or 'daily' in result.lower()
+
+    left = len(audience) - sent - failed - unknown
+    if quota_hit:
+        print('\n⛔ Gmail daily quota reached. Stopping.')
+    elif consecutive_failures >= 3:
+        print('\n⛔ 3 failures in a row — stopping to avoid burning the list.')
+    elif left:
+        print('\n⛔ Today\'s campaign share of the Gmail quota is used up. Stopping.')
+    if left:
+        print(f'   {sent} sent, {left} not attempted.')
+        print('   Re-run tomorrow; already-sent people are skipped automatically.')
+    print(f'\ndone. sent={sent} failed={failed}' + (f' unknown={unknown}' if unknown else ''))
 
 
 if __name__ == '__main__':
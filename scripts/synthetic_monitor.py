@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Synthetic monitor — Beit V'Metaplim
+===================================
+One process for every production probe, instead of one scheduled task per check
+that makes one request, remembers one bit and never records how long it took.
+
+  green_api    checkWhatsapp on the portal instance  (check_green_api_quota.py)
+  submit_lead  tokenless POST must still get 403     (check_funnel_health.py)
+  apps_script  the Gmail mailer answers action=ping  (gmail_mailer.gs)
+  postgrest    one-row read from the REST API
+  backup       a backup ZIP newer than 26h           (check_backup_health.py)
+
+Each probe has its own schedule (`every`, minutes). A tick runs the probes that are
+due, concurrently, and appends (time, latency ms, ok) per probe to a compact time
+series — scripts/journey_state/monitor_series.json, RETAIN_DAYS deep — from which
+--report prints p50/p95/p99 per probe.
+
+Alerts, per probe:
+  broken   the probe failed just now.
+  burning  the SLO error budget is burning too fast. A sample is bad when the probe
+           failed or was slower than its `slo_ms`; burn rate = bad fraction /
+           (1 - target). Multi-window: both windows of a BURN_RULES row must be over
+           its threshold (the short one proves it is still happening).
+Dedup is check_green_api_quota's: alert on entering a state worse than any alerted
+on since the probe was last ok, stay silent while it holds unless should_realert()
+(3+ days since the last alert), one recovery message when it is ok again. State lives in scripts/journey_state/monitor_state.json.
+green_api alerts go by email (WhatsApp is the thing that is down); everything else
+by WhatsApp, one message per tick.
+
+  py scripts/synthetic_monitor.py              # one tick (Scheduled Task, every 5 min)
+  py scripts/synthetic_monitor.py --loop       # keep running, waking when a probe is due
+  py scripts/synthetic_monitor.py --all        # run every probe now
+  py scripts/synthetic_monitor.py --report     # percentiles + burn rates, no probing
+  py scripts/synthetic_monitor.py --no-alert   # probe and record, print alerts only
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import check_backup_health
+import check_funnel_health
+import check_green_api_quota
+
+STATE_DIR = Path(__file__).resolve().parent / "journey_state"
+SERIES_FILE = STATE_DIR / "monitor_series.json"
+STATE_FILE = STATE_DIR / "monitor_state.json"
+RETAIN_DAYS = 35
+MIN_SAMPLES = 4          # a window with fewer samples has no burn rate
+
+HOUR = 3600
+# (long window s, short window s, burn-rate threshold)
+BURN_RULES = [
+    (6 * HOUR, 1 * HOUR, 6.0),      # fast: ~5% of a 30-day budget in 6h
+    (3 * 24 * HOUR, 6 * HOUR, 1.0),  # slow: burning faster than the budget allows
+]
+REPORT_WINDOWS = [("1h", HOUR), ("24h", 24 * HOUR), ("7d", 7 * 24 * HOUR)]
+
+
+# ── Probes ───────────────────────────────────────────────────────────────────
+# Each returns (ok, reason); reason is human-readable (Hebrew where it is alerted).
+
+def probe_green_api():
+    return check_green_api_quota.probe_green_api()
+
+
+def probe_submit_lead():
+    failures = []
+    check_funnel_health.check_backend(failures)
+    return (False, failures[0]) if failures else (True, "ok")
+
+
+def probe_apps_script():
+    q = urllib.parse.urlencode({"action": "ping", "token": os.environ["GMAIL_API_TOKEN"]})
+    try:
+        with urllib.request.urlopen(f"{os.environ['GMAIL_API_URL']}?{q}", timeout=30) as r:
+            data = json.loads(r.read().decode("utf-8"))
+    except Exception as e:
+        return False, f"Apps Script לא נגיש: {type(e).__name__}: {str(e)[:120]}"
+    if data.get("success"):
+        return True, f"ok (remaining {data.get('remaining')})"
+    if data.get("error") == "Unknown action":   # deployed before action=ping: alive, token ok
+        return True, "ok"
+    return False, f"Apps Script החזיר שגיאה: {data.get('error')}"
+
+
+def probe_postgrest():
+    key = os.environ["SUPABASE_SERVICE_KEY"]
+    req = urllib.request.Request(
+        f"{os.environ['SUPABASE_URL'].rstrip('/')}/rest/v1/profiles?select=id&limit=1",
+        headers={"apikey": key, "Authorization": f"Bearer {key}"})
+    try:
+        with urllib.request.urlopen(req, timeout=20) as r:
+            json.loads(r.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return False, f"PostgREST מחזיר HTTP {e.code}."
+    except Exception as e:
+        return False, f"PostgREST לא נגיש: {type(e).__name__}."
+    return True, "ok"
+
+
+def probe_backup():
+    code, message = check_backup_health.check()
+    return code == 0, message
+
+
+PROBES = {
+    # name: fn, every (min), slo_ms (None = no latency SLO), availability target, channel
+    "green_api":   {"fn": probe_green_api,   "every": 360, "slo_ms": 3000, "target": 0.99,  "channel": "email"},
+    "submit_lead": {"fn": probe_submit_lead, "every": 15,  "slo_ms": 2000, "target": 0.995, "channel": "whatsapp"},
+    "apps_script": {"fn": probe_apps_script, "every": 30,  "slo_ms": 8000, "target": 0.99,  "channel": "whatsapp"},
+    "postgrest":   {"fn": probe_postgrest,   "every": 5,   "slo_ms": 1000, "target": 0.995, "channel": "whatsapp"},
+    "backup":      {"fn": probe_backup,      "every": 60,  "slo_ms": None, "target": 0.99,  "channel": "whatsapp"},
+}
+
+
+def run_probe(name):
+    """(ok, latency ms, reason) — a probe that raises is a failed probe."""
+    t0 = time.perf_counter()
+    try:
+        ok, reason = PROBES[name]["fn"]()
+    except Exception as e:
+        ok, reason = False, f"{type(e).__name__}: {str(e)[:150]}"
+    return ok, round((time.perf_counter() - t0) * 1000), reason
+
+
+# ── Time series ──────────────────────────────────────────────────────────────
+
+def load_json(path, default):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return default
+
+
+def save_series(series, now):
+    """{probe: [[epoch s, ms, ok 0/1], ...]}, oldest first, pruned to RETAIN_DAYS."""
+    cutoff = now - RETAIN_DAYS * 24 * HOUR
+    series = {k: [s for s in v if s[0] >= cutoff] for k, v in series.items()}
+    STATE_DIR.mkdir(exist_ok=True)
+    tmp = SERIES_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(series, separators=(",", ":")), encoding="utf-8")
+    tmp.replace(SERIES_FILE)
+    return series
+
+
+def window(samples, now, seconds):
+    return [s for s in samples if s[0] > now - seconds]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def burn_rate(samples, probe):
+    if len(samples) < MIN_SAMPLES:
+        return None
+    slo = probe["slo_ms"]
+    bad = sum(1 for _, ms, ok in samples if not ok or (slo is not None and ms > slo))
+    return (bad / len(samples)) / (1 - probe["target"])
+
+
+def burning(samples, probe, now):
+    """The first BURN_RULES row both of whose windows are over threshold, else None."""
+    for long_s, short_s, threshold in BURN_RULES:
+        long_rate = burn_rate(window(samples, now, long_s), probe)
+        short_rate = burn_rate(window(samples, now, short_s), probe)
+        if long_rate is not None and short_rate is not None \
+                and long_rate >= threshold and short_rate >= threshold:
+            return long_s, long_rate
+    return None
+
+
+# ── Alerts ───────────────────────────────────────────────────────────────────
+
+SEVERITY = {"ok": 0, "burning": 1, "broken": 2}
+
+
+def decide(st, status, reason, now_iso):
+    """Update one probe's alert state; returns the message to send or None.
+    Same rules as check_green_api_quota.main(), measured against the worst state
+    alerted on since the probe was last ok (`alerted`), not the latest one: a probe
+    flapping between broken and burning is one incident until it recovers."""
+    alerted = st.get("alerted", st.get("last_status", "ok"))
+    st["last_reason"] = reason
+    st["last_status"] = status
+    if status == "ok":
+        st["alerted"], st["last_alert_at"] = "ok", None
+        return "✅ חזר לתקינות" if alerted != "ok" else None
+    if SEVERITY[status] <= SEVERITY[alerted] and not check_green_api_quota.should_realert(st):
+        return None
+    st["alerted"] = max(status, alerted, key=SEVERITY.get)
+    st["last_alert_at"] = now_iso
+    return reason
+
+
+def send_alerts(alerts):
+    """alerts = [(probe, message)]; one WhatsApp for the whatsapp channel, one email
+    per email-channel probe."""
+    whatsapp = [(n, m) for n, m in alerts if PROBES[n]["channel"] == "whatsapp"]
+    if whatsapp:
+        check_funnel_health.send_whatsapp(
+            "🚨 ניטור סינתטי (בית המטפלים):\n\n" + "\n".join(f"• {n}: {m}" for n, m in whatsapp))
+    for n, m in alerts:
+        if PROBES[n]["channel"] == "email":
+            if m.startswith("✅"):
+                check_green_api_quota.alert_recovered()
+            else:
+                check_green_api_quota.alert_broken(m)
+
+
+# ── Tick ─────────────────────────────────────────────────────────────────────
+
+def due(state, now, force=False):
+    out = []
+    for name, probe in PROBES.items():
+        last = state.get(name, {}).get("last_run")
+        if force or last is None or now - last >= probe["every"] * 60 - 30:
+            out.append(name)
+    return out
+
+
+def tick(force=False, alert=True):
+    """Run the due probes; returns {probe: (ok, ms, reason)} and the alerts raised."""
+    state = load_json(STATE_FILE, {})
+    series = load_json(SERIES_FILE, {})
+    now = time.time()
+    names = due(state, now, force)
+    with ThreadPoolExecutor(max_workers=len(PROBES)) as ex:
+        results = dict(zip(names, ex.map(run_probe, names)))
+
+    now_iso = datetime.now(timezone.utc).isoformat()
+    alerts = []
+    for name, (ok, ms, reason) in results.items():
+        series.setdefault(name, []).append([int(now), ms, int(ok)])
+        st = state.setdefault(name, {})
+        st["last_run"] = now
+        status = "ok" if ok else "broken"
+        burn = None if not ok else burning(series[name], PROBES[name], now)
+        if burn:
+            status = "burning"
+            long_s, rate = burn
+            reason = (f"צריכת תקציב ה-SLO מהירה פי {rate:.1f} "
+                      f"ב-{long_s // HOUR} השעות האחרונות (איטי/נכשל)")
+        message = decide(st, status, reason, now_iso)
+        if message:
+            alerts.append((name, message))
+
+    save_series(series, now)
+    STATE_DIR.mkdir(exist_ok=True)
+    STATE_FILE.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
+    if alerts and alert:
+        send_alerts(alerts)
+    return results, alerts
+
+
+def report(now=None):
+    now = now or time.time()
+    series = load_json(SERIES_FILE, {})
+    print(f"{'probe':<13}{'window':>7}{'n':>6}{'ok%':>8}{'p50':>7}{'p95':>7}{'p99':>7}{'burn':>7}")
+    for name, probe in PROBES.items():
+        for label, seconds in REPORT_WINDOWS:
+            w = window(series.get(name, []), now, seconds)
+            ms = [s[1] for s in w if s[2]]
+            rate = burn_rate(w, probe)
+            cells = [percentile(ms, p) for p in (50, 95, 99)]
+            print(f"{name:<13}{label:>7}{len(w):>6}"
+                  f"{(100 * sum(s[2] for s in w) / len(w)) if w else 0:>7.1f}%"
+                  + "".join(f"{c if c is not None else '-':>7}" for c in cells)
+                  + (f"{rate:>7.1f}" if rate is not None else f"{'-':>7}"))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--loop", action="store_true", help="keep running")
+    ap.add_argument("--all", action="store_true", help="run every probe now, due or not")
+    ap.add_argument("--report", action="store_true", help="print p50/p95/p99 and burn rates")
+    ap.add_argument("--no-alert", action="store_true", help="print alerts, send nothing")
+    args = ap.parse_args()
+    sys.stdout.reconfigure(encoding="utf-8")
+    if args.report:
+        report()
+        return
+
+    force = args.all
+    while True:
+        results, alerts = tick(force=force, alert=not args.no_alert)
+        for name, (ok, ms, reason) in results.items():
+            print(f"{'OK  ' if ok else 'FAIL'} {name:<13}{ms:>6}ms  {reason}")
+        for name, message in alerts:
+            print(f"ALERT {name}: {message}")
+        if not args.loop:
+            sys.exit(1 if any(not ok for ok, _, _ in results.values()) else 0)
+        force = False
+        state = load_json(STATE_FILE, {})
+        next_at = min(state.get(n, {}).get("last_run", 0) + p["every"] * 60 for n, p in PROBES.items())
+        time.sleep(max(30, next_at - time.time()))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        try:
+            check_funnel_health.send_whatsapp(
+                f"🚨 synthetic-monitor crashed: {type(e).__name__}: {str(e)[:150]}")
+        except Exception:
+            pass
+        sys.exit(3)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Timestamped transcript segments, stored compactly.
+
+YouTube captions and Whisper both hand us timed segments, and every script used to
+flatten them with " ".join(...) — the text survived, the timing did not. A
+SegmentTable keeps both in array form instead of one object per segment:
+
+    starts / ends  array('d')  seconds, one entry per segment
+    offsets        array('l')  where each segment starts in the text blob (+ final len)
+    text           str         the joined transcript, exactly what the store holds
+
+so a search hit or a mentor answer that points at a character in a transcript can
+be turned into "minute 7:42 of the lesson" without re-transcribing anything:
+
+    table.time_at(char_offset)   -> seconds
+    table.segment_at(seconds)    -> segment index
+    table.deep_link(video_id, char_offset) -> https://www.youtube.com/watch?v=...&t=462s
+
+On disk (next to the lesson file, see transcript_store.save_segments) only the
+numbers are written; the text blob is the lesson transcript itself, so the two can
+never disagree silently — a hand-edited transcript invalidates its segments.
+"""
+from array import array
+from bisect import bisect_right
+
+FORMAT_VERSION = 1
+
+
+class SegmentTable:
+    def __init__(self, starts, ends, pieces, sep=" "):
+        if not (len(starts) == len(ends) == len(pieces)):
+            raise ValueError("starts, ends and pieces must have the same length")
+        self.sep = sep
+        self.starts = array("d", starts)
+        self.ends = array("d", ends)
+        self.offsets = array("l")
+        pos = 0
+        for i, piece in enumerate(pieces):
+            if i:
+                pos += len(sep)
+            self.offsets.append(pos)
+            pos += len(piece)
+        self.offsets.append(pos)
+        self.text = sep.join(pieces)
+
+    # ── Constructors ──────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_youtube(cls, snippets):
+        """FetchedTranscript (or the older list-of-dicts format) from youtube_transcript_api."""
+        starts, ends, pieces = [], [], []
+        for s in snippets:
+            start, dur, text = ((s["start"], s["duration"], s["text"]) if isinstance(s, dict)
+                                else (s.start, s.duration, s.text))
+            starts.append(start)
+            ends.append(start + dur)
+            pieces.append(text)
+        return cls(starts, ends, pieces, sep=" ")
+
+    @classmethod
+    def from_whisper(cls, result):
+        """A whisper transcribe() result. Whisper segment texts carry their own
+        leading space and result["text"] is their plain concatenation, so the blob
+        is joined with "" to stay identical to what the scripts stored before."""
+        segs = result.get("segments") or []
+        return cls([s["start"] for s in segs], [s["end"] for s in segs],
+                   [s["text"] for s in segs], sep="")
+
+    # ── Lookups ───────────────────────────────────────────────────────────────
+
+    def __len__(self):
+        return len(self.starts)
+
+    def segment(self, i):
+        """(start, end, text) of segment i."""
+        end = self.offsets[i + 1] - (len(self.sep) if i + 1 < len(self) else 0)
+        return self.starts[i], self.ends[i], self.text[self.offsets[i]:end]
+
+    def segment_at(self, seconds):
+        """Index of the segment playing at `seconds` (the last one that started
+        before it), or None before the first segment."""
+        i = bisect_right(self.starts, seconds) - 1
+        return i if i >= 0 else None
+
+    def segment_for_offset(self, char_offset):
+        """Index of the segment that contains character `char_offset` of the text."""
+        if not len(self):
+            return None
+        i = bisect_right(self.offsets, char_offset, 0, len(self)) - 1
+        return max(i, 0)
+
+    def time_at(self, char_offset):
+        """Start time (seconds) of the segment containing `char_offset`."""
+        i = self.segment_for_offset(char_offset)
+        return None if i is None else self.starts[i]
+
+    def offset_at(self, seconds):
+        """Character offset in the text where the segment playing at `seconds` begins."""
+        i = self.segment_at(seconds)
+        return 0 if i is None else self.offsets[i]
+
+    def deep_link(self, video_id, char_offset):
+        t = self.time_at(char_offset)
+        base = f"https://www.youtube.com/watch?v={video_id}"
+        return base if t is None else f"{base}&t={int(t)}s"
+
+    # ── Serialization ─────────────────────────────────────────────────────────
+
+    def to_json(self):
+        """Numbers only — the text blob lives in the lesson file. Times are rounded
+        to centiseconds, which is finer than either source actually delivers."""
+        return {
+            "v": FORMAT_VERSION,
+            "sep": self.sep,
+            "text_len": len(self.text),
+            "starts": [round(x, 2) for x in self.starts],
+            "ends": [round(x, 2) for x in self.ends],
+            "offsets": list(self.offsets),
+        }
+
+    @classmethod
+    def from_json(cls, data, text):
+        """Rebuild against the lesson text; None if the text no longer matches."""
+        if data.get("v") != FORMAT_VERSION or data.get("text_len") != len(text or ""):
+            return None
+        table = cls.__new__(cls)
+        table.sep = data["sep"]
+        table.starts = array("d", data["starts"])
+        table.ends = array("d", data["ends"])
+        table.offsets = array("l", data["offsets"])
+        table.text = text
+        if len(table.offsets) != len(table.starts) + 1 or table.offsets[-1] != len(text):
+            return None
+        return table
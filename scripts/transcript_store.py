@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Per-lesson transcript store — docs/transcripts/per-lesson is the store of record.
+
+Every transcript script used to load the whole 1.2MB nlp-course-transcripts.json,
+change one lesson, and write the whole file back (and then the whole 700KB
+Markdown). With 51 lessons that is ~60MB of writes for one Whisper pass, and it
+grows with every course we add. Now a lesson is one small file, written
+atomically (temp file + rename), and the combined JSON/Markdown are a build
+product rendered from the store.
+
+Lesson file layout (module<M>_lesson<L>.txt):
+
+    מודול 1: מבוא ל-NLP
+    שיעור 1: איך NLP יכול לשנות את חייך?
+    וידאו: HdJTrqV-8kw
+    משך: 20:20
+    ---
+    <transcript>
+
+Timed segments, when the source had them (YouTube captions, Whisper), sit next to
+the lesson as module<M>_lesson<L>.segments.json — see transcript_segments.py.
+
+The combined build is incremental: _render_manifest.json remembers each lesson
+file's (mtime, size) and the length of its Markdown section, so a rebuild only
+reads and re-renders the lessons that changed and slices the rest out of the
+previous Markdown. The output is byte-identical to the old full render.
+
+  py scripts/transcript_store.py                # incremental rebuild of JSON + MD
+  py scripts/transcript_store.py --full         # ignore the manifest, render everything
+  py scripts/transcript_store.py --import-json  # seed the store from the combined JSON
+  py scripts/transcript_store.py --sync-catalog # lesson headers ← data/course-catalog.json
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+from transcript_segments import SegmentTable
+
+ROOT = Path(__file__).resolve().parent.parent
+TRANSCRIPTS_DIR = ROOT / "docs" / "transcripts"
+STORE_DIR = TRANSCRIPTS_DIR / "per-lesson"
+INDEX_FILE = STORE_DIR / "_index.txt"
+MANIFEST_FILE = STORE_DIR / "_render_manifest.json"
+JSON_FILE = TRANSCRIPTS_DIR / "nlp-course-transcripts.json"
+MD_FILE = TRANSCRIPTS_DIR / "nlp-course-transcripts.md"
+
+LESSON_RE = re.compile(r"^module(\d+)_lesson(\d+)\.txt$")
+HEADER_SEP = "---"
+NO_TRANSCRIPT = "*תמלול אינו זמין לסרטון זה*"
+
+
+def youtube_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def atomic_write_text(path, text):
+    """Write via a temp file in the same directory + rename, so a crash mid-write
+    leaves either the old file or the new one, never half of each."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# ── Lesson files ─────────────────────────────────────────────────────────────
+
+def lesson_key(module_id, lesson_num):
+    return f"module{module_id}_lesson{lesson_num}"
+
+
+def lesson_path(module_id, lesson_num):
+    return STORE_DIR / f"{lesson_key(module_id, lesson_num)}.txt"
+
+
+def list_lessons():
+    """[(module_id, lesson_num, path)] in course order."""
+    found = []
+    for p in STORE_DIR.glob("module*_lesson*.txt"):
+        m = LESSON_RE.match(p.name)
+        if m:
+            found.append((int(m.group(1)), int(m.group(2)), p))
+    return sorted(found)
+
+
+def parse_lesson(text):
+    """Split a lesson file into its header fields and transcript body."""
+    head, sep, body = text.partition("\n" + HEADER_SEP + "\n")
+    if not sep:
+        raise ValueError("lesson file has no '---' header separator")
+    lines = head.split("\n")
+    module_title = lines[0].split(":", 1)[1].strip() if ":" in lines[0] else ""
+    title = lines[1].split(":", 1)[1].strip() if len(lines) > 1 and ":" in lines[1] else ""
+    fields = {}
+    for line in lines[2:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            fields[k.strip()] = v.strip()
+    return {
+        "module_title": module_title,
+        "title": title,
+        "id": fields.get("וידאו", ""),
+        "duration": fields.get("משך", ""),
+        "transcript": body or None,
+    }
+
+
+def format_lesson(module_id, lesson_num, lesson):
+    head = [f"מודול {module_id}: {lesson['module_title']}",
+            f"שיעור {lesson_num}: {lesson['title']}"]
+    if lesson.get("id"):
+        head.append(f"וידאו: {lesson['id']}")
+    if lesson.get("duration"):
+        head.append(f"משך: {lesson['duration']}")
+    return "\n".join(head) + "\n" + HEADER_SEP + "\n" + (lesson.get("transcript") or "")
+
+
+def segments_path(module_id, lesson_num):
+    return STORE_DIR / f"{lesson_key(module_id, lesson_num)}.segments.json"
+
+
+def read_lesson(module_id, lesson_num):
+    path = lesson_path(module_id, lesson_num)
+    if not path.exists():
+        return None
+    return parse_lesson(path.read_text(encoding="utf-8"))
+
+
+def save_lesson(module_id, lesson_num, transcript=None, segments=None, **fields):
+    """Create or update one lesson, atomically. Header fields that are not passed
+    (module_title, title, id, duration) keep their stored values. Passing a
+    SegmentTable as `segments` stores its text as the transcript plus its timing.
+
+    Only this lesson's file is rewritten — call render() once at the end of a run
+    to refresh _index.txt and the combined JSON/Markdown."""
+    lesson = read_lesson(module_id, lesson_num) or {
+        "module_title": "", "title": "", "id": "", "duration": "", "transcript": None}
+    for k, v in fields.items():
+        if v is not None:
+            lesson[k] = v
+    if segments is not None:
+        transcript = segments.text
+    if transcript is not None:
+        lesson["transcript"] = transcript
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(lesson_path(module_id, lesson_num), format_lesson(module_id, lesson_num, lesson))
+    if segments is not None:
+        atomic_write_text(segments_path(module_id, lesson_num),
+                          json.dumps(segments.to_json(), separators=(",", ":")))
+    return lesson
+
+
+def load_segments(module_id, lesson_num):
+    """The lesson's SegmentTable, or None if it has no timing (or the transcript
+    was edited after the timing was recorded)."""
+    lesson = read_lesson(module_id, lesson_num)
+    path = segments_path(module_id, lesson_num)
+    if not lesson or not path.exists():
+        return None
+    return SegmentTable.from_json(json.loads(path.read_text(encoding="utf-8")),
+                                  lesson["transcript"] or "")
+
+
+def load_course():
+    """The whole course in the combined-JSON shape: [{id, title, lessons: [...]}]."""
+    modules = {}
+    for module_id, lesson_num, path in list_lessons():
+        lesson = parse_lesson(path.read_text(encoding="utf-8"))
+        mod = modules.setdefault(module_id, {"id": module_id, "title": lesson["module_title"],
+                                             "lessons": []})
+        mod["lessons"].append(_json_lesson(lesson))
+    return [modules[k] for k in sorted(modules)]
+
+
+def _json_lesson(lesson):
+    return {
+        "id": lesson["id"],
+        "title": lesson["title"],
+        "duration": lesson["duration"],
+        "transcript": lesson["transcript"],
+        "youtube_url": youtube_url(lesson["id"]),
+    }
+
+
+def find_missing(course):
+    """[(module_id, lesson_num, video_id, title)] for lessons with no transcript yet."""
+    return [(m["id"], i, l["id"], l["title"])
+            for m in course for i, l in enumerate(m["lessons"], 1) if not l.get("transcript")]
+
+
+def write_index(course):
+    out = []
+    for m in course:
+        out.append(f"\nמודול {m['id']}: {m['title']} ({len(m['lessons'])} חלקים)")
+        for i, l in enumerate(m["lessons"], 1):
+            out.append(f"  {i}. {l['title']} ({len(l['transcript'] or '')} תווים)")
+    atomic_write_text(INDEX_FILE, "\n".join(out) + "\n")
+
+
+# ── Combined JSON / Markdown ─────────────────────────────────────────────────
+# The Markdown is '\n'.join() of a title block, one block per module header and
+# one block per lesson, so each block can be cached and sliced independently.
+
+def render_title_md(n_lessons, n_modules):
+    return "\n".join(["# תמלולי קורס NLP - יסודות ומעשה\n",
+                      f"## {n_lessons} שיעורים | {n_modules} מודולים\n\n",
+                      "---\n\n"])
+
+
+def render_module_md(module):
+    return f"# מודול {module['id']}: {module['title']}\n\n"
+
+
+def render_lesson_md(module_id, lesson_num, lesson):
+    body = (f"### תמלול:\n{lesson['transcript']}\n\n" if lesson.get("transcript")
+            else f"### תמלול:\n{NO_TRANSCRIPT}\n\n")
+    return "\n".join([f"## שיעור {module_id}.{lesson_num}: {lesson['title']}\n",
+                      f"**משך:** {lesson['duration']} | ",
+                      f"**קישור:** [צפה ביוטיוב]({lesson['youtube_url']})\n\n",
+                      body,
+                      "---\n\n"])
+
+
+def _stamp(path):
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _load_previous():
+    """Manifest + previous combined outputs, or None if any of them is unusable."""
+    try:
+        manifest = json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+        md = MD_FILE.read_text(encoding="utf-8")
+        data = json.loads(JSON_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("md_len") != len(md):
+        return None  # someone edited the Markdown by hand — offsets no longer hold
+    old_lessons = {}
+    for m in data:
+        for i, l in enumerate(m["lessons"], 1):
+            old_lessons[lesson_key(m["id"], i)] = (m["title"], l)
+    pos, sections = 0, {}
+    for key, length in manifest.get("blocks", []):
+        sections[key] = md[pos:pos + length]
+        pos += length + 1  # blocks are joined with '\n'
+    return manifest, sections, old_lessons
+
+
+def render(full=False):
+    """Rebuild the combined JSON + Markdown (and _index.txt) from the store,
+    re-rendering only the lessons whose files changed since the last build. Returns the number of
+    lessons that were re-rendered (0 = outputs already current, nothing written)."""
+    entries = list_lessons()
+    prev = None if full else _load_previous()
+    old_stamps = prev[0].get("lessons", {}) if prev else {}
+
+    modules, lesson_blocks, stamps, changed = {}, {}, {}, 0
+    for module_id, lesson_num, path in entries:
+        key = lesson_key(module_id, lesson_num)
+        stamps[key] = _stamp(path)
+        if prev and old_stamps.get(key) == stamps[key] and key in prev[1] and key in prev[2]:
+            module_title, lesson = prev[2][key]
+            block = prev[1][key]
+        else:
+            parsed = parse_lesson(path.read_text(encoding="utf-8"))
+            module_title, lesson = parsed["module_title"], _json_lesson(parsed)
+            block = render_lesson_md(module_id, lesson_num, lesson)
+            changed += 1
+        mod = modules.setdefault(module_id, {"id": module_id, "title": module_title, "lessons": []})
+        mod["lessons"].append(lesson)
+        lesson_blocks[key] = block
+
+    course = [modules[k] for k in sorted(modules)]
+    removed = set(old_stamps) - set(stamps)
+    if prev and not changed and not removed:
+        if not INDEX_FILE.exists():
+            write_index(course)
+        return 0
+
+    blocks = [("_title", render_title_md(len(entries), len(course)))]
+    for m in course:
+        blocks.append((f"module{m['id']}", render_module_md(m)))
+        for i in range(1, len(m["lessons"]) + 1):
+            key = lesson_key(m["id"], i)
+            blocks.append((key, lesson_blocks[key]))
+    md = "\n".join(text for _, text in blocks)
+
+    atomic_write_text(JSON_FILE, json.dumps(course, ensure_ascii=False, indent=2))
+    atomic_write_text(MD_FILE, md)
+    write_index(course)
+    atomic_write_text(MANIFEST_FILE, json.dumps({
+        "md_len": len(md),
+        "blocks": [[key, len(text)] for key, text in blocks],
+        "lessons": stamps,
+    }, ensure_ascii=False))
+    return changed or len(removed)
+
+
+def import_json(path=JSON_FILE):
+    """One-off migration: write every lesson of the combined JSON into the store,
+    including the video id and duration the old per-lesson files did not carry.
+    Run render() afterwards for the index."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    for m in data:
+        for i, l in enumerate(m["lessons"], 1):
+            lesson = {"module_title": m["title"], "title": l["title"], "id": l["id"],
+                      "duration": l["duration"], "transcript": l.get("transcript")}
+            atomic_write_text(lesson_path(m["id"], i), format_lesson(m["id"], i, lesson))
+
+
+def sync_catalog():
+    """Rewrite every lesson header (module title, title, video id, duration) from the
+    course catalog, leaving transcripts and timing alone. Returns the lessons changed.
+    Run render() afterwards."""
+    import course_catalog
+    changed = []
+    for lesson in course_catalog.load():
+        stored = read_lesson(lesson.module_id, lesson.num)
+        header = {"module_title": lesson.module_title, "title": lesson.title,
+                  "id": lesson.video_id, "duration": lesson.duration}
+        if stored is None or any(stored[k] != v for k, v in header.items()):
+            save_lesson(lesson.module_id, lesson.num, **header)
+            changed.append(lesson_key(lesson.module_id, lesson.num))
+    return changed
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+    if "--import-json" in sys.argv:
+        import_json()
+        print(f"imported {JSON_FILE} into {STORE_DIR}")
+    if "--sync-catalog" in sys.argv:
+        print(f"{len(sync_catalog())} lesson header(s) synced from the course catalog")
+    n = render(full="--full" in sys.argv)
+    if n:
+        print(f"re-rendered {n} lesson(s) -> {JSON_FILE.name}, {MD_FILE.name}")
+    else:
+        print("combined transcripts already up to date")
+
+
+if __name__ == "__main__":
+    main()
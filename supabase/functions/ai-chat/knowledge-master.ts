@@ -1,7 +1,6 @@
 // NLP Master Course Knowledge Base
 // Distilled from transcripts: docs/master-course/קורס מאסטר שיעור 1-9.txt
 // Instructor: רם — advanced course for Practitioner graduates
-// Last updated: 2026-06-02
 
 export const MASTER_KNOWLEDGE = `
 === בסיס ידע: קורס NLP מאסטר — "בית המטפלים" ===
@@ -328,4 +327,4 @@ export const MASTER_KNOWLEDGE = `
 - **מבנה מול תוכן** — מחפשים תבניות, לא פרטי הסיפור
 - **פריים (Frame)** — המסגרת שבה מפרשים אירוע
 - **סומאטיקה** — גוף כמאגר זיכרונות ורגשות
-`
+`;
@@ -1,7 +1,6 @@
 // NLP Practitioner Course Knowledge Base
 // Extracted from: pages/summaries/lesson-1.html through lesson-7.html
 // Used as system context for the AI study assistant
-// Last updated: 2026-02-27
 
 export const NLP_KNOWLEDGE = `
 === בסיס ידע: קורס NLP פרקטישנר — "בית המטפלים" ===
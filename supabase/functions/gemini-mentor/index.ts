@@ -1,6 +1,7 @@
 import { serve } from 'https://deno.land/std@0.168.0/http/server.ts'
 import { createClient } from 'https://esm.sh/@supabase/supabase-js@2'
 import { PRACTITIONER_KB, MASTER_KB } from './knowledge.ts'
+import { loadMasterCorpus, topPassages, type Passage } from './retrieve.ts'
 
 // Keys from Supabase secrets — never hardcoded
 const GEMINI_API_KEY = Deno.env.get('GEMINI_API_KEY') || ''
@@ -13,6 +14,9 @@ const GEMINI_MODEL = 'gemini-2.0-flash'
 const OPENROUTER_MODEL = 'stepfun/step-3.5-flash:free'
 const OPENROUTER_FALLBACK = 'nvidia/nemotron-3-nano-30b-a3b:free'
 const DAILY_LIMIT = 100
+// Lesson passages attached to each question (see retrieve.ts). The KB stays the
+// system prompt; the transcripts are only ever sent as these few passages.
+const RETRIEVAL_K = 4
 
 // ===== Claude Sonnet (primary smart model) + shared monthly budget cap =====
 // The game mentor now answers with claude-sonnet-4-6. The same hard monthly ₪
@@ -50,6 +54,20 @@ function getCorsHeaders(req: Request) {
   }
 }
 
+// Prefix the latest user message with the lesson passages retrieved for it.
+// The system prompt is left untouched so its prompt cache keeps hitting.
+// deno-lint-ignore no-explicit-any
+function withLessonContext(messages: any[], passages: Passage[]): any[] {
+  if (!passages.length) return messages
+  let last = -1
+  messages.forEach((m, i) => { if (m.role !== 'model' && m.role !== 'assistant') last = i })
+  if (last < 0) return messages
+  const question = messages[last].parts?.[0]?.text || messages[last].content || ''
+  const context = passages.map((p) => `(${p.title})\n${p.text}`).join('\n\n')
+  const text = `[קטעים מתוך שיעורי הקורס שעשויים להיות רלוונטיים. היעזר בהם רק אם הם עונים על השאלה]\n${context}\n\n[שאלת התלמיד]\n${question}`
+  return messages.map((m, i) => (i === last ? { role: m.role, parts: [{ text }] } : m))
+}
+
 // Normalize the client's Gemini-format messages (role/parts) into {role, content}.
 // deno-lint-ignore no-explicit-any
 function toConvo(messages: any[]): Array<{ role: string; content: string }> {
@@ -266,7 +284,14 @@ serve(async (req) => {
 
     const kb = course === 'master' ? MASTER_KB : PRACTITIONER_KB
     const sysFull = kb + MENTOR_EXTRA_RULES
-    const convo = toConvo(messages)
+    // ── Ground the answer in the lessons: top-k transcript passages for this question ──
+    // Master passages are paid content: only a paying user ever gets them, whatever
+    // `course` the client sent.
+    const corpus = isPaid && course === 'master' ? 'master' : 'practitioner'
+    if (corpus === 'master') await loadMasterCorpus(supabaseAdmin)
+    const question = toConvo(messages).filter((m) => m.role === 'user').pop()?.content || ''
+    const grounded = withLessonContext(messages, topPassages(corpus, question, RETRIEVAL_K))
+    const convo = toConvo(grounded)
 
     // ── Call AI: Sonnet (paid users, within budget) → Gemini → OpenRouter x2 ──
     const overBudget = isPaid ? (await monthlyCostShekel(supabaseAdmin)) >= AI_MONTHLY_CAP_ILS : true
@@ -282,17 +307,17 @@ serve(async (req) => {
     }
     if (!text) {
       if (!overBudget) console.log('[Mentor] Sonnet unavailable, trying Gemini...')
-      text = await callGemini(messages, sysFull)
+      text = await callGemini(grounded, sysFull)
       if (text) provider = 'gemini'
     }
     if (!text) {
       console.log('[Mentor] Gemini failed, trying OpenRouter...')
-      text = await callOpenRouter(messages, sysFull, OPENROUTER_MODEL)
+      text = await callOpenRouter(grounded, sysFull, OPENROUTER_MODEL)
       if (text) provider = 'openrouter'
     }
     if (!text) {
       console.log('[Mentor] OpenRouter primary failed, trying fallback...')
-      text = await callOpenRouter(messages, sysFull, OPENROUTER_FALLBACK)
+      text = await callOpenRouter(grounded, sysFull, OPENROUTER_FALLBACK)
       if (text) provider = 'openrouter'
     }
 
@@ -0,0 +1,98 @@
+// Top-k lesson passages for a mentor question.
+//
+// retrieval.ts (generated by scripts/gen_mentor_knowledge.py) holds the
+// practitioner transcripts cut into passages plus BM25 postings already weighted
+// at build time, so ranking is just: normalize the question exactly the way the
+// builder normalized the transcripts (scripts/hebrew_search.py → normalize_term /
+// variants), then add up, per question word, the best posting of its variants
+// (the word as written and without 1-2 attached prefix letters).
+//
+// The master corpus is paid content and is NOT in the repo: the generator uploads
+// it to the private `game-data` bucket, and loadMasterCorpus() fetches it once per
+// cold start — only when a paying user asks about the master course.
+import { RETRIEVAL } from './retrieval.ts'
+
+interface Corpus {
+  titles: string[]
+  passages: Array<[number, string]>
+  postings: Record<string, number[]>
+}
+
+const NORM = RETRIEVAL.normalize as { prefixes: string; minStem: number; maxPrefix: number; stopwords: string[] }
+const CORPORA = RETRIEVAL.corpora as Record<string, Corpus>
+const MASTER_BUCKET = 'game-data'
+const MASTER_OBJECT = 'mentor-retrieval-master.json'
+const STOPWORDS = new Set(NORM.stopwords)
+const FINALS: Record<string, string> = { 'ך': 'כ', 'ם': 'מ', 'ן': 'נ', 'ף': 'פ', 'ץ': 'צ' }
+// Same word definition as hebrew_search.WORD_RE: letters/digits/_ plus niqqud,
+// optionally joined by a geresh/gershayim/apostrophe (צה״ל).
+const WORD_CHAR = "[\\p{L}\\p{N}_\\u0591-\\u05bd\\u05bf\\u05c1\\u05c2\\u05c4\\u05c5\\u05c7]"
+const WORD_RE = new RegExp(`${WORD_CHAR}+(?:["'׳״]${WORD_CHAR}+)*`, 'gu')
+
+export function normalizeTerm(word: string): string | null {
+  let w = word.normalize('NFD').replace(/\p{M}/gu, '').replace(/["'׳״]/g, '')
+  w = w.replace(/[ךםןףץ]/g, (c) => FINALS[c]).toLowerCase()
+  if (w.length < 2 || STOPWORDS.has(w) || /^\d+$/.test(w)) return null
+  return w
+}
+
+// The term and what it would be without 1..maxPrefix attached prefix letters,
+// keeping at least minStem letters (hebrew_search.variants).
+export function variants(term: string): string[] {
+  const out = [term]
+  while (out.length <= NORM.maxPrefix && NORM.prefixes.includes(out[out.length - 1][0]) &&
+    out[out.length - 1].length - 1 >= NORM.minStem) {
+    out.push(out[out.length - 1].slice(1))
+  }
+  return [out[0], ...out.slice(1).filter((v) => !STOPWORDS.has(v))]
+}
+
+export function terms(text: string): string[] {
+  const out: string[] = []
+  for (const m of text.matchAll(WORD_RE)) {
+    const t = normalizeTerm(m[0])
+    if (t) out.push(t)
+  }
+  return out
+}
+
+// One download per cold start; a failed download is retried on the next request
+// (until then the master course simply gets no passages).
+let masterLoad: Promise<void> | null = null
+// deno-lint-ignore no-explicit-any
+export function loadMasterCorpus(supabaseAdmin: any): Promise<void> {
+  if (CORPORA.master) return Promise.resolve()
+  masterLoad ??= (async () => {
+    const { data: file, error } = await supabaseAdmin.storage.from(MASTER_BUCKET).download(MASTER_OBJECT)
+    if (error || !file) throw error || new Error('empty download')
+    CORPORA.master = JSON.parse(await file.text()) as Corpus
+  })().catch((err) => {
+    console.error('[Mentor] master retrieval index unavailable', err)
+    masterLoad = null
+  })
+  return masterLoad
+}
+
+export interface Passage { title: string; text: string; score: number }
+
+export function topPassages(course: string, query: string, k: number): Passage[] {
+  const corpus = CORPORA[course]
+  if (!corpus || !query) return []
+  const scores = new Map<number, number>()
+  for (const word of new Set(terms(query))) {
+    const best = new Map<number, number>()
+    for (const term of variants(word)) {
+      const flat = corpus.postings[term]
+      if (!flat) continue
+      for (let i = 0; i < flat.length; i += 2) best.set(flat[i], Math.max(best.get(flat[i]) || 0, flat[i + 1]))
+    }
+    for (const [pid, w] of best) scores.set(pid, (scores.get(pid) || 0) + w)
+  }
+  return [...scores.entries()]
+    .sort((a, b) => b[1] - a[1] || a[0] - b[0])
+    .slice(0, k)
+    .map(([pid, score]) => {
+      const [doc, text] = corpus.passages[pid]
+      return { title: corpus.titles[doc], text, score: score / 100 }
+    })
+}
@@ -13,6 +13,10 @@
 // Hard limit: 30 students per call (Edge Function 150-second timeout safety).
 // If more inactive students remain, the response includes `remaining > 0`
 // and the admin clicks again to process the next batch.
+//
+// The whole cohort in one run: scripts/retention_run.py (scheduled job, same
+// selection via the retention_inactive_learners RPC). It reads LESSONS_MAP and
+// SYSTEM_PROMPT out of this file — keep both as plain literals.
 // ============================================================================
 
 import { serve } from 'https://deno.land/std@0.168.0/http/server.ts'
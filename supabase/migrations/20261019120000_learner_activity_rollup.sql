@@ -0,0 +1,99 @@
+-- ============================================================================
+-- learner_activity_rollup() — per-learner activity, aggregated in the database.
+--
+-- hot_learners.py and monthly_journey_email.py used to page through every row of
+-- course_progress, user_notes, ai_chat_usage and nlp_game_players only to count
+-- them per user in Python: ~10K rows over the wire to produce ~600 small records.
+-- This RPC returns those records directly, one row per user who has any activity.
+--
+-- Lesson keys are returned as arrays rather than counts on purpose: one person may
+-- hold two accounts (identity_resolver.py), and their lessons must be UNIONED, not
+-- summed. Keys are "<course_type>:<lesson_number>" — the same key the monthly
+-- email always used.
+--
+-- Service role only: the scripts call it with the service key, and it reads every
+-- learner's activity. scripts/learner_rollup.py falls back to client-side
+-- aggregation when this function is missing (PGRST202), so the scripts keep
+-- working before the migration is applied.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION public.learner_activity_rollup(p_month date DEFAULT NULL)
+RETURNS TABLE (
+    user_id          uuid,
+    completed        int,
+    lesson_keys      text[],
+    month_keys       text[],
+    video_ids        text[],
+    last_progress_at timestamptz,
+    notes            int,
+    chat_messages    int,
+    game_rows        int,
+    xp               int,
+    streak           int,
+    longest_streak   int,
+    last_game_at     timestamptz
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    WITH p AS (
+        SELECT cp.user_id,
+               COUNT(*) FILTER (WHERE cp.completed)::int AS completed,
+               array_agg(DISTINCT coalesce(cp.course_type, '') || ':' || coalesce(cp.lesson_number::text, ''))
+                   FILTER (WHERE cp.completed) AS lesson_keys,
+               -- p_month = first day of the report month; completed_at compared in UTC,
+               -- exactly like the "YYYY-MM" prefix match the script used to do
+               array_agg(DISTINCT coalesce(cp.course_type, '') || ':' || coalesce(cp.lesson_number::text, ''))
+                   FILTER (WHERE cp.completed AND p_month IS NOT NULL
+                           AND (cp.completed_at AT TIME ZONE 'UTC') >= p_month
+                           AND (cp.completed_at AT TIME ZONE 'UTC') < p_month + interval '1 month') AS month_keys,
+               array_agg(DISTINCT cp.video_id) FILTER (WHERE cp.completed AND cp.video_id IS NOT NULL) AS video_ids,
+               MAX(cp.updated_at) AS last_progress_at
+        FROM course_progress cp
+        GROUP BY cp.user_id
+    ),
+    n AS (
+        SELECT un.user_id, COUNT(*)::int AS notes FROM user_notes un GROUP BY un.user_id
+    ),
+    c AS (
+        SELECT cu.user_id, coalesce(SUM(cu.message_count), 0)::int AS chat_messages
+        FROM ai_chat_usage cu GROUP BY cu.user_id
+    ),
+    g AS (
+        SELECT gp.user_id, COUNT(*)::int AS game_rows, MAX(gp.xp)::int AS xp,
+               MAX(gp.streak)::int AS streak, MAX(gp.longest_streak)::int AS longest_streak,
+               MAX(gp.updated_at) AS last_game_at
+        FROM nlp_game_players gp GROUP BY gp.user_id
+    ),
+    u AS (
+        SELECT p.user_id FROM p UNION SELECT n.user_id FROM n
+        UNION SELECT c.user_id FROM c UNION SELECT g.user_id FROM g
+    )
+    SELECT u.user_id,
+           coalesce(p.completed, 0),
+           coalesce(p.lesson_keys, '{}'),
+           coalesce(p.month_keys, '{}'),
+           coalesce(p.video_ids, '{}'),
+           p.last_progress_at,
+           coalesce(n.notes, 0),
+           coalesce(c.chat_messages, 0),
+           coalesce(g.game_rows, 0),
+           coalesce(g.xp, 0),
+           coalesce(g.streak, 0),
+           coalesce(g.longest_streak, 0),
+           g.last_game_at
+    FROM u
+    LEFT JOIN p ON p.user_id = u.user_id
+    LEFT JOIN n ON n.user_id = u.user_id
+    LEFT JOIN c ON c.user_id = u.user_id
+    LEFT JOIN g ON g.user_id = u.user_id
+    WHERE u.user_id IS NOT NULL;
+$$;
+
+REVOKE ALL ON FUNCTION public.learner_activity_rollup(date) FROM PUBLIC;
+REVOKE ALL ON FUNCTION public.learner_activity_rollup(date) FROM anon;
+REVOKE ALL ON FUNCTION public.learner_activity_rollup(date) FROM authenticated;
+GRANT EXECUTE ON FUNCTION public.learner_activity_rollup(date) TO service_role;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,129 @@
+-- ============================================================================
+-- study_buddy_suggestions — pairs chosen by the offline batch matcher.
+--
+-- buddy_matches() ranks the whole pool for one caller at a time, so two learners at
+-- lesson 12 can both be shown the same lesson-11 person while the lesson-13 one is
+-- shown to nobody. scripts/study_buddy_matcher.py looks at everyone at once: it
+-- buckets opted-in learners by course position and recent activity, pairs each
+-- person with one buddy (never a pair that already has a request in any status,
+-- never a pair an earlier batch suggested), and writes the pairs here in bulk,
+-- one row per direction.
+--
+-- buddy_matches() keeps its contract (max 3 candidates, first name only, opaque
+-- token) and its filters; it only puts the caller's pair from their latest batch
+-- first. A learner with no batch row sees exactly what they saw before.
+--
+-- Same privacy model as 20260802120000_study_buddy_matching.sql: RLS on, no
+-- authenticated policy, admin read-only, written with the service key only.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.study_buddy_suggestions (
+    user_id    uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    buddy_id   uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    batch      date NOT NULL,
+    gap        int  NOT NULL,                      -- |lessons(user) - lessons(buddy)| at match time
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, buddy_id),               -- a pair is suggested once, ever
+    CONSTRAINT study_buddy_suggestions_no_self CHECK (user_id <> buddy_id)
+);
+
+CREATE INDEX IF NOT EXISTS study_buddy_suggestions_batch_idx
+    ON public.study_buddy_suggestions (user_id, batch DESC);
+
+COMMENT ON TABLE public.study_buddy_suggestions IS
+    'Study-buddy pairs from scripts/study_buddy_matcher.py, one row per direction. Read only through buddy_matches().';
+
+ALTER TABLE public.study_buddy_suggestions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Admins read buddy suggestions" ON public.study_buddy_suggestions;
+CREATE POLICY "Admins read buddy suggestions" ON public.study_buddy_suggestions
+    FOR SELECT TO authenticated USING (public.is_admin());
+
+REVOKE ALL ON public.study_buddy_suggestions FROM anon;
+
+-- ============================================================================
+-- buddy_matches() — unchanged except for `suggested` (batch pair first)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION public.buddy_matches()
+RETURNS jsonb
+LANGUAGE plpgsql STABLE SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_uid uuid := auth.uid();
+    v_me_n int;
+    v_me_last timestamptz;
+    v_batch date;
+    v_rows jsonb;
+BEGIN
+    IF v_uid IS NULL THEN
+        RETURN jsonb_build_object('rows', '[]'::jsonb, 'reason', 'not_signed_in');
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM study_buddy_prefs WHERE user_id = v_uid AND opted_in) THEN
+        RETURN jsonb_build_object('rows', '[]'::jsonb, 'reason', 'not_opted_in');
+    END IF;
+
+    v_me_n := buddy_lessons_done(v_uid);
+    v_me_last := buddy_last_active(v_uid);
+    SELECT max(batch) INTO v_batch FROM study_buddy_suggestions WHERE user_id = v_uid;
+
+    WITH cand AS (
+        SELECT
+            p.user_id,
+            split_part(trim(pr.full_name), ' ', 1)      AS first_name,
+            buddy_lessons_done(p.user_id)                AS n,
+            buddy_last_active(p.user_id)                 AS last_at
+        FROM study_buddy_prefs p
+        JOIN profiles pr ON pr.id = p.user_id
+        WHERE p.opted_in
+          AND p.user_id <> v_uid
+          AND nullif(trim(coalesce(pr.phone, '')), '')     IS NOT NULL
+          AND nullif(trim(coalesce(pr.full_name, '')), '') IS NOT NULL
+          AND NOT EXISTS (
+                SELECT 1 FROM study_buddy_requests r
+                 WHERE (r.requester_id = v_uid       AND r.target_id = p.user_id)
+                    OR (r.requester_id = p.user_id   AND r.target_id = v_uid))
+    ),
+    ranked AS (
+        SELECT *,
+               abs(n - v_me_n) AS gap,
+               (last_at > now() - interval '14 days') AS fresh,
+               EXISTS (SELECT 1 FROM study_buddy_suggestions s
+                        WHERE s.user_id = v_uid AND s.buddy_id = cand.user_id
+                          AND s.batch = v_batch) AS suggested
+        FROM cand
+        WHERE n >= buddy_min_lessons()
+          AND last_at > now() - interval '90 days'
+        ORDER BY suggested DESC, abs(n - v_me_n) ASC, last_at DESC
+        LIMIT 3
+    )
+    SELECT jsonb_agg(jsonb_build_object(
+        'token',      buddy_pair_token(v_uid, user_id),
+        'first_name', first_name,
+        'lessons',    n,
+        'stage',      buddy_stage_label(n),
+        'fresh',      fresh,
+        'reason',
+            CASE
+                WHEN gap <= 2 THEN 'שניכם כמעט בדיוק באותו מקום בקורס'
+                WHEN n > v_me_n THEN 'הוא קצת לפניך בקורס, יש לו מה לפתוח לך'
+                ELSE 'אתה קצת לפניו, ולהסביר למישהו זו הדרך הכי טובה לקבע חומר'
+            END
+            || CASE
+                WHEN fresh AND v_me_last > now() - interval '14 days'
+                    THEN ', ושניכם למדתם בשבועיים האחרונים'
+                ELSE '' END
+    ) ORDER BY suggested DESC, gap ASC, last_at DESC)
+    INTO v_rows FROM ranked;
+
+    RETURN jsonb_build_object(
+        'rows',   coalesce(v_rows, '[]'::jsonb),
+        'reason', CASE WHEN v_rows IS NULL THEN 'no_candidates' ELSE 'ok' END,
+        'my_lessons', v_me_n,
+        'my_stage',   buddy_stage_label(v_me_n)
+    );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.buddy_matches() FROM PUBLIC;
+REVOKE ALL ON FUNCTION public.buddy_matches() FROM anon;
+GRANT EXECUTE ON FUNCTION public.buddy_matches() TO authenticated;
@@ -0,0 +1,93 @@
+-- ============================================================================
+-- retention_inactive_learners() — the retention run's whole selection, in one query.
+--
+-- The retention-run Edge Function finds inactive students with four round trips
+-- (every completed MVP row, then history, profiles and questionnaires for the
+-- candidates) and folds them together in TypeScript, and then it only gets through 30
+-- of them per click. scripts/retention_run.py processes the whole inactive cohort in
+-- one scheduled run, and this function returns exactly the rows it needs, one per
+-- candidate:
+--
+--   the highest MVP lesson completed (p_video_ids is the MVP lesson order, so
+--   last_index is that lesson's 1-based position) and when it was completed;
+--   only learners who have not finished the MVP and whose last lesson is older than
+--   p_inactive_days; every completed_at of theirs in the course (for the send-hour
+--   heuristic); profile name/phone and the latest portal questionnaire.
+--
+-- Same selection as findInactiveStudents() in retention-run/index.ts. Learners
+-- without a profile or a questionnaire are dropped here as they are there; the name/
+-- phone/why_nlp checks stay in the caller, next to phone normalisation.
+--
+-- Service role only: it reads every learner's progress, profile and questionnaire.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION public.retention_inactive_learners(
+    p_video_ids     text[],
+    p_inactive_days int DEFAULT 3
+)
+RETURNS TABLE (
+    user_id           uuid,
+    last_index        int,
+    last_video_id     text,
+    last_completed_at timestamptz,
+    completed_ats     timestamptz[],
+    full_name         text,
+    phone             text,
+    q_phone           text,
+    why_nlp           text,
+    gender            text,
+    motivation_tip    text,
+    vision_one_year   text
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    WITH last_mvp AS (
+        SELECT DISTINCT ON (cp.user_id)
+               cp.user_id,
+               array_position(p_video_ids, cp.video_id) AS idx,
+               cp.video_id,
+               cp.completed_at
+          FROM course_progress cp
+         WHERE cp.course_type = 'nlp-practitioner'
+           AND cp.completed = true
+           AND cp.video_id = ANY (p_video_ids)
+         ORDER BY cp.user_id, array_position(p_video_ids, cp.video_id) DESC,
+                  cp.completed_at DESC NULLS LAST
+    ),
+    inactive AS (
+        SELECT * FROM last_mvp
+         WHERE idx < cardinality(p_video_ids)
+           AND completed_at < now() - make_interval(days => p_inactive_days)
+    ),
+    history AS (
+        SELECT cp.user_id, array_agg(cp.completed_at ORDER BY cp.completed_at) AS completed_ats
+          FROM course_progress cp
+          JOIN inactive i ON i.user_id = cp.user_id
+         WHERE cp.course_type = 'nlp-practitioner'
+           AND cp.completed = true
+           AND cp.completed_at IS NOT NULL
+         GROUP BY cp.user_id
+    ),
+    quest AS (
+        SELECT DISTINCT ON (q.user_id)
+               q.user_id, q.phone, q.why_nlp, q.gender, q.motivation_tip, q.vision_one_year
+          FROM portal_questionnaires q
+          JOIN inactive i ON i.user_id = q.user_id
+         ORDER BY q.user_id, q.created_at DESC
+    )
+    SELECT i.user_id, i.idx, i.video_id, i.completed_at,
+           coalesce(h.completed_ats, '{}'),
+           p.full_name, p.phone, q.phone,
+           q.why_nlp, q.gender, q.motivation_tip, q.vision_one_year
+      FROM inactive i
+      JOIN profiles p ON p.id = i.user_id
+      JOIN quest q    ON q.user_id = i.user_id
+      LEFT JOIN history h ON h.user_id = i.user_id;
+$$;
+
+REVOKE ALL ON FUNCTION public.retention_inactive_learners(text[], int) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.retention_inactive_learners(text[], int) TO service_role;
+
+NOTIFY pgrst, 'reload schema';